@@ -0,0 +1,111 @@
+from io import BytesIO
+
+from django import forms
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import UploadedFile
+from drf_extra_fields.fields import Base64FieldMixin, Base64ImageField
+from PIL import Image
+from rest_framework import relations, serializers
+
+
+class ImageHeaderField(forms.ImageField):
+    """
+    Проверка картинки только по заголовку.
+
+    В отличие от forms.ImageField не вызывает verify(), время которого
+    растёт с размером файла: картинку целиком декодирует фоновая задача,
+    которая строит рендиции.
+    """
+
+    def to_python(self, data):
+        file = forms.FileField.to_python(self, data)
+        if file is None:
+            return None
+        if hasattr(data, 'temporary_file_path'):
+            source = data.temporary_file_path()
+        elif hasattr(data, 'read'):
+            # Image.open читает только заголовок, копировать файл незачем.
+            source = data
+        else:
+            source = BytesIO(data['content'])
+        try:
+            image = Image.open(source)
+        except Exception as error:
+            raise ValidationError(
+                self.error_messages['invalid_image'],
+                code='invalid_image',
+            ) from error
+        file.image = image
+        file.content_type = Image.MIME.get(image.format)
+        if hasattr(file, 'seek') and callable(file.seek):
+            file.seek(0)
+        return file
+
+
+class Base64ImageUploadField(Base64ImageField):
+    """
+    Картинка в base64, которая обрабатывается в фоне после сохранения.
+
+    Принимает и файл, уже декодированный Base64StreamingJSONParser.
+    """
+
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault('_DjangoImageField', ImageHeaderField)
+        super().__init__(*args, **kwargs)
+
+    def to_internal_value(self, data):
+        if isinstance(data, UploadedFile):
+            return super(Base64FieldMixin, self).to_internal_value(data)
+        return super().to_internal_value(data)
+
+
+class PreloadedPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """
+    PrimaryKeyRelatedField, который ищет объекты в заранее загруженных.
+
+    Обычное поле делает запрос на каждый ключ. Здесь список ключей
+    загружается одним запросом через preload(): это делает
+    PreloadedManyRelatedField для many=True или ListSerializer
+    вложенного сериализатора, см. IngredientAmountListSerializer.
+    """
+
+    def __init__(self, **kwargs):
+        self.preloaded = None
+        super().__init__(**kwargs)
+
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        list_kwargs = {'child_relation': cls(*args, **kwargs)}
+        for key in kwargs:
+            if key in relations.MANY_RELATION_KWARGS:
+                list_kwargs[key] = kwargs[key]
+        return PreloadedManyRelatedField(**list_kwargs)
+
+    def preload(self, values):
+        pks = set()
+        for value in values:
+            if isinstance(value, bool):
+                continue
+            try:
+                pks.add(int(value))
+            except (TypeError, ValueError):
+                continue
+        self.preloaded = self.get_queryset().in_bulk(pks)
+
+    def to_internal_value(self, data):
+        if self.preloaded is None or isinstance(data, bool):
+            return super().to_internal_value(data)
+        try:
+            obj = self.preloaded.get(int(data))
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        if obj is None:
+            self.fail('does_not_exist', pk_value=data)
+        return obj
+
+
+class PreloadedManyRelatedField(serializers.ManyRelatedField):
+    def to_internal_value(self, data):
+        if isinstance(data, list):
+            self.child_relation.preload(data)
+        return super().to_internal_value(data)
@@ -1,8 +1,10 @@
-from django_filters.rest_framework import (AllValuesMultipleFilter,
-                                           BooleanFilter, CharFilter,
-                                           FilterSet)
+from django.db.models import Exists, OuterRef
+from django_filters.rest_framework import (BooleanFilter, CharFilter,
+                                           FilterSet, MultipleChoiceFilter)
 
+from recipes.cache import get_tag_ids_by_slug
 from recipes.models import Ingredient, Recipe
+from recipes.search import search_recipes
 
 
 class IngredientFilter(FilterSet):
@@ -11,7 +13,10 @@ class IngredientFilter(FilterSet):
     name = CharFilter(
         field_name='name',
         lookup_expr='istartswith',
-        help_text='Название ингредиента (по начальным буквам)',
+        help_text=(
+            'Название ингредиента: сначала совпадения по началу, '
+            'затем по вхождению'
+        ),
     )
 
     class Meta:
@@ -22,8 +27,8 @@ class IngredientFilter(FilterSet):
 class RecipeFilter(FilterSet):
     """Фильтр для рецептов."""
 
-    tags = AllValuesMultipleFilter(
-        field_name='tags__slug',
+    tags = MultipleChoiceFilter(
+        method='filter_tags',
         help_text='Фильтрация по слагам тегов',
     )
     is_favorited = BooleanFilter(
@@ -34,6 +39,10 @@ class RecipeFilter(FilterSet):
         field_name='is_in_shopping_cart',
         help_text='Фильтр по корзине',
     )
+    search = CharFilter(
+        method='filter_search',
+        help_text='Поиск по названию, ингредиентам и описанию',
+    )
 
     class Meta:
         model = Recipe
@@ -42,8 +51,37 @@ class RecipeFilter(FilterSet):
             'author',
             'is_favorited',
             'is_in_shopping_cart',
+            'search',
+        ]
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Слаги проверяются и переводятся в id по одному словарю, даже
+        # если версия тегов сменится посреди запроса. Без ?tags= словарь
+        # не нужен.
+        self.tag_ids = (
+            get_tag_ids_by_slug() if self.data and 'tags' in self.data
+            else {}
+        )
+        self.filters['tags'].extra['choices'] = [
+            (slug, slug) for slug in self.tag_ids
         ]
 
+    def filter_tags(self, queryset, name, value):
+        """Рецепты хотя бы с одним из тегов, без JOIN и дублей строк."""
+        return queryset.filter(
+            Exists(
+                Recipe.tags.through.objects.filter(
+                    recipe=OuterRef('pk'),
+                    tag_id__in=[self.tag_ids[slug] for slug in value],
+                )
+            )
+        )
+
+    def filter_search(self, queryset, name, value):
+        """Полнотекстовый поиск с сортировкой по релевантности."""
+        return search_recipes(queryset, value)
+
     def filter_queryset(self, queryset):
         """Отключение фильтров для анонимных пользователей."""
         if not self.request.user.is_authenticated:
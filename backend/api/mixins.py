@@ -0,0 +1,58 @@
+from hashlib import md5
+
+from django.core.cache import cache
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+from rest_framework.response import Response
+
+from foodgram.constants import REFERENCE_CACHE_TIMEOUT
+from foodgram.metrics import observe_cache
+from recipes.cache import get_reference_version
+
+
+class CachedReferenceListMixin:
+    """
+    Кеширование списка справочных данных.
+
+    Сериализованный список хранится в кеше под ключом с версией данных.
+    Ответ несёт ETag и Last-Modified, поэтому повторный запрос клиента
+    с If-None-Match/If-Modified-Since получает 304 без сериализации.
+    """
+
+    def list(self, request, *args, **kwargs):
+        model = self.get_queryset().model
+        version = get_reference_version(model)
+        variant = (
+            f'{model._meta.label_lower}:{version}:'
+            f'{request.accepted_media_type}:{request.get_full_path()}'
+        )
+        digest = md5(variant.encode()).hexdigest()
+        etag = quote_etag(digest)
+        headers = {
+            'ETag': etag,
+            'Last-Modified': http_date(int(version)),
+        }
+
+        not_modified = get_conditional_response(
+            request,
+            etag=etag,
+            last_modified=int(version),
+        )
+        if not_modified is not None:
+            response = not_modified
+        else:
+            key = f'reference:list:{digest}'
+            data = cache.get(key)
+            observe_cache('reference_list', data is not None)
+            if data is None:
+                data = self.get_reference_data(request, *args, **kwargs)
+                cache.set(key, data, REFERENCE_CACHE_TIMEOUT)
+            response = Response(data)
+
+        for header, value in headers.items():
+            response[header] = value
+        patch_cache_control(response, no_cache=True)
+        return response
+
+    def get_reference_data(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs).data
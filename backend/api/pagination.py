@@ -1,9 +1,103 @@
+from base64 import b64decode, b64encode
+from binascii import Error as BinasciiError
+from collections import OrderedDict
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound, ValidationError
 from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 
 from foodgram.constants import MAX_LIMIT_PAGE_SIZE
 
 
 class RecipePagination(PageNumberPagination):
-    """Пагинация рецептов."""
+    """
+    Пагинация рецептов.
+
+    По умолчанию постраничная. С параметром ?cursor= включается
+    курсорный режим по ключу (pub_date, id): страница выбирается
+    условием по индексу вместо OFFSET, а общий COUNT не выполняется.
+    Результаты поиска упорядочены по релевантности, а не по этому ключу,
+    поэтому вместе с ?search= курсор не принимается.
+    """
     page_size_query_param = 'limit'
     max_page_size = MAX_LIMIT_PAGE_SIZE
+    cursor_query_param = 'cursor'
+    cursor_ordering = ('-pub_date', '-id')
+    invalid_cursor_message = 'Неверный курсор.'
+    search_query_param = 'search'
+    cursor_with_search_message = (
+        'Курсорная пагинация недоступна для поиска: используйте ?page=.'
+    )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor_mode = self.cursor_query_param in request.query_params
+        if not self.cursor_mode:
+            return super().paginate_queryset(queryset, request, view)
+
+        if request.query_params.get(self.search_query_param):
+            raise ValidationError(
+                {self.cursor_query_param: [self.cursor_with_search_message]}
+            )
+        self.request = request
+        page_size = self.get_page_size(request)
+        queryset = queryset.order_by(*self.cursor_ordering)
+        position = self.decode_cursor(request)
+        if position is not None:
+            pub_date, pk = position
+            queryset = queryset.filter(
+                Q(pub_date__lt=pub_date) | Q(pk__lt=pk),
+                pub_date__lte=pub_date,
+            )
+        page = list(queryset[:page_size + 1])
+        self.next_position = None
+        if len(page) > page_size:
+            page = page[:page_size]
+            self.next_position = (page[-1].pub_date, page[-1].pk)
+        return page
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            pub_date, pk = b64decode(
+                encoded.encode(),
+                altchars=b'-_',
+                validate=True,
+            ).decode().split('|')
+            pub_date = parse_datetime(pub_date)
+            pk = int(pk)
+        except (BinasciiError, UnicodeDecodeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if pub_date is None:
+            raise NotFound(self.invalid_cursor_message)
+        return pub_date, pk
+
+    def encode_cursor(self, position):
+        pub_date, pk = position
+        return b64encode(
+            f'{pub_date.isoformat()}|{pk}'.encode(),
+            altchars=b'-_',
+        ).decode()
+
+    def get_next_link(self):
+        if not self.cursor_mode:
+            return super().get_next_link()
+        if self.next_position is None:
+            return None
+        return replace_query_param(
+            self.request.build_absolute_uri(),
+            self.cursor_query_param,
+            self.encode_cursor(self.next_position),
+        )
+
+    def get_paginated_response(self, data):
+        if not self.cursor_mode:
+            return super().get_paginated_response(data)
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('results', data),
+        ]))
@@ -0,0 +1,338 @@
+"""
+Потоковый разбор JSON с картинками в base64.
+
+JSONParser читает тело целиком, json.load строит из него строку с
+base64, а Base64ImageField декодирует её в ещё одну полную копию, так что
+загрузка картинки на 10 МБ ненадолго занимает в памяти воркера в 3–4
+раза больше. Base64StreamingJSONParser читает тело кусками по
+UPLOAD_CHUNK_SIZE байт и вырезает строки полей Base64ImageUploadField
+верхнего уровня прямо из потока: base64 декодируется по кускам во
+временный файл, который уходит на диск, как только перерастает кусок.
+Остальной JSON небольшой и разбирается обычным json.loads, а вместо
+строки с картинкой поле получает готовый файл. Тип картинки проверяется
+по первым байтам, размер — по мере декодирования, поэтому неподходящая
+загрузка отклоняется, не дочитываясь до конца.
+"""
+import binascii
+from tempfile import SpooledTemporaryFile
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.utils import json
+
+from api.fields import Base64ImageUploadField
+from foodgram.constants import IMAGE_UPLOAD_MAX_SIZE, UPLOAD_CHUNK_SIZE
+
+BASE64_ALPHABET = (
+    b'ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/='
+)
+NOT_BASE64 = bytes(set(range(256)) - set(BASE64_ALPHABET))
+DATA_URL_SEPARATOR = b';base64,'
+# Заголовок data URL ищется только в начале строки.
+DATA_URL_MAX_LENGTH = 256
+IMAGE_SIGNATURES = (
+    (b'\xff\xd8\xff', 'jpg', 'image/jpeg'),
+    (b'\x89PNG\r\n\x1a\n', 'png', 'image/png'),
+    (b'GIF87a', 'gif', 'image/gif'),
+    (b'GIF89a', 'gif', 'image/gif'),
+)
+SIGNATURE_LENGTH = max(len(signature) for signature, *_ in IMAGE_SIGNATURES)
+# Экранирование, которое JSON-кодировщики используют внутри base64.
+ESCAPES = {ord('/'): b'/', ord('n'): b'', ord('r'): b'', ord('t'): b''}
+WHITESPACE = frozenset(b' \t\r\n')
+
+INVALID_IMAGE = 'Загрузите корректную картинку в base64.'
+INVALID_TYPE = 'Поддерживаются картинки JPEG, PNG и GIF.'
+TOO_LARGE = (
+    f'Размер картинки не должен превышать '
+    f'{IMAGE_UPLOAD_MAX_SIZE // (1024 * 1024)} МБ.'
+)
+
+
+class Base64Decoder:
+    """Декодирование base64 по кускам во временный файл."""
+
+    def __init__(self, field, max_size=IMAGE_UPLOAD_MAX_SIZE,
+                 spool_size=UPLOAD_CHUNK_SIZE):
+        self.field = field
+        self.max_size = max_size
+        self.file = SpooledTemporaryFile(max_size=spool_size)
+        self.head = bytearray()
+        self.header_done = False
+        self.pending = b''
+        self.signature = bytearray()
+        self.image_type = None
+        self.size = 0
+        self.empty = True
+
+    def error(self, message):
+        self.file.close()
+        return ParseError({self.field: [message]})
+
+    def feed(self, data):
+        self.empty = self.empty and not data
+        if not self.header_done:
+            self.head += data
+            position = self.head.find(DATA_URL_SEPARATOR)
+            if position != -1:
+                data = bytes(self.head[position + len(DATA_URL_SEPARATOR):])
+            elif len(self.head) > DATA_URL_MAX_LENGTH:
+                data = bytes(self.head)
+            else:
+                return
+            self.header_done = True
+            self.head = None
+        data = self.pending + data.translate(None, NOT_BASE64)
+        usable = len(data) - len(data) % 4
+        self.pending = data[usable:]
+        if usable:
+            self.write(data[:usable])
+
+    def write(self, data):
+        try:
+            decoded = binascii.a2b_base64(data)
+        except binascii.Error:
+            raise self.error(INVALID_IMAGE)
+        self.size += len(decoded)
+        if self.size > self.max_size:
+            raise self.error(TOO_LARGE)
+        if self.image_type is None:
+            self.signature += decoded[:SIGNATURE_LENGTH]
+            self.detect_type(final=False)
+        self.file.write(decoded)
+
+    def detect_type(self, final):
+        for signature, extension, content_type in IMAGE_SIGNATURES:
+            if self.signature.startswith(signature):
+                self.image_type = extension, content_type
+                return
+        if final or len(self.signature) >= SIGNATURE_LENGTH:
+            raise self.error(INVALID_TYPE)
+
+    def close(self):
+        """Дописывает остаток и возвращает файл для поля сериализатора."""
+        if self.empty:
+            # Пустую строку поле обрабатывает само, как отсутствие файла.
+            self.file.close()
+            return ''
+        if not self.header_done:
+            self.header_done = True
+            head, self.head = bytes(self.head), None
+            self.feed(head.split(DATA_URL_SEPARATOR)[-1])
+        if self.pending:
+            # Неполная четвёрка символов: a2b_base64 сообщит об ошибке.
+            self.write(self.pending)
+        if not self.size:
+            raise self.error(INVALID_IMAGE)
+        if self.image_type is None:
+            self.detect_type(final=True)
+        extension, content_type = self.image_type
+        self.file.seek(0)
+        return UploadedFile(
+            file=self.file,
+            name=f'{uuid4()}.{extension}',
+            content_type=content_type,
+            size=self.size,
+        )
+
+
+class JSONUploadScanner:
+    """
+    Разбор потока JSON-объекта с вырезанием строк заданных ключей.
+
+    Следит только за вложенностью и строками: ключи и значения верхнего
+    уровня. Строка значения ключа из fields уходит в Base64Decoder, а в
+    остаток JSON вместо неё пишется null. Синтаксис остального проверяет
+    json.loads.
+    """
+
+    def __init__(self, fields):
+        self.fields = fields
+        self.rest = bytearray()
+        self.files = {}
+        self.depth = 0
+        self.in_string = False
+        self.escape = False
+        self.expect_key = False
+        self.key = None
+        self.last_key = None
+        self.value_key = None
+        self.decoder = None
+
+    def feed(self, chunk):
+        position = 0
+        while position < len(chunk):
+            if self.decoder is not None:
+                position = self.feed_upload(chunk, position)
+            elif self.in_string and self.key is None:
+                position = self.feed_string(chunk, position)
+            elif self.in_string:
+                position = self.feed_key(chunk, position)
+            else:
+                position = self.feed_structure(chunk, position)
+
+    def feed_upload(self, chunk, position):
+        if self.escape:
+            self.escape = False
+            if chunk[position] not in ESCAPES:
+                raise self.decoder.error(INVALID_IMAGE)
+            self.decoder.feed(ESCAPES[chunk[position]])
+            return position + 1
+        end = chunk.find(b'"', position)
+        stop = len(chunk) if end == -1 else end
+        backslash = chunk.find(b'\\', position, stop)
+        if backslash != -1:
+            self.decoder.feed(chunk[position:backslash])
+            self.escape = True
+            return backslash + 1
+        self.decoder.feed(chunk[position:stop])
+        if end == -1:
+            return stop
+        self.files[self.value_key] = self.decoder.close()
+        self.decoder = self.value_key = None
+        return end + 1
+
+    def feed_string(self, chunk, position):
+        """Обычная строка копируется в остаток без разбора по байтам."""
+        if self.escape:
+            self.escape = False
+            self.rest.append(chunk[position])
+            return position + 1
+        end = chunk.find(b'"', position)
+        stop = len(chunk) if end == -1 else end
+        backslash = chunk.find(b'\\', position, stop)
+        if backslash != -1:
+            self.rest += chunk[position:backslash + 1]
+            self.escape = True
+            return backslash + 1
+        if end == -1:
+            self.rest += chunk[position:]
+            return stop
+        self.rest += chunk[position:end + 1]
+        self.in_string = False
+        return end + 1
+
+    def feed_key(self, chunk, position):
+        """Строка ключа верхнего уровня: копируется и запоминается."""
+        for index in range(position, len(chunk)):
+            byte = chunk[index]
+            self.rest.append(byte)
+            if self.escape:
+                self.escape = False
+            elif byte == 0x5C:
+                self.escape = True
+            elif byte == 0x22:
+                self.in_string = False
+                self.last_key = bytes(self.key)
+                self.key = None
+                return index + 1
+            self.key.append(byte)
+        return len(chunk)
+
+    def feed_structure(self, chunk, position):
+        for index in range(position, len(chunk)):
+            byte = chunk[index]
+            if byte == 0x22:
+                return self.open_string(index)
+            if byte not in WHITESPACE:
+                self.feed_punctuation(byte)
+            self.rest.append(byte)
+        return len(chunk)
+
+    def open_string(self, index):
+        """Начало строки: ключ, вырезаемое значение или обычная строка."""
+        if self.depth == 1 and self.expect_key:
+            self.expect_key = False
+            self.in_string = True
+            self.key = bytearray()
+            self.rest.append(0x22)
+        elif self.depth == 1 and self.value_key in self.fields:
+            self.rest += b'null'
+            self.decoder = Base64Decoder(self.value_key)
+        else:
+            self.in_string = True
+            self.value_key = None
+            self.rest.append(0x22)
+        return index + 1
+
+    def feed_punctuation(self, byte):
+        """Двоеточие после ключа, скобки и запятые."""
+        if byte == 0x3A and self.depth == 1 and self.last_key:
+            self.value_key = self.last_key.decode(errors='replace')
+            self.last_key = None
+            return
+        self.value_key = None
+        if byte in b'{[':
+            self.depth += 1
+            self.expect_key = self.depth == 1 and byte == 0x7B
+        elif byte in b'}]':
+            self.depth -= 1
+        elif byte == 0x2C and self.depth == 1:
+            self.expect_key = True
+
+    def close(self):
+        if self.decoder is not None:
+            raise self.decoder.error(INVALID_IMAGE)
+        return bytes(self.rest), self.files
+
+
+class Base64StreamingJSONParser(JSONParser):
+    """
+    JSONParser, который декодирует картинки в base64 из потока.
+
+    Поля находятся по сериализатору представления: строки всех
+    Base64ImageUploadField верхнего уровня разбираются потоково. Для
+    представлений без таких полей работает обычный JSONParser.
+    """
+
+    chunk_size = UPLOAD_CHUNK_SIZE
+
+    @staticmethod
+    def get_upload_fields(view):
+        get_serializer_class = getattr(view, 'get_serializer_class', None)
+        if get_serializer_class is None:
+            return set()
+        try:
+            serializer_class = get_serializer_class()
+        except AssertionError:
+            return set()
+        return {
+            name
+            for name, field in getattr(
+                serializer_class, '_declared_fields', {},
+            ).items()
+            if isinstance(field, Base64ImageUploadField)
+        }
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        fields = self.get_upload_fields(parser_context.get('view'))
+        if not fields:
+            return super().parse(stream, media_type, parser_context)
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+
+        scanner = JSONUploadScanner(fields)
+        try:
+            while True:
+                chunk = stream.read(self.chunk_size)
+                if not chunk:
+                    break
+                scanner.feed(chunk)
+            rest, files = scanner.close()
+        except ParseError:
+            for file in scanner.files.values():
+                file.close()
+            raise
+        try:
+            data = json.loads(
+                rest.decode(encoding),
+                parse_constant=json.strict_constant if self.strict else None,
+            )
+        except ValueError as exc:
+            raise ParseError('JSON parse error - %s' % str(exc))
+        if isinstance(data, dict):
+            data.update(files)
+        return data
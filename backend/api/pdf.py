@@ -0,0 +1,307 @@
+"""
+Потоковая генерация простых текстовых PDF-документов.
+
+Используется встраиваемый TrueType-шрифт (кодировка Identity-H), поэтому
+кириллица отображается без сторонних библиотек. Документ отдаётся по
+частям: в памяти одновременно находится только текущая страница.
+"""
+import struct
+import zlib
+from functools import lru_cache
+
+PAGE_WIDTH = 595
+PAGE_HEIGHT = 842
+MARGIN = 50
+FONT_SIZE = 11
+TITLE_FONT_SIZE = 16
+LEADING = 16
+
+
+class TrueTypeFont:
+    """Метрики и таблица символов TrueType-шрифта, нужные для PDF."""
+
+    def __init__(self, path):
+        with open(path, 'rb') as font_file:
+            self.data = font_file.read()
+        num_tables = self._u16(4)
+        self.tables = {}
+        for index in range(num_tables):
+            record = 12 + index * 16
+            tag = self.data[record:record + 4].decode('latin-1')
+            self.tables[tag] = self._u32(record + 8)
+
+        head = self.tables['head']
+        self.units_per_em = self._u16(head + 18)
+        self.bbox = [
+            self._scale(self._i16(head + offset))
+            for offset in (36, 38, 40, 42)
+        ]
+        hhea = self.tables['hhea']
+        self.ascent = self._scale(self._i16(hhea + 4))
+        self.descent = self._scale(self._i16(hhea + 6))
+        self._num_h_metrics = self._u16(hhea + 34)
+        self._cmap = self._find_unicode_cmap()
+        self._glyphs = {}
+
+    def _u16(self, offset):
+        return struct.unpack_from('>H', self.data, offset)[0]
+
+    def _i16(self, offset):
+        return struct.unpack_from('>h', self.data, offset)[0]
+
+    def _u32(self, offset):
+        return struct.unpack_from('>I', self.data, offset)[0]
+
+    def _scale(self, value):
+        return round(value * 1000 / self.units_per_em)
+
+    def _find_unicode_cmap(self):
+        cmap = self.tables['cmap']
+        for index in range(self._u16(cmap + 2)):
+            record = cmap + 4 + index * 8
+            platform, encoding = self._u16(record), self._u16(record + 2)
+            subtable = cmap + self._u32(record + 4)
+            if (platform, encoding) == (3, 1) and self._u16(subtable) == 4:
+                return subtable
+        raise ValueError('В шрифте нет таблицы символов Unicode BMP.')
+
+    def glyph_id(self, char):
+        """Номер глифа для символа по подтаблице cmap формата 4."""
+        code = ord(char)
+        if code in self._glyphs:
+            return self._glyphs[code]
+        table = self._cmap
+        seg_count = self._u16(table + 6) // 2
+        ends = table + 14
+        starts = ends + seg_count * 2 + 2
+        deltas = starts + seg_count * 2
+        range_offsets = deltas + seg_count * 2
+        glyph = 0
+        for segment in range(seg_count):
+            if self._u16(ends + segment * 2) < code:
+                continue
+            start = self._u16(starts + segment * 2)
+            if start > code:
+                break
+            delta = self._u16(deltas + segment * 2)
+            position = range_offsets + segment * 2
+            range_offset = self._u16(position)
+            if range_offset == 0:
+                glyph = (code + delta) & 0xFFFF
+            else:
+                glyph = self._u16(
+                    position + range_offset + (code - start) * 2
+                )
+                if glyph:
+                    glyph = (glyph + delta) & 0xFFFF
+            break
+        self._glyphs[code] = glyph
+        return glyph
+
+    def advance_width(self, glyph):
+        """Ширина глифа в единицах PDF (1/1000 кегля)."""
+        index = min(glyph, self._num_h_metrics - 1)
+        return self._scale(self._u16(self.tables['hmtx'] + index * 4))
+
+
+@lru_cache(maxsize=None)
+def load_font(path):
+    """Шрифт и его сжатое содержимое разбираются один раз на процесс."""
+    font = TrueTypeFont(path)
+    return font, zlib.compress(font.data)
+
+
+class PdfWriter:
+    """Потоковый writer: объекты отдаются сразу, xref — в конце."""
+
+    CATALOG, PAGES, FONT = 1, 2, 3
+
+    def __init__(self, font_path):
+        self.font, self.font_stream = load_font(font_path)
+        self.offsets = {}
+        self.position = 0
+        self.next_id = self.FONT + 1
+        self.pages = []
+        self.used_glyphs = {}
+
+    def _allocate(self):
+        object_id = self.next_id
+        self.next_id += 1
+        return object_id
+
+    def _chunk(self, data):
+        self.position += len(data)
+        return data
+
+    def _object(self, object_id, body, stream=None):
+        self.offsets[object_id] = self.position
+        data = f'{object_id} 0 obj\n'.encode() + body
+        if stream is not None:
+            data += b'\nstream\n' + stream + b'\nendstream'
+        return self._chunk(data + b'\nendobj\n')
+
+    def _encode(self, text):
+        glyphs = []
+        for char in text:
+            glyph = self.font.glyph_id(char)
+            self.used_glyphs.setdefault(glyph, char)
+            glyphs.append(f'{glyph:04X}')
+        return '<' + ''.join(glyphs) + '>'
+
+    def text_width(self, text, size):
+        return sum(
+            self.font.advance_width(self.font.glyph_id(char))
+            for char in text
+        ) * size / 1000
+
+    def wrap(self, text, size=FONT_SIZE):
+        """Перенос строки по ширине страницы."""
+        max_width = PAGE_WIDTH - 2 * MARGIN
+        line = ''
+        for word in text.split(' '):
+            candidate = f'{line} {word}' if line else word
+            if line and self.text_width(candidate, size) > max_width:
+                yield line
+                line = word
+            else:
+                line = candidate
+        yield line
+
+    def page(self, lines):
+        """Страница из списка пар (текст, кегль)."""
+        commands = [f'BT {MARGIN} {PAGE_HEIGHT - MARGIN} Td {LEADING} TL']
+        for text, size in lines:
+            commands.append(f'/F1 {size} Tf {self._encode(text)} Tj T*')
+        commands.append('ET')
+        content = zlib.compress('\n'.join(commands).encode())
+        content_id, page_id = self._allocate(), self._allocate()
+        self.pages.append(page_id)
+        yield self._object(
+            content_id,
+            f'<< /Length {len(content)} /Filter /FlateDecode >>'.encode(),
+            content,
+        )
+        yield self._object(
+            page_id,
+            (
+                f'<< /Type /Page /Parent {self.PAGES} 0 R '
+                f'/MediaBox [0 0 {PAGE_WIDTH} {PAGE_HEIGHT}] '
+                f'/Resources << /Font << /F1 {self.FONT} 0 R >> >> '
+                f'/Contents {content_id} 0 R >>'
+            ).encode(),
+        )
+
+    def _font_objects(self):
+        font = self.font
+        cid_font_id, descriptor_id = self._allocate(), self._allocate()
+        file_id, to_unicode_id = self._allocate(), self._allocate()
+        glyphs = sorted(self.used_glyphs)
+        widths = ' '.join(
+            f'{glyph} [{font.advance_width(glyph)}]' for glyph in glyphs
+        )
+        yield self._object(
+            self.FONT,
+            (
+                '<< /Type /Font /Subtype /Type0 /BaseFont /EmbeddedFont '
+                f'/Encoding /Identity-H /DescendantFonts [{cid_font_id} 0 R] '
+                f'/ToUnicode {to_unicode_id} 0 R >>'
+            ).encode(),
+        )
+        yield self._object(
+            cid_font_id,
+            (
+                '<< /Type /Font /Subtype /CIDFontType2 '
+                '/BaseFont /EmbeddedFont '
+                '/CIDSystemInfo << /Registry (Adobe) /Ordering (Identity) '
+                '/Supplement 0 >> '
+                f'/FontDescriptor {descriptor_id} 0 R '
+                f'/CIDToGIDMap /Identity /W [{widths}] >>'
+            ).encode(),
+        )
+        yield self._object(
+            descriptor_id,
+            (
+                '<< /Type /FontDescriptor /FontName /EmbeddedFont /Flags 32 '
+                f'/FontBBox [{" ".join(map(str, font.bbox))}] '
+                f'/ItalicAngle 0 /Ascent {font.ascent} '
+                f'/Descent {font.descent} /CapHeight {font.ascent} '
+                f'/StemV 80 /FontFile2 {file_id} 0 R >>'
+            ).encode(),
+        )
+        yield self._object(
+            file_id,
+            (
+                f'<< /Length {len(self.font_stream)} /Filter /FlateDecode '
+                f'/Length1 {len(font.data)} >>'
+            ).encode(),
+            self.font_stream,
+        )
+        yield self._object(to_unicode_id, *self._to_unicode(glyphs))
+
+    def _to_unicode(self, glyphs):
+        lines = [
+            '/CIDInit /ProcSet findresource begin',
+            '12 dict begin',
+            'begincmap',
+            '/CIDSystemInfo << /Registry (Adobe) /Ordering (UCS) '
+            '/Supplement 0 >> def',
+            '/CMapName /Adobe-Identity-UCS def',
+            '/CMapType 2 def',
+            '1 begincodespacerange',
+            '<0000> <FFFF>',
+            'endcodespacerange',
+        ]
+        for start in range(0, len(glyphs), 100):
+            block = glyphs[start:start + 100]
+            lines.append(f'{len(block)} beginbfchar')
+            lines.extend(
+                f'<{glyph:04X}> '
+                f'<{self.used_glyphs[glyph].encode("utf-16-be").hex()}>'
+                for glyph in block
+            )
+            lines.append('endbfchar')
+        lines.extend([
+            'endcmap',
+            'CMapName currentdict /CMap defineresource pop',
+            'end',
+            'end',
+        ])
+        stream = '\n'.join(lines).encode()
+        return f'<< /Length {len(stream)} >>'.encode(), stream
+
+    def document(self, title, lines):
+        """Генератор байтов PDF-документа с заголовком и строками текста."""
+        yield self._chunk(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+        per_page = (PAGE_HEIGHT - 2 * MARGIN) // LEADING
+        page = [(title, TITLE_FONT_SIZE), ('', FONT_SIZE)]
+        for line in lines:
+            for part in self.wrap(line):
+                if len(page) >= per_page:
+                    yield from self.page(page)
+                    page = []
+                page.append((part, FONT_SIZE))
+        yield from self.page(page)
+        yield from self._font_objects()
+        kids = ' '.join(f'{page_id} 0 R' for page_id in self.pages)
+        yield self._object(
+            self.PAGES,
+            (
+                f'<< /Type /Pages /Kids [{kids}] '
+                f'/Count {len(self.pages)} >>'
+            ).encode(),
+        )
+        yield self._object(
+            self.CATALOG,
+            f'<< /Type /Catalog /Pages {self.PAGES} 0 R >>'.encode(),
+        )
+        xref_offset = self.position
+        xref = [f'xref\n0 {self.next_id}\n', '0000000000 65535 f \n']
+        xref.extend(
+            f'{self.offsets[object_id]:010d} 00000 n \n'
+            for object_id in range(1, self.next_id)
+        )
+        xref.append(
+            f'trailer\n<< /Size {self.next_id} /Root {self.CATALOG} 0 R >>\n'
+            f'startxref\n{xref_offset}\n%%EOF\n'
+        )
+        yield self._chunk(''.join(xref).encode())
@@ -0,0 +1,112 @@
+import csv
+import json
+
+from django.conf import settings
+from rest_framework.renderers import BaseRenderer
+
+from api.pdf import PdfWriter
+
+
+class ShoppingCartRenderer(BaseRenderer):
+    """
+    Базовый рендерер списка покупок.
+
+    Принимает итератор строк (название, единица измерения, количество)
+    и отдаёт документ по частям через stream(), по умолчанию — строками
+    текста. Через render() проходят только ответы с ошибками (401, 404),
+    они отдаются как JSON.
+    """
+
+    charset = 'utf-8'
+    extension = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return json.dumps(data, ensure_ascii=False).encode()
+
+    @staticmethod
+    def format_line(row):
+        name, measurement_unit, amount = row
+        return f'{name} ({measurement_unit}) — {amount}'
+
+    def stream(self, rows):
+        separator = ''
+        for row in rows:
+            yield f'{separator}{self.format_line(row)}'.encode(self.charset)
+            separator = '\n'
+
+    @property
+    def content_type(self):
+        if self.charset:
+            return f'{self.media_type}; charset={self.charset}'
+        return self.media_type
+
+
+class ShoppingCartTextRenderer(ShoppingCartRenderer):
+    media_type = 'text/plain'
+    format = 'txt'
+    extension = 'txt'
+
+
+class Echo:
+    """Псевдобуфер для csv.writer: возвращает записанную строку."""
+
+    def write(self, value):
+        return value
+
+
+class ShoppingCartCSVRenderer(ShoppingCartRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+    extension = 'csv'
+
+    def stream(self, rows):
+        writer = csv.writer(Echo())
+        yield '\ufeff'.encode(self.charset)
+        yield writer.writerow(
+            ('Ингредиент', 'Единица измерения', 'Количество')
+        ).encode(self.charset)
+        for row in rows:
+            yield writer.writerow(row).encode(self.charset)
+
+
+class ShoppingCartJSONRenderer(ShoppingCartRenderer):
+    media_type = 'application/json'
+    format = 'json'
+    extension = 'json'
+    charset = None
+
+    def stream(self, rows):
+        separator = '['
+        for name, measurement_unit, amount in rows:
+            item = json.dumps(
+                {
+                    'name': name,
+                    'measurement_unit': measurement_unit,
+                    'amount': amount,
+                },
+                ensure_ascii=False,
+            )
+            yield f'{separator}{item}'.encode()
+            separator = ','
+        yield b'[]' if separator == '[' else b']'
+
+
+class ShoppingCartPDFRenderer(ShoppingCartRenderer):
+    media_type = 'application/pdf'
+    format = 'pdf'
+    extension = 'pdf'
+    charset = None
+
+    def stream(self, rows):
+        writer = PdfWriter(settings.SHOPPING_CART_PDF_FONT)
+        return writer.document(
+            'Список покупок', (self.format_line(row) for row in rows),
+        )
+
+
+SHOPPING_CART_RENDERERS = [
+    ShoppingCartTextRenderer,
+    ShoppingCartCSVRenderer,
+    ShoppingCartJSONRenderer,
+    ShoppingCartPDFRenderer,
+]
@@ -1,6 +1,8 @@
+from .bulk import BulkIdsSerializer  # noqa: F401
 from .recipe_mini import RecipeMiniSerializer  # noqa: F401
 from .recipes import IngredientAmountSerializer  # noqa: F401
 from .recipes import (IngredientSerializer, RecipeReadSerializer,  # noqa: F401
-                      RecipeWriteSerializer, TagSerializer)
+                      RecipeWriteSerializer, ShoppingListItemSerializer,
+                      TagSerializer)
 from .users import (AvatarSerializer, SubscriptionSerializer,  # noqa: F401
                     UserProfileSerializer)
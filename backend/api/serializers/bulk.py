@@ -0,0 +1,32 @@
+from rest_framework import serializers
+
+from foodgram.constants import BULK_MAX_IDS
+
+
+class BulkIdsSerializer(serializers.Serializer):
+    """
+    Список id для пакетной операции.
+
+    Повторы убираются с сохранением порядка. Ответ — результат по
+    каждому id в том же порядке, см. get_results().
+    """
+
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=BULK_MAX_IDS,
+        error_messages={
+            'max_length': f'Не больше {BULK_MAX_IDS} id за запрос.',
+        },
+    )
+
+    def validate_ids(self, value):
+        return list(dict.fromkeys(value))
+
+    def get_results(self, statuses):
+        return {
+            'results': [
+                {'id': pk, 'status': statuses[pk]}
+                for pk in self.validated_data['ids']
+            ],
+        }
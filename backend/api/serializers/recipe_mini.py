@@ -1,6 +1,6 @@
-from drf_extra_fields.fields import Base64ImageField
 from rest_framework import serializers
 
+from foodgram.images import rendition_url
 from recipes.models import Recipe
 
 
@@ -8,8 +8,18 @@ class RecipeMiniSerializer(serializers.ModelSerializer):
     """
     Базовый сериализатор рецепта.
     """
-    image = Base64ImageField()
+    image = serializers.SerializerMethodField()
 
     class Meta:
         model = Recipe
         fields = ('id', 'name', 'image', 'cooking_time')
+
+    def get_image(self, obj):
+        """Миниатюра, пока её нет — исходная картинка."""
+        url = rendition_url(obj.image_renditions, 'thumbnail')
+        if url is None:
+            url = obj.image.url if obj.image else None
+        request = self.context.get('request')
+        if url and request is not None:
+            return request.build_absolute_uri(url)
+        return url
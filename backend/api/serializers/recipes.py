@@ -1,9 +1,17 @@
+from django.contrib.auth import get_user_model
+from django.db.models import F
 from django.db.transaction import atomic
-from drf_extra_fields.fields import Base64ImageField
 from rest_framework import serializers
 
+from api.fields import Base64ImageUploadField, PreloadedPrimaryKeyRelatedField
 from api.serializers.users import UserProfileSerializer
-from recipes.models import Ingredient, Recipe, RecipeIngredient, Tag
+from foodgram.images import file_hash, rendition_url, srcset
+from recipes.models import (Ingredient, Recipe, RecipeIngredient,
+                            ShoppingListItem, Tag)
+from recipes.search import update_search_index_on_commit
+from recipes.tasks import process_recipe_image
+
+User = get_user_model()
 
 
 class TagSerializer(serializers.ModelSerializer):
@@ -22,10 +30,21 @@ class IngredientSerializer(serializers.ModelSerializer):
         fields = ('id', 'name', 'measurement_unit')
 
 
+class IngredientAmountListSerializer(serializers.ListSerializer):
+    """Загружает все ингредиенты списка одним запросом."""
+
+    def to_internal_value(self, data):
+        if isinstance(data, list):
+            self.child.fields['id'].preload(
+                item.get('id') for item in data if isinstance(item, dict)
+            )
+        return super().to_internal_value(data)
+
+
 class IngredientAmountSerializer(serializers.ModelSerializer):
     """Сериализатор ингредиента с количеством."""
 
-    id = serializers.PrimaryKeyRelatedField(
+    id = PreloadedPrimaryKeyRelatedField(
         queryset=Ingredient.objects.all(),
         source='ingredient',
     )
@@ -37,6 +56,21 @@ class IngredientAmountSerializer(serializers.ModelSerializer):
     class Meta:
         model = RecipeIngredient
         fields = ('id', 'name', 'measurement_unit', 'amount')
+        list_serializer_class = IngredientAmountListSerializer
+
+
+class ShoppingListItemSerializer(serializers.ModelSerializer):
+    """Сериализатор строки агрегированного списка покупок."""
+
+    id = serializers.ReadOnlyField(source='ingredient.id')
+    name = serializers.ReadOnlyField(source='ingredient.name')
+    measurement_unit = serializers.ReadOnlyField(
+        source='ingredient.measurement_unit',
+    )
+
+    class Meta:
+        model = ShoppingListItem
+        fields = ('id', 'name', 'measurement_unit', 'amount')
 
 
 class RecipeReadSerializer(serializers.ModelSerializer):
@@ -51,6 +85,7 @@ class RecipeReadSerializer(serializers.ModelSerializer):
         default=False,
     )
     image = serializers.SerializerMethodField()
+    image_srcset = serializers.SerializerMethodField()
 
     class Meta:
         model = Recipe
@@ -63,13 +98,29 @@ class RecipeReadSerializer(serializers.ModelSerializer):
             'is_in_shopping_cart',
             'name',
             'image',
+            'image_srcset',
+            'image_status',
             'text',
             'cooking_time',
         )
 
     def get_image(self, obj):
+        """В ленте — картинка для карточки, в остальных ответах — полная."""
+        view = self.context.get('view')
+        if view is not None and view.action == 'list':
+            url = rendition_url(obj.image_renditions, 'card')
+            if url:
+                return url
         return obj.image.url if obj.image else None
 
+    def get_image_srcset(self, obj):
+        return srcset(obj.image_renditions)
+
+    def to_representation(self, instance):
+        if hasattr(instance, 'author_is_subscribed'):
+            instance.author.is_subscribed = instance.author_is_subscribed
+        return super().to_representation(instance)
+
 
 class RecipeWriteSerializer(serializers.ModelSerializer):
     """Сериализатор рецепта на запись."""
@@ -80,14 +131,14 @@ class RecipeWriteSerializer(serializers.ModelSerializer):
         allow_empty=False,
         required=True,
     )
-    tags = serializers.PrimaryKeyRelatedField(
+    tags = PreloadedPrimaryKeyRelatedField(
         queryset=Tag.objects.all(),
         many=True,
         write_only=True,
         allow_empty=False,
         required=True,
     )
-    image = Base64ImageField(required=True)
+    image = Base64ImageUploadField(required=True)
 
     class Meta:
         model = Recipe
@@ -156,19 +207,105 @@ class RecipeWriteSerializer(serializers.ModelSerializer):
         ingredients = validated_data.pop('ingredients')
         tags = validated_data.pop('tags')
         user = self.context['request'].user
+        validated_data['image_hash'] = file_hash(validated_data['image'])
         recipe = Recipe.objects.create(author=user, **validated_data)
         recipe.tags.set(tags)
         self.create_ingredients(recipe, ingredients)
+        process_recipe_image.delay(pk=recipe.pk, source=recipe.image.name)
+        User.objects.filter(pk=user.pk).update(
+            recipes_count=F('recipes_count') + 1,
+        )
         return recipe
 
+    def update_ingredients(self, recipe, ingredients_data):
+        """
+        Приводит строки RecipeIngredient к новому составу.
+
+        Новые ингредиенты добавляются, у оставшихся меняется только
+        количество, убранные удаляются одним запросом; неизменённые
+        строки не трогаются. Возвращает изменения количеств по
+        ингредиентам для списков покупок и признак того, что изменился
+        сам набор ингредиентов.
+        """
+        existing = {
+            row.ingredient_id: row for row in recipe.ingredients.all()
+        }
+        to_create = []
+        to_update = []
+        deltas = {}
+        for item in ingredients_data:
+            ingredient_id = item['ingredient'].id
+            amount = item['amount']
+            row = existing.pop(ingredient_id, None)
+            if row is None:
+                to_create.append(RecipeIngredient(
+                    recipe=recipe,
+                    ingredient=item['ingredient'],
+                    amount=amount,
+                ))
+                deltas[ingredient_id] = amount
+            elif row.amount != amount:
+                deltas[ingredient_id] = amount - row.amount
+                row.amount = amount
+                to_update.append(row)
+        for ingredient_id, row in existing.items():
+            deltas[ingredient_id] = -row.amount
+        if to_create:
+            RecipeIngredient.objects.bulk_create(to_create)
+        if to_update:
+            RecipeIngredient.objects.bulk_update(to_update, ['amount'])
+        if existing:
+            RecipeIngredient.objects.filter(
+                pk__in=[row.pk for row in existing.values()],
+            ).delete()
+        return deltas, bool(to_create or existing)
+
+    def update_shopping_lists(self, recipe, deltas):
+        """Переносит изменение состава рецепта в списки покупок."""
+        if deltas:
+            ShoppingListItem.objects.apply_deltas(
+                recipe.shoppingcart_set.values_list('user_id', flat=True),
+                deltas,
+            )
+
     @atomic
     def update(self, instance, validated_data):
         ingredients = validated_data.pop('ingredients')
         tags = validated_data.pop('tags')
-        instance = super().update(instance, validated_data)
+        image = validated_data.pop('image', None)
+        if image is not None:
+            image_hash = file_hash(image)
+            if image_hash != instance.image_hash:
+                # Ту же картинку клиент присылает при каждом редактировании:
+                # заново она не сохраняется и не обрабатывается.
+                validated_data.update(
+                    image=image,
+                    image_hash=image_hash,
+                    image_renditions={},
+                    image_status=Recipe.ImageStatus.PENDING,
+                )
+        changed = [
+            field
+            for field, value in validated_data.items()
+            if getattr(instance, field) != value
+        ]
+        for field in changed:
+            setattr(instance, field, validated_data[field])
+        if changed:
+            instance.save(update_fields=changed)
+        if 'image' in changed:
+            process_recipe_image.delay(
+                pk=instance.pk, source=instance.image.name,
+            )
+        # set() сам сравнивает с текущими тегами и меняет только разницу.
         instance.tags.set(tags)
-        instance.recipe_ingredients.clear()
-        self.create_ingredients(instance, ingredients)
+        deltas, composition_changed = self.update_ingredients(
+            instance, ingredients,
+        )
+        self.update_shopping_lists(instance, deltas)
+        if composition_changed:
+            # Строки состава пишутся пакетно, без сигналов.
+            update_search_index_on_commit([instance.pk])
         return instance
 
     def to_representation(self, instance):
@@ -1,8 +1,11 @@
 from django.contrib.auth import get_user_model
-from drf_extra_fields.fields import Base64ImageField
+from django.db import transaction
 from rest_framework import serializers
 
+from api.fields import Base64ImageUploadField
 from api.serializers.recipe_mini import RecipeMiniSerializer
+from foodgram.images import delete_unused_files, image_paths
+from users.tasks import process_avatar
 
 User = get_user_model()
 
@@ -23,12 +26,29 @@ class UserProfileSerializer(serializers.ModelSerializer):
         read_only_fields = fields
 
     def get_is_subscribed(self, obj):
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
         request = self.context.get('request')
-        return (
-            request
-            and request.user.is_authenticated
-            and obj.subscribers.filter(user=request.user).exists()
-        )
+        if not request or not request.user.is_authenticated:
+            return False
+        return obj.pk in self.get_subscribed_author_ids(request)
+
+    @staticmethod
+    def get_subscribed_author_ids(request):
+        """
+        Id авторов, на которых подписан текущий пользователь.
+
+        Загружаются одним запросом и кешируются на объекте запроса,
+        чтобы все вложенные сериализаторы отвечали из одного множества.
+        """
+        if not hasattr(request, '_subscribed_author_ids'):
+            request._subscribed_author_ids = set(
+                request.user.subscriptions.values_list(
+                    'author_id',
+                    flat=True,
+                )
+            )
+        return request._subscribed_author_ids
 
     def get_avatar(self, obj):
         return obj.avatar.url if obj.avatar else None
@@ -37,12 +57,22 @@ class UserProfileSerializer(serializers.ModelSerializer):
 class AvatarSerializer(serializers.ModelSerializer):
     """Сериализатор аватара."""
 
-    avatar = Base64ImageField(required=True)
+    avatar = Base64ImageUploadField(required=True)
 
     class Meta:
         model = User
         fields = ('avatar',)
 
+    def update(self, instance, validated_data):
+        paths = image_paths(instance.avatar, instance.avatar_renditions)
+        validated_data['avatar_renditions'] = {}
+        instance = super().update(instance, validated_data)
+        transaction.on_commit(
+            lambda: delete_unused_files(paths, User, 'avatar')
+        )
+        process_avatar.delay(pk=instance.pk, source=instance.avatar.name)
+        return instance
+
     def to_representation(self, instance):
         return {
             'avatar': instance.avatar.url
@@ -64,13 +94,19 @@ class SubscriptionSerializer(UserProfileSerializer):
             'recipes', 'recipes_count',
         )
 
-    def get_recipes(self, obj):
-        request = self.context.get('request')
+    @staticmethod
+    def get_recipes_limit(request):
         limit = (
             request.query_params.get('recipes_limit')
             if request else None
         )
+        return int(limit) if limit and limit.isdigit() else None
+
+    def get_recipes(self, obj):
+        if hasattr(obj, 'latest_recipes'):
+            return RecipeMiniSerializer(obj.latest_recipes, many=True).data
+        limit = self.get_recipes_limit(self.context.get('request'))
         queryset = obj.recipes.all()
-        if limit and limit.isdigit():
-            queryset = queryset[:int(limit)]
+        if limit is not None:
+            queryset = queryset[:limit]
         return RecipeMiniSerializer(queryset, many=True).data
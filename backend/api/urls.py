@@ -1,7 +1,8 @@
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
-from api.views import IngredientViewSet, RecipeViewSet, TagViewSet, UserViewSet
+from api.views import (IngredientViewSet, RecipeViewSet, TagViewSet,
+                       UserViewSet, request_metrics)
 
 router = DefaultRouter()
 router.register('tags', TagViewSet, basename='tags')
@@ -10,6 +11,7 @@ router.register('recipes', RecipeViewSet, basename='recipes')
 router.register('users', UserViewSet, basename='users')
 
 urlpatterns = [
+    path('metrics/requests/', request_metrics, name='request-metrics'),
     path('', include(router.urls)),
     path('', include('djoser.urls')),
     path('auth/', include('djoser.urls.authtoken')),
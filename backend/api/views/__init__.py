@@ -1,3 +1,4 @@
+from .metrics import request_metrics  # noqa: F401
 from .recipes import (IngredientViewSet, RecipePagination,  # noqa: F401
                       RecipeViewSet, TagViewSet)
 from .users import UserPagination, UserViewSet  # noqa: F401
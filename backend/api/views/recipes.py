@@ -1,5 +1,8 @@
-from django.db.models import Sum
-from django.http import HttpResponse
+from django.contrib.auth import get_user_model
+from django.core.handlers.asgi import ASGIRequest
+from django.db.models import F
+from django.db.transaction import atomic
+from django.http import Http404, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from django.urls import reverse
 from django_filters.rest_framework import DjangoFilterBackend
@@ -10,17 +13,27 @@ from rest_framework.permissions import (AllowAny, IsAuthenticated,
 from rest_framework.response import Response
 
 from api.filters import IngredientFilter, RecipeFilter
+from api.mixins import CachedReferenceListMixin
 from api.pagination import RecipePagination
 from api.permissions import IsAuthorOrReadOnly
+from api.renderers import SHOPPING_CART_RENDERERS
+from api.serializers.bulk import BulkIdsSerializer
 from api.serializers.recipe_mini import RecipeMiniSerializer
 from api.serializers.recipes import (IngredientSerializer,
                                      RecipeReadSerializer,
-                                     RecipeWriteSerializer, TagSerializer)
-from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
-                            ShoppingCart, Tag)
+                                     RecipeWriteSerializer,
+                                     ShoppingListItemSerializer, TagSerializer)
+from foodgram.metrics import (RECIPE_RELATIONS, RECIPES_CREATED,
+                              SHOPPING_CART_DOWNLOADS)
+from recipes.autocomplete import ingredient_index
+from recipes.models import (Favorite, Ingredient, Recipe, ShoppingCart,
+                            ShoppingListItem, Tag)
+from recipes.shortlinks import short_links
 
+User = get_user_model()
 
-class TagViewSet(viewsets.ReadOnlyModelViewSet):
+
+class TagViewSet(CachedReferenceListMixin, viewsets.ReadOnlyModelViewSet):
     """Вьюсет тегов."""
 
     queryset = Tag.objects.all()
@@ -29,7 +42,8 @@ class TagViewSet(viewsets.ReadOnlyModelViewSet):
     permission_classes = [AllowAny]
 
 
-class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
+class IngredientViewSet(CachedReferenceListMixin,
+                        viewsets.ReadOnlyModelViewSet):
     """Вьюсет ингредиентов."""
 
     queryset = Ingredient.objects.all()
@@ -39,6 +53,16 @@ class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
     filter_backends = [DjangoFilterBackend]
     filterset_class = IngredientFilter
 
+    def get_reference_data(self, request, *args, **kwargs):
+        """Поиск по названию обслуживается индексом в памяти процесса."""
+        name = request.query_params.get('name')
+        if not name:
+            return super().get_reference_data(request, *args, **kwargs)
+        limit = request.query_params.get('limit', '')
+        # Как в пагинации DRF: limit=0 или не число — без ограничения.
+        limit = int(limit) if limit.isdigit() else 0
+        return ingredient_index.search(name, limit=limit or None)
+
 
 class RecipeViewSet(viewsets.ModelViewSet):
     """Вьюсет рецептов."""
@@ -55,26 +79,54 @@ class RecipeViewSet(viewsets.ModelViewSet):
         return RecipeWriteSerializer
 
     def get_queryset(self):
-        return Recipe.objects.with_user_annotations(self.request.user)
+        queryset = Recipe.objects.with_user_annotations(self.request.user)
+        if self.action in ('list', 'retrieve'):
+            queryset = queryset.with_related()
+        return queryset
+
+    def perform_create(self, serializer):
+        super().perform_create(serializer)
+        RECIPES_CREATED.inc()
+
+    @atomic
+    def perform_destroy(self, instance):
+        User.objects.filter(pk=instance.author_id).update(
+            recipes_count=F('recipes_count') - 1,
+        )
+        ShoppingListItem.objects.remove_recipe(
+            instance.shoppingcart_set.values_list('user_id', flat=True),
+            instance,
+        )
+        instance.delete()
 
+    @atomic
     def _add_to_model(self, request, pk, model):
         user = request.user
         recipe = get_object_or_404(Recipe, pk=pk)
+        User.objects.filter(pk=user.pk).lock()
         obj, created = model.objects.get_or_create(user=user, recipe=recipe)
         if not created:
             return Response(
                 {'detail': f'Рецепт уже в {model._meta.verbose_name}.'},
                 status=status.HTTP_400_BAD_REQUEST,
             )
+        Recipe.objects.filter(pk=recipe.pk).update(
+            **{model.recipe_counter: F(model.recipe_counter) + 1},
+        )
+        if model is ShoppingCart:
+            ShoppingListItem.objects.add_recipe([user.pk], recipe)
+        RECIPE_RELATIONS.labels(model._meta.model_name, 'add').inc()
         serializer = RecipeMiniSerializer(
             recipe,
             context={'request': request},
         )
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
+    @atomic
     def _remove_from_model(self, request, pk, model):
         user = request.user
         recipe = get_object_or_404(Recipe, pk=pk)
+        User.objects.filter(pk=user.pk).lock()
         deleted, _ = model.objects.filter(
             user=user,
             recipe=recipe,
@@ -84,19 +136,103 @@ class RecipeViewSet(viewsets.ModelViewSet):
                 {'detail': f'Рецепта нет в {model._meta.verbose_name}.'},
                 status=status.HTTP_400_BAD_REQUEST,
             )
+        Recipe.objects.filter(pk=recipe.pk).update(
+            **{model.recipe_counter: F(model.recipe_counter) - 1},
+        )
+        if model is ShoppingCart:
+            ShoppingListItem.objects.remove_recipe([user.pk], recipe)
+        RECIPE_RELATIONS.labels(model._meta.model_name, 'remove').inc()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
+    def _get_bulk_targets(self, request, model):
+        """
+        Разбирает пакет id: найденные рецепты и уже связанные с ними.
+
+        Строка пользователя блокируется до конца транзакции, как и в
+        одиночных добавлениях и удалениях, поэтому другие запросы того же
+        пользователя не меняют связи между проверкой и записью.
+        """
+        serializer = BulkIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = serializer.validated_data['ids']
+        user = request.user
+        User.objects.filter(pk=user.pk).lock()
+        found = set(
+            Recipe.objects.filter(pk__in=ids).values_list('pk', flat=True)
+        )
+        related = set(
+            model.objects.filter(user=user, recipe_id__in=found)
+            .values_list('recipe_id', flat=True)
+        )
+        return serializer, found, related
+
+    @atomic
+    def _bulk_add_to_model(self, request, model):
+        user = request.user
+        serializer, found, related = self._get_bulk_targets(request, model)
+        added = [
+            pk for pk in serializer.validated_data['ids']
+            if pk in found and pk not in related
+        ]
+        if added:
+            model.objects.bulk_create(
+                [model(user=user, recipe_id=pk) for pk in added],
+            )
+            Recipe.objects.filter(pk__in=added).update(
+                **{model.recipe_counter: F(model.recipe_counter) + 1},
+            )
+            if model is ShoppingCart:
+                ShoppingListItem.objects.add_recipes([user.pk], added)
+            RECIPE_RELATIONS.labels(model._meta.model_name, 'add').inc(
+                len(added),
+            )
+        return Response(serializer.get_results({
+            pk: (
+                'not_found' if pk not in found
+                else 'exists' if pk in related
+                else 'added'
+            )
+            for pk in serializer.validated_data['ids']
+        }))
+
+    @atomic
+    def _bulk_remove_from_model(self, request, model):
+        user = request.user
+        serializer, found, related = self._get_bulk_targets(request, model)
+        if related:
+            model.objects.filter(user=user, recipe_id__in=related).delete()
+            Recipe.objects.filter(pk__in=related).update(
+                **{model.recipe_counter: F(model.recipe_counter) - 1},
+            )
+            if model is ShoppingCart:
+                ShoppingListItem.objects.remove_recipes([user.pk], related)
+            RECIPE_RELATIONS.labels(model._meta.model_name, 'remove').inc(
+                len(related),
+            )
+        return Response(serializer.get_results({
+            pk: (
+                'not_found' if pk not in found
+                else 'removed' if pk in related
+                else 'absent'
+            )
+            for pk in serializer.validated_data['ids']
+        }))
+
     @action(
         detail=True,
         methods=['get'],
         url_path='get-link',
     )
     def get_link(self, request, pk=None):
-        recipe = get_object_or_404(Recipe, pk=pk)
+        short_code = (
+            short_links.get_short_code(int(pk)) if pk.isdigit() else None
+        )
+        if short_code is None:
+            raise Http404
         short_url = request.build_absolute_uri(
             reverse(
                 'redirect_short_link',
-                kwargs={'short_code': recipe.short_code},
+                kwargs={'short_code': short_code},
             )
         )
         return Response(
@@ -116,37 +252,74 @@ class RecipeViewSet(viewsets.ModelViewSet):
     def remove_from_cart(self, request, pk=None):
         return self._remove_from_model(request, pk, ShoppingCart)
 
+    @action(
+        detail=False,
+        methods=['post'],
+        url_path='shopping_cart/bulk',
+        permission_classes=[IsAuthenticated],
+    )
+    def shopping_cart_bulk(self, request):
+        """Добавляет в список покупок рецепты из {"ids": [...]}."""
+        return self._bulk_add_to_model(request, ShoppingCart)
+
+    @shopping_cart_bulk.mapping.delete
+    def remove_from_cart_bulk(self, request):
+        return self._bulk_remove_from_model(request, ShoppingCart)
+
     @action(
         detail=False,
         methods=['get'],
         url_path='download_shopping_cart',
         permission_classes=[IsAuthenticated],
+        renderer_classes=SHOPPING_CART_RENDERERS,
     )
     def download_shopping_cart(self, request):
-        user = request.user
+        """
+        Список покупок в формате из ?format= (txt, csv, json, pdf).
+
+        Строки готового списка покупок читаются итератором и отдаются
+        клиенту по мере формирования документа. Под ASGI Django 3.2
+        перебирает потоковый ответ в цикле событий, где ORM недоступен,
+        поэтому строки читаются заранее, в потоке представления.
+        """
+        renderer = request.accepted_renderer
         ingredients = (
-            RecipeIngredient.objects
-            .filter(recipe__shoppingcart_set__user=user)
-            .values(
+            request.user.shopping_list
+            .values_list(
                 'ingredient__name',
                 'ingredient__measurement_unit',
+                'amount',
             )
-            .annotate(total_amount=Sum('amount'))
             .order_by('ingredient__name')
         )
-        lines = [
-            f"{item['ingredient__name']} "
-            f"({item['ingredient__measurement_unit']}) — "
-            f"{item['total_amount']}"
-            for item in ingredients
-        ]
-        content = '\n'.join(lines)
-        response = HttpResponse(content, content_type='text/plain')
+        if isinstance(request._request, ASGIRequest):
+            rows = list(ingredients)
+        else:
+            rows = ingredients.iterator()
+        response = StreamingHttpResponse(
+            renderer.stream(rows),
+            content_type=renderer.content_type,
+        )
         response['Content-Disposition'] = (
-            'attachment; filename="shopping_cart.txt"'
+            f'attachment; filename="shopping_cart.{renderer.extension}"'
         )
+        SHOPPING_CART_DOWNLOADS.labels(renderer.format).inc()
         return response
 
+    @action(
+        detail=False,
+        methods=['get'],
+        permission_classes=[IsAuthenticated],
+    )
+    def shopping_list(self, request):
+        items = (
+            request.user.shopping_list
+            .select_related('ingredient')
+            .order_by('ingredient__name')
+        )
+        serializer = ShoppingListItemSerializer(items, many=True)
+        return Response(serializer.data)
+
     @action(
         detail=True,
         methods=['post'],
@@ -158,3 +331,17 @@ class RecipeViewSet(viewsets.ModelViewSet):
     @favorite.mapping.delete
     def remove_from_favorite(self, request, pk=None):
         return self._remove_from_model(request, pk, Favorite)
+
+    @action(
+        detail=False,
+        methods=['post'],
+        url_path='favorite/bulk',
+        permission_classes=[IsAuthenticated],
+    )
+    def favorite_bulk(self, request):
+        """Добавляет в избранное рецепты из {"ids": [...]}."""
+        return self._bulk_add_to_model(request, Favorite)
+
+    @favorite_bulk.mapping.delete
+    def remove_from_favorite_bulk(self, request):
+        return self._bulk_remove_from_model(request, Favorite)
@@ -1,5 +1,7 @@
 from django.contrib.auth import get_user_model
-from django.db.models import Count
+from django.db import transaction
+from django.db.models import F, Prefetch
+from django.db.transaction import atomic
 from django.shortcuts import get_object_or_404
 from djoser.views import UserViewSet as DjoserUserViewSet
 from rest_framework import status
@@ -7,8 +9,10 @@ from rest_framework.decorators import action
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 
-from api.serializers import (AvatarSerializer, SubscriptionSerializer,
-                             UserProfileSerializer)
+from api.serializers import (AvatarSerializer, BulkIdsSerializer,
+                             SubscriptionSerializer, UserProfileSerializer)
+from foodgram.images import delete_unused_files, image_paths
+from recipes.models import Recipe
 from users.models import Subscription
 from users.pagination import UserPagination
 
@@ -21,6 +25,19 @@ class UserViewSet(DjoserUserViewSet):
     pagination_class = UserPagination
     permission_classes = [AllowAny]
 
+    def get_queryset(self):
+        return super().get_queryset().with_is_subscribed(self.request.user)
+
+    def with_latest_recipes(self, queryset):
+        """Подгружает рецепты авторов одним запросом на страницу."""
+        limit = SubscriptionSerializer.get_recipes_limit(self.request)
+        recipes = Recipe.objects.all()
+        if limit is not None:
+            recipes = recipes.latest_per_author(limit)
+        return queryset.prefetch_related(
+            Prefetch('recipes', queryset=recipes, to_attr='latest_recipes'),
+        )
+
     @action(
         detail=False,
         methods=['get'],
@@ -57,7 +74,13 @@ class UserViewSet(DjoserUserViewSet):
                 {'detail': 'Аватар не установлен.'},
                 status=status.HTTP_400_BAD_REQUEST,
             )
-        user.avatar.delete(save=True)
+        paths = image_paths(user.avatar, user.avatar_renditions)
+        user.avatar = None
+        user.avatar_renditions = {}
+        user.save(update_fields=['avatar', 'avatar_renditions'])
+        transaction.on_commit(
+            lambda: delete_unused_files(paths, User, 'avatar')
+        )
         return Response(status=status.HTTP_204_NO_CONTENT)
 
     @action(
@@ -70,9 +93,10 @@ class UserViewSet(DjoserUserViewSet):
     def subscriptions(self, request):
         queryset = User.objects.filter(
             subscribers__user=request.user
-        ).annotate(
-            recipes_count=Count('recipes')
+        ).with_is_subscribed(
+            request.user
         ).order_by('username')
+        queryset = self.with_latest_recipes(queryset)
 
         page = self.paginate_queryset(queryset)
         serializer = self.get_serializer(
@@ -88,10 +112,11 @@ class UserViewSet(DjoserUserViewSet):
         permission_classes=[IsAuthenticated],
         serializer_class=SubscriptionSerializer,
     )
+    @atomic
     def subscribe(self, request, id=None):
         user = request.user
         author = get_object_or_404(
-            User.objects.annotate(recipes_count=Count('recipes')),
+            self.with_latest_recipes(User.objects.all()),
             id=id,
         )
 
@@ -101,6 +126,7 @@ class UserViewSet(DjoserUserViewSet):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
+        User.objects.filter(pk=user.pk).lock()
         subscription, created = Subscription.objects.get_or_create(
             user=user,
             author=author,
@@ -110,6 +136,9 @@ class UserViewSet(DjoserUserViewSet):
                 {'detail': 'Вы уже подписаны на этого пользователя.'},
                 status=status.HTTP_400_BAD_REQUEST,
             )
+        User.objects.filter(pk=author.pk).update(
+            subscribers_count=F('subscribers_count') + 1,
+        )
 
         serializer = self.get_serializer(
             author,
@@ -118,9 +147,11 @@ class UserViewSet(DjoserUserViewSet):
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     @subscribe.mapping.delete
+    @atomic
     def unsubscribe(self, request, id=None):
         user = request.user
         author = get_object_or_404(User, id=id)
+        User.objects.filter(pk=user.pk).lock()
         deleted_count, _ = Subscription.objects.filter(
             user=user,
             author=author,
@@ -131,5 +162,79 @@ class UserViewSet(DjoserUserViewSet):
                 {'detail': 'Вы не подписаны на этого пользователя.'},
                 status=status.HTTP_400_BAD_REQUEST,
             )
+        User.objects.filter(pk=author.pk).update(
+            subscribers_count=F('subscribers_count') - 1,
+        )
 
         return Response(status=status.HTTP_204_NO_CONTENT)
+
+    def _get_bulk_targets(self, request):
+        """Найденные авторы из пакета id и уже имеющиеся подписки на них."""
+        serializer = BulkIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = serializer.validated_data['ids']
+        user = request.user
+        # Подписки пользователя не меняются между проверкой и записью:
+        # одиночные подписка и отписка берут ту же блокировку.
+        User.objects.filter(pk=user.pk).lock()
+        found = set(
+            User.objects.filter(pk__in=ids).values_list('pk', flat=True)
+        )
+        subscribed = set(
+            Subscription.objects.filter(user=user, author_id__in=found)
+            .values_list('author_id', flat=True)
+        )
+        return serializer, found, subscribed
+
+    @action(
+        detail=False,
+        methods=['post'],
+        url_path='subscribe/bulk',
+        permission_classes=[IsAuthenticated],
+    )
+    @atomic
+    def subscribe_bulk(self, request):
+        """Подписка на авторов из {"ids": [...]}."""
+        user = request.user
+        serializer, found, subscribed = self._get_bulk_targets(request)
+        added = [
+            pk for pk in serializer.validated_data['ids']
+            if pk in found and pk not in subscribed and pk != user.pk
+        ]
+        if added:
+            Subscription.objects.bulk_create(
+                [Subscription(user=user, author_id=pk) for pk in added],
+            )
+            User.objects.filter(pk__in=added).update(
+                subscribers_count=F('subscribers_count') + 1,
+            )
+        return Response(serializer.get_results({
+            pk: (
+                'not_found' if pk not in found
+                else 'self' if pk == user.pk
+                else 'exists' if pk in subscribed
+                else 'added'
+            )
+            for pk in serializer.validated_data['ids']
+        }))
+
+    @subscribe_bulk.mapping.delete
+    @atomic
+    def unsubscribe_bulk(self, request):
+        serializer, found, subscribed = self._get_bulk_targets(request)
+        if subscribed:
+            Subscription.objects.filter(
+                user=request.user,
+                author_id__in=subscribed,
+            ).delete()
+            User.objects.filter(pk__in=subscribed).update(
+                subscribers_count=F('subscribers_count') - 1,
+            )
+        return Response(serializer.get_results({
+            pk: (
+                'not_found' if pk not in found
+                else 'removed' if pk in subscribed
+                else 'absent'
+            )
+            for pk in serializer.validated_data['ids']
+        }))
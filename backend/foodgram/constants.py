@@ -4,6 +4,15 @@ from django.core.validators import RegexValidator
 BASIC_PAGE_SIZE = 6
 MAX_LIMIT_PAGE_SIZE = 100
 
+# Кеширование справочников (теги, ингредиенты), секунды
+REFERENCE_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Кеш коротких ссылок: размеры LRU в процессе и время жизни, секунды
+SHORT_LINK_LRU_SIZE = 10000
+SHORT_LINK_NEGATIVE_LRU_SIZE = 1000
+SHORT_LINK_NEGATIVE_TTL = 60
+SHORT_LINK_CACHE_TIMEOUT = 60 * 60 * 24 * 7
+
 # Ограничения длины
 EMAIL_MAX_LENGTH = 254
 USERNAME_MAX_LENGTH = 150
@@ -19,6 +28,29 @@ RECIPE_NAME_MAX_LENGTH = 256
 
 UUID_MAX_LENGTH = 22
 
+# Размеры рендиций изображений (длинная сторона), пиксели
+RECIPE_IMAGE_RENDITIONS = {'thumbnail': 160, 'card': 640, 'full': 1280}
+AVATAR_IMAGE_RENDITIONS = {'full': 256}
+
+# Загрузка картинок в base64: предельный размер после декодирования и
+# размер куска потокового разбора, байты
+IMAGE_UPLOAD_MAX_SIZE = 20 * 1024 * 1024
+UPLOAD_CHUNK_SIZE = 64 * 1024
+
+# Сколько хранится исходный файл после построения рендиций, секунды:
+# его URL уже отдан клиенту в ответе на загрузку
+IMAGE_SOURCE_TTL = 60 * 60
+
+# Фоновые задачи: попытки, задержка перед повтором и время, после
+# которого задача упавшего воркера отдаётся другому, секунды
+TASK_NAME_MAX_LENGTH = 128
+TASK_MAX_ATTEMPTS = 5
+TASK_RETRY_DELAY = 10
+TASK_LOCK_TIMEOUT = 600
+
+# Наибольшее число id в одном пакетном запросе
+BULK_MAX_IDS = 100
+
 COOKING_TIME_MIN = 1
 COOKING_TIME_MAX = 1440
 
@@ -0,0 +1,157 @@
+"""
+Обработка загруженных изображений.
+
+Картинка декодируется один раз, поворачивается по EXIF-ориентации и
+сохраняется заново без метаданных в нескольких размерах (рендициях).
+Имена файлов — хеш содержимого, поэтому одинаковые рендиции
+записываются один раз, а URL меняется вместе с картинкой и может
+кешироваться браузером бессрочно. Сведения о рендициях хранятся в
+JSON-поле модели: {'card': {'width': …, 'height': …, 'webp': путь,
+'jpeg': путь}, …}.
+"""
+import hashlib
+import io
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+# Ошибки Pillow и хранилища, после которых повторять обработку бесполезно
+IMAGE_ERRORS = (OSError, ValueError, SyntaxError, Image.DecompressionBombError)
+
+FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+
+def file_hash(file):
+    """SHA-256 содержимого загруженного файла."""
+    digest = hashlib.sha256()
+    for chunk in file.chunks():
+        digest.update(chunk)
+    file.seek(0)
+    return digest.hexdigest()
+
+
+def decode(file, max_size):
+    """Открывает картинку, применяет EXIF-ориентацию и убирает альфу."""
+    file.seek(0)
+    image = Image.open(file)
+    # JPEG можно сразу декодировать в уменьшенном масштабе.
+    image.draft('RGB', (max_size, max_size))
+    image = ImageOps.exif_transpose(image)
+    if image.mode in ('RGBA', 'LA') or 'transparency' in image.info:
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, 'white')
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    return image.convert('RGB')
+
+
+def encode(image, image_format):
+    pil_format, options = FORMATS[image_format]
+    buffer = io.BytesIO()
+    image.save(buffer, pil_format, **options)
+    return buffer.getvalue()
+
+
+def build_renditions(file, sizes, upload_to, formats=('webp', 'jpeg')):
+    """Записывает рендиции в хранилище и возвращает их описание."""
+    image = decode(file, max(sizes.values()))
+    renditions = {}
+    for name, size in sizes.items():
+        variant = image.copy()
+        variant.thumbnail((size, size), Image.LANCZOS)
+        rendition = {'width': variant.width, 'height': variant.height}
+        for image_format in formats:
+            data = encode(variant, image_format)
+            path = (
+                f'{upload_to}{hashlib.sha256(data).hexdigest()[:20]}'
+                f'.{image_format}'
+            )
+            if not default_storage.exists(path):
+                default_storage.save(path, ContentFile(data))
+            rendition[image_format] = path
+        renditions[name] = rendition
+    return renditions
+
+
+def process_image_field(instance, field_name, renditions_field, sizes,
+                        formats=('webp', 'jpeg'), delete_source=True,
+                        **values):
+    """
+    Заменяет загруженный файл поля рендициями.
+
+    В само поле записывается JPEG наибольшей рендиции, поэтому клиенты,
+    которые знают только его, тоже получают очищенную и уменьшенную
+    картинку; values дописываются в ту же строку. Строка обновляется,
+    только если в поле всё ещё исходный файл: картинку, заменённую за
+    время обработки, результат не затирает, и тогда возвращается None.
+    Исходный файл удаляется из хранилища.
+    """
+    field = getattr(instance, field_name)
+    source = field.name
+    upload_to = instance._meta.get_field(field_name).upload_to
+    with field.open('rb') as file:
+        renditions = build_renditions(file, sizes, upload_to, formats)
+    largest = max(sizes, key=sizes.get)
+    values[field_name] = renditions[largest]['jpeg']
+    values[renditions_field] = renditions
+    updated = type(instance).objects.filter(
+        pk=instance.pk, **{field_name: source},
+    ).update(**values)
+    if not updated:
+        return None
+    for name, value in values.items():
+        setattr(instance, name, value)
+    if delete_source and source != values[field_name]:
+        default_storage.delete(source)
+    return renditions
+
+
+def image_paths(field, renditions):
+    """Пути исходного файла поля и всех его рендиций в хранилище."""
+    paths = {field.name} if field else set()
+    for rendition in renditions.values():
+        paths.update(
+            value for key, value in rendition.items() if key in FORMATS
+        )
+    return paths
+
+
+def delete_unused_files(paths, model, field_name):
+    """
+    Удаляет файлы, на которые не ссылается поле ни одного объекта.
+
+    Рендиции названы по содержимому, одинаковые картинки разных объектов
+    делят файлы: такие остаются в хранилище.
+    """
+    paths = set(paths)
+    used = set(
+        model.objects.filter(**{f'{field_name}__in': paths})
+        .values_list(field_name, flat=True)
+    )
+    for path in paths - used:
+        default_storage.delete(path)
+
+
+def rendition_url(renditions, name, image_format='jpeg'):
+    """URL рендиции или None, если картинка ещё не обработана."""
+    path = renditions.get(name, {}).get(image_format)
+    return default_storage.url(path) if path else None
+
+
+def srcset(renditions):
+    """Строки srcset по форматам: {'webp': 'url 160w, url 640w', …}."""
+    if not renditions:
+        return None
+    ordered = sorted(renditions.values(), key=lambda item: item['width'])
+    return {
+        image_format: ', '.join(
+            f'{default_storage.url(item[image_format])} {item["width"]}w'
+            for item in ordered
+        )
+        for image_format in FORMATS
+        if all(image_format in item for item in ordered)
+    }
@@ -0,0 +1,103 @@
+"""
+Метрики Prometheus.
+
+Под gunicorn с несколькими воркерами переменная окружения
+PROMETHEUS_MULTIPROC_DIR включает многопроцессный режим
+prometheus_client: каждый воркер пишет значения в файлы общего каталога,
+а эндпоинт /metrics собирает их все. Каталог очищается при старте
+gunicorn, файлы завершившихся воркеров помечаются в child_exit
+(см. gunicorn.conf.py).
+"""
+import os
+
+from django.http import HttpResponse
+from prometheus_client import (CONTENT_TYPE_LATEST, REGISTRY,
+                               CollectorRegistry, Counter, Histogram,
+                               generate_latest, multiprocess)
+
+REQUEST_DURATION = Histogram(
+    'foodgram_request_duration_seconds',
+    'Время ответа по представлениям',
+    ['view', 'method'],
+)
+REQUESTS = Counter(
+    'foodgram_requests_total',
+    'Запросы по представлениям и статусам ответа',
+    ['view', 'method', 'status'],
+)
+REQUEST_DB_QUERIES = Histogram(
+    'foodgram_request_db_queries',
+    'Количество SQL-запросов на запрос',
+    ['view'],
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89),
+)
+REQUEST_DB_DURATION = Histogram(
+    'foodgram_request_db_duration_seconds',
+    'Время в БД на запрос',
+    ['view'],
+)
+CACHE_LOOKUPS = Counter(
+    'foodgram_cache_lookups_total',
+    'Обращения к кешу: попадания и промахи',
+    ['cache', 'result'],
+)
+
+RECIPES_CREATED = Counter(
+    'foodgram_recipes_created_total',
+    'Созданные рецепты',
+)
+RECIPE_RELATIONS = Counter(
+    'foodgram_recipe_relations_total',
+    'Добавления и удаления рецептов в избранном и списке покупок',
+    ['relation', 'action'],
+)
+SHOPPING_CART_DOWNLOADS = Counter(
+    'foodgram_shopping_cart_downloads_total',
+    'Скачивания списка покупок',
+    ['format'],
+)
+SHORT_LINK_REDIRECTS = Counter(
+    'foodgram_short_link_redirects_total',
+    'Переходы по коротким ссылкам',
+    ['result'],
+)
+BACKGROUND_TASKS = Counter(
+    'foodgram_background_tasks_total',
+    'Выполненные фоновые задачи',
+    ['task', 'result'],
+)
+BACKGROUND_TASK_DURATION = Histogram(
+    'foodgram_background_task_duration_seconds',
+    'Время выполнения фоновых задач',
+    ['task'],
+)
+
+
+def observe_request(view, method, status, duration, queries, db_duration):
+    """Учитывает запрос; время передаётся в секундах."""
+    REQUEST_DURATION.labels(view, method).observe(duration)
+    REQUESTS.labels(view, method, status).inc()
+    REQUEST_DB_QUERIES.labels(view).observe(queries)
+    REQUEST_DB_DURATION.labels(view).observe(db_duration)
+
+
+def observe_cache(cache, hit):
+    CACHE_LOOKUPS.labels(cache, 'hit' if hit else 'miss').inc()
+
+
+def observe_task(task, result, duration):
+    BACKGROUND_TASKS.labels(task, result).inc()
+    BACKGROUND_TASK_DURATION.labels(task).observe(duration)
+
+
+def metrics_view(request):
+    """Метрики в текстовом формате Prometheus."""
+    if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return HttpResponse(
+        generate_latest(registry),
+        content_type=CONTENT_TYPE_LATEST,
+    )
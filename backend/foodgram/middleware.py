@@ -0,0 +1,270 @@
+"""
+Метрики запросов: число SQL-запросов, время в БД, в коде и на рендеринг.
+
+Для каждого запроса результаты отдаются в заголовке Server-Timing и
+пишутся JSON-строкой в лог foodgram.requests. Повторы одного и того же
+SQL больше REQUEST_METRICS_N_PLUS_ONE раз помечаются как N+1. Гистограммы
+времени по представлениям копятся в памяти процесса, см. request_stats,
+и передаются в Prometheus, см. foodgram.metrics.
+"""
+import asyncio
+import json
+import logging
+import re
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+from foodgram.metrics import observe_request
+
+logger = logging.getLogger('foodgram.requests')
+
+IN_LIST = re.compile(r'\(\s*%s(?:\s*,\s*%s)*\s*\)')
+
+
+def get_view_name(request, view_func):
+    """Имя представления: basename.action для вьюсетов DRF."""
+    actions = getattr(view_func, 'actions', None)
+    if actions:
+        basename = view_func.initkwargs.get('basename')
+        action = actions.get(request.method.lower(), request.method.lower())
+        return f'{basename}.{action}'
+    if request.resolver_match is not None:
+        return request.resolver_match.view_name
+    return view_func.__name__
+
+
+class QueryRecorder:
+    """SQL одного HTTP-запроса: количество, суммарное время и формы."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.shapes = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+            self.shapes[IN_LIST.sub('(%s, ...)', sql)] += 1
+
+    def repeated(self, threshold):
+        return [
+            {'sql': sql, 'count': count}
+            for sql, count in self.shapes.most_common()
+            if count > threshold
+        ]
+
+
+class RequestStats:
+    """Гистограммы времени ответа и счётчики запросов по представлениям."""
+
+    buckets = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._views = {}
+
+    def add(self, view, total, queries, db):
+        with self._lock:
+            stats = self._views.setdefault(view, {
+                'count': 0,
+                'total_ms': 0.0,
+                'db_ms': 0.0,
+                'queries': 0,
+                'max_queries': 0,
+                'buckets': [0] * (len(self.buckets) + 1),
+            })
+            stats['count'] += 1
+            stats['total_ms'] += total
+            stats['db_ms'] += db
+            stats['queries'] += queries
+            stats['max_queries'] = max(stats['max_queries'], queries)
+            for position, bound in enumerate(self.buckets):
+                if total <= bound:
+                    break
+            else:
+                position = len(self.buckets)
+            stats['buckets'][position] += 1
+
+    def snapshot(self):
+        """Копия статистики; бакеты накопительные, как в Prometheus."""
+        with self._lock:
+            views = {
+                view: dict(stats, buckets=list(stats['buckets']))
+                for view, stats in self._views.items()
+            }
+        result = {}
+        for view, stats in sorted(views.items()):
+            running, buckets = 0, {}
+            for bound, count in zip(
+                (*map(str, self.buckets), '+Inf'), stats['buckets'],
+            ):
+                running += count
+                buckets[bound] = running
+            result[view] = {
+                'count': stats['count'],
+                'avg_ms': round(stats['total_ms'] / stats['count'], 2),
+                'avg_db_ms': round(stats['db_ms'] / stats['count'], 2),
+                'avg_queries': round(stats['queries'] / stats['count'], 2),
+                'max_queries': stats['max_queries'],
+                'buckets_ms': buckets,
+            }
+        return result
+
+
+request_stats = RequestStats()
+
+current_recorder = ContextVar('current_recorder', default=None)
+
+
+def record_query(execute, sql, params, many, context):
+    """Обёртка соединений: передаёт запрос в QueryRecorder запроса."""
+    recorder = current_recorder.get()
+    if recorder is None:
+        return execute(sql, params, many, context)
+    return recorder(execute, sql, params, many, context)
+
+
+def install_query_recorder(sender=None, connection=None, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+connection_created.connect(install_query_recorder)
+
+
+class RequestMetricsMiddleware:
+    """
+    Замер запроса целиком.
+
+    Должна стоять первой в MIDDLEWARE, чтобы в total попадала работа
+    остальных middleware. Сериализация DRF выполняется внутри
+    представления, поэтому попадает в app (время представления без
+    БД); render — превращение ответа в байты.
+
+    Работает и под WSGI, и под ASGI: запросы к БД учитываются обёрткой,
+    постоянно установленной на соединениях, а текущий QueryRecorder
+    берётся из contextvar, который sync_to_async переносит в поток,
+    где выполняется ORM.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.threshold = settings.REQUEST_METRICS_N_PLUS_ONE
+        if asyncio.iscoroutinefunction(get_response):
+            # Так Django распознаёт асинхронный экземпляр middleware.
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+        for connection in connections.all():
+            install_query_recorder(connection=connection)
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        recorder, token = self.start(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_recorder.reset(token)
+        return self.finish(request, response, recorder)
+
+    async def __acall__(self, request):
+        recorder, token = self.start(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_recorder.reset(token)
+        return self.finish(request, response, recorder)
+
+    def start(self, request):
+        recorder = QueryRecorder()
+        request._metrics = {
+            'start': time.perf_counter(),
+            'view': None,
+            'view_start': None,
+            'view_time': None,
+            'render': 0.0,
+        }
+        return recorder, current_recorder.set(recorder)
+
+    def finish(self, request, response, recorder):
+        metrics = request._metrics
+        end = time.perf_counter()
+        total = (end - metrics['start']) * 1000
+        if metrics['view_time'] is None:
+            metrics['view_time'] = (
+                end - metrics['view_start']
+                if metrics['view_start'] is not None else 0.0
+            )
+
+        view = metrics['view'] or 'unresolved'
+        db = recorder.duration * 1000
+        app = max(metrics['view_time'] * 1000 - db, 0.0)
+        render = metrics['render'] * 1000
+        response['Server-Timing'] = ', '.join((
+            f'db;dur={db:.2f};desc="{recorder.count} queries"',
+            f'app;dur={app:.2f}',
+            f'render;dur={render:.2f}',
+            f'total;dur={total:.2f}',
+        ))
+        request_stats.add(view, total, recorder.count, db)
+        observe_request(
+            view,
+            request.method,
+            response.status_code,
+            total / 1000,
+            recorder.count,
+            recorder.duration,
+        )
+
+        record = {
+            'view': view,
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'queries': recorder.count,
+            'db_ms': round(db, 2),
+            'app_ms': round(app, 2),
+            'render_ms': round(render, 2),
+            'total_ms': round(total, 2),
+        }
+        repeated = recorder.repeated(self.threshold)
+        if repeated:
+            record['n_plus_one'] = repeated
+            logger.warning(json.dumps(record, ensure_ascii=False))
+        else:
+            logger.info(json.dumps(record, ensure_ascii=False))
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request._metrics['view'] = get_view_name(request, view_func)
+        request._metrics['view_start'] = time.perf_counter()
+
+    def process_template_response(self, request, response):
+        metrics = request._metrics
+        metrics['view_time'] = time.perf_counter() - metrics['view_start']
+        render_start = time.perf_counter()
+
+        def finish_render(response):
+            metrics['render'] = time.perf_counter() - render_start
+
+        response.add_post_render_callback(finish_render)
+        return response
+
+    def process_exception(self, request, exception):
+        metrics = request._metrics
+        if metrics['view_start'] is not None:
+            metrics['view_time'] = (
+                time.perf_counter() - metrics['view_start']
+            )
@@ -33,9 +33,11 @@ INSTALLED_APPS = [
     'users.apps.UsersConfig',
     'recipes.apps.RecipesConfig',
     'api.apps.ApiConfig',
+    'tasks.apps.TasksConfig',
 ]
 
 MIDDLEWARE = [
+    'foodgram.middleware.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -79,6 +81,7 @@ if DB_TYPE == 'postgres':
             'PORT': os.getenv('DB_PORT', 5432),
         }
     }
+    INSTALLED_APPS.append('django.contrib.postgres')
 else:
     DATABASES = {
         'default': {
@@ -87,6 +90,30 @@ else:
         }
     }
 
+# Кеш: locmem (по умолчанию), file или redis (требует django-redis)
+CACHE_TYPE = os.getenv('CACHE_TYPE', 'locmem').lower()
+
+if CACHE_TYPE == 'redis':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django_redis.cache.RedisCache',
+            'LOCATION': os.getenv('CACHE_LOCATION', 'redis://redis:6379/1'),
+        }
+    }
+elif CACHE_TYPE == 'file':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.getenv('CACHE_LOCATION', BASE_DIR / 'cache'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
 AUTH_USER_MODEL = 'users.User'
 
 LANGUAGE_CODE = 'ru-RU'
@@ -113,6 +140,11 @@ REST_FRAMEWORK = {
     'PAGE_SIZE_QUERY_PARAM': 'limit',
     'MAX_PAGE_SIZE': MAX_LIMIT_PAGE_SIZE,
     'DEFAULT_FILTER_BACKENDS': ['django_filters.rest_framework.DjangoFilterBackend'],
+    'DEFAULT_PARSER_CLASSES': [
+        'api.parsers.Base64StreamingJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
 }
 
 DJOSER = {
@@ -128,6 +160,20 @@ DJOSER = {
     },
 }
 
+# Хранить коды коротких ссылок ещё и в общем кеше (не только в процессе)
+SHORT_LINK_SHARED_CACHE = os.getenv(
+    'SHORT_LINK_SHARED_CACHE', default='True',
+).lower() in ('true', '1')
+
+# Фоновые задачи: sync | process | database (см. tasks/queue.py)
+BACKGROUND_TASKS_BACKEND = os.getenv('BACKGROUND_TASKS_BACKEND', 'process')
+BACKGROUND_TASKS_WORKERS = int(os.getenv('BACKGROUND_TASKS_WORKERS', 2))
+
+SHOPPING_CART_PDF_FONT = os.getenv(
+    'SHOPPING_CART_PDF_FONT',
+    '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf',
+)
+
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 LOGGING = {
@@ -138,15 +184,34 @@ LOGGING = {
             'format': '{levelname} {asctime} {module} {message}',
             'style': '{',
         },
+        'message': {
+            'format': '{message}',
+            'style': '{',
+        },
     },
     'handlers': {
         'console': {
             'class': 'logging.StreamHandler',
             'formatter': 'verbose',
         },
+        'requests': {
+            'class': 'logging.StreamHandler',
+            'formatter': 'message',
+        },
     },
     'root': {
         'handlers': ['console'],
         'level': 'DEBUG' if DEBUG else 'ERROR',
     },
+    'loggers': {
+        'foodgram.requests': {
+            'handlers': ['requests'],
+            'level': os.getenv('REQUEST_LOG_LEVEL', 'INFO'),
+            'propagate': False,
+        },
+    },
 }
+
+# Порог повторов одного SQL в запросе, после которого пишется
+# предупреждение о N+1
+REQUEST_METRICS_N_PLUS_ONE = int(os.getenv('N_PLUS_ONE_THRESHOLD', 5))
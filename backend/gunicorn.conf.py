@@ -0,0 +1,30 @@
+import glob
+import os
+
+from prometheus_client import multiprocess
+
+bind = '0.0.0.0:8000'
+workers = int(os.getenv('GUNICORN_WORKERS', 1))
+
+# wsgi — синхронные воркеры (по умолчанию), asgi — воркеры uvicorn
+SERVER_MODE = os.getenv('SERVER_MODE', 'wsgi').lower()
+if SERVER_MODE == 'asgi':
+    worker_class = 'uvicorn.workers.UvicornWorker'
+    wsgi_app = 'foodgram.asgi:application'
+else:
+    wsgi_app = 'foodgram.wsgi:application'
+
+
+def on_starting(server):
+    """Удаляет файлы метрик, оставшиеся от предыдущего запуска."""
+    directory = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+        for path in glob.glob(os.path.join(directory, '*.db')):
+            os.remove(path)
+
+
+def child_exit(server, worker):
+    """Метрики завершившегося воркера больше не считаются живыми."""
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        multiprocess.mark_process_dead(worker.pid)
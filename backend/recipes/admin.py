@@ -1,7 +1,44 @@
 from django.contrib import admin
 
+from foodgram.images import file_hash
+from recipes.counters import recount_on_commit
 from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
-                            ShoppingCart, Tag)
+                            ShoppingCart, ShoppingListItem, Tag)
+from recipes.tasks import process_recipe_image
+
+
+class RecountAdminMixin:
+    """
+    Пересчёт счётчиков и списков покупок после правок в админке.
+
+    recount_fields сопоставляет аргументы recount_on_commit() атрибутам
+    объекта: затронуты и прежние значения изменённого объекта, и новые.
+    """
+
+    recount_fields = {}
+
+    def affected(self, objects):
+        return {
+            name: {getattr(obj, field) for obj in objects}
+            for name, field in self.recount_fields.items()
+        }
+
+    def save_model(self, request, obj, form, change):
+        objects = [obj]
+        if change:
+            objects.append(self.model.objects.get(pk=obj.pk))
+        super().save_model(request, obj, form, change)
+        recount_on_commit(**self.affected(objects))
+
+    def delete_model(self, request, obj):
+        affected = self.affected([obj])
+        super().delete_model(request, obj)
+        recount_on_commit(**affected)
+
+    def delete_queryset(self, request, queryset):
+        affected = self.affected(list(queryset))
+        super().delete_queryset(request, queryset)
+        recount_on_commit(**affected)
 
 
 @admin.register(Tag)
@@ -26,31 +63,60 @@ class RecipeIngredientInline(admin.TabularInline):
 
 
 @admin.register(Recipe)
-class RecipeAdmin(admin.ModelAdmin):
+class RecipeAdmin(RecountAdminMixin, admin.ModelAdmin):
     list_display = (
         'id',
         'name',
         'author',
         'cooking_time',
-        'favorite_count',
+        'favorites_count',
+        'carts_count',
+        'image_status',
     )
     search_fields = ('name', 'author__username', 'tags__name')
-    list_filter = ('tags',)
+    list_filter = ('tags', 'image_status')
+    list_select_related = ('author',)
+    readonly_fields = ('favorites_count', 'carts_count', 'image_status')
     inlines = [RecipeIngredientInline]
+    recount_fields = {'user_ids': 'author_id'}
+
+    def affected(self, objects):
+        """Ещё и корзины: состав рецепта в админке мог измениться."""
+        affected = super().affected(objects)
+        affected['cart_user_ids'] = set(
+            ShoppingCart.objects.filter(
+                recipe__in=[obj.pk for obj in objects],
+            ).values_list('user_id', flat=True)
+        )
+        return affected
 
-    @admin.display(description='Добавлений в избранное')
-    def favorite_count(self, obj):
-        """Возвращает количество добавлений рецепта в избранное."""
-        return obj.favorited_by.count()
+    def save_model(self, request, obj, form, change):
+        image_changed = 'image' in form.changed_data
+        if image_changed:
+            obj.image_renditions = {}
+            obj.image_status = Recipe.ImageStatus.PENDING
+            obj.image_hash = file_hash(form.cleaned_data['image'])
+        super().save_model(request, obj, form, change)
+        if image_changed:
+            process_recipe_image.delay(pk=obj.pk, source=obj.image.name)
 
 
 @admin.register(Favorite)
-class FavoriteAdmin(admin.ModelAdmin):
+class FavoriteAdmin(RecountAdminMixin, admin.ModelAdmin):
     list_display = ('user', 'recipe')
+    recount_fields = {'recipe_ids': 'recipe_id'}
     search_fields = ('user__username', 'recipe__name')
 
 
 @admin.register(ShoppingCart)
-class ShoppingCartAdmin(admin.ModelAdmin):
+class ShoppingCartAdmin(RecountAdminMixin, admin.ModelAdmin):
     list_display = ('user', 'recipe')
+    recount_fields = {'recipe_ids': 'recipe_id', 'cart_user_ids': 'user_id'}
     search_fields = ('user__username', 'recipe__name')
+
+
+@admin.register(ShoppingListItem)
+class ShoppingListItemAdmin(admin.ModelAdmin):
+    list_display = ('user', 'ingredient', 'amount')
+    search_fields = ('user__username', 'ingredient__name')
+    list_select_related = ('user', 'ingredient')
@@ -0,0 +1,71 @@
+"""
+Индекс названий ингредиентов для автодополнения.
+
+Названия в нижнем регистре хранятся в отсортированном списке, поиск по
+префиксу — два бинарных поиска. Индекс строится при первом обращении
+и перестраивается, когда меняется версия справочника ингредиентов.
+Версия читается из базы при каждом поиске, поэтому импорт или правка в
+админке в другом процессе видны всем воркерам без перезапуска.
+"""
+import threading
+from bisect import bisect_left
+
+from recipes.cache import get_reference_version
+from recipes.models import Ingredient
+
+
+class IngredientIndex:
+    """Отсортированный массив названий ингредиентов в памяти процесса."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._index = ([], [])
+
+    def _refresh(self):
+        version = get_reference_version(Ingredient)
+        if version == self._version:
+            return
+        with self._lock:
+            if version == self._version:
+                return
+            rows = sorted(
+                (
+                    (item['name'].casefold(), item['name'], item['id'], item)
+                    for item in Ingredient.objects.values(
+                        'id', 'name', 'measurement_unit',
+                    )
+                ),
+                key=lambda row: row[:3],
+            )
+            self._index = (
+                [row[0] for row in rows],
+                [row[3] for row in rows],
+            )
+            self._version = version
+
+    def search(self, query, limit=None):
+        """
+        Ингредиенты, подходящие под query.
+
+        Сначала точные совпадения, затем совпадения по началу названия
+        (в отсортированном массиве они идут подряд именно в таком
+        порядке), затем вхождения в середине названия.
+        """
+        self._refresh()
+        keys, items = self._index
+        query = query.casefold()
+        start = bisect_left(keys, query)
+        end = bisect_left(keys, query + '\U0010ffff', start)
+        result = items[start:end]
+        if limit is not None and len(result) >= limit:
+            return result[:limit]
+        for position, key in enumerate(keys):
+            if limit is not None and len(result) >= limit:
+                break
+            if query in key and not key.startswith(query):
+                result.append(items[position])
+        return result
+
+
+ingredient_index = IngredientIndex()
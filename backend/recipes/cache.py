@@ -0,0 +1,54 @@
+"""
+Версии справочных данных (теги, ингредиенты) для ключей кеша.
+
+Версия меняется при любом изменении таблицы, поэтому закешированные
+ответы не нужно удалять по одному: ключи со старой версией просто
+перестают использоваться и вытесняются кешем. Сама версия хранится в
+таблице ReferenceVersion и одинакова для всех процессов, даже если кеш
+у каждого свой.
+"""
+import time
+
+from django.core.cache import cache
+
+from foodgram.constants import REFERENCE_CACHE_TIMEOUT
+from foodgram.metrics import observe_cache
+from recipes.models import ReferenceVersion, Tag
+
+TAG_SLUGS_KEY = 'reference:tag-slugs:{version}'
+
+
+def get_reference_version(model):
+    """Текущая версия данных модели: время последнего изменения."""
+    label = model._meta.label_lower
+    version = ReferenceVersion.objects.filter(label=label).values_list(
+        'version', flat=True,
+    ).first()
+    if version is None:
+        version = ReferenceVersion.objects.get_or_create(
+            label=label, defaults={'version': time.time()},
+        )[0].version
+    return version
+
+
+def bump_reference_version(model):
+    """Помечает закешированные данные модели устаревшими."""
+    label = model._meta.label_lower
+    version = time.time()
+    if not ReferenceVersion.objects.filter(label=label).update(
+        version=version,
+    ):
+        ReferenceVersion.objects.update_or_create(
+            label=label, defaults={'version': version},
+        )
+
+
+def get_tag_ids_by_slug():
+    """Словарь slug → id всех тегов, закешированный по версии тегов."""
+    key = TAG_SLUGS_KEY.format(version=get_reference_version(Tag))
+    tag_ids = cache.get(key)
+    observe_cache('tag_slugs', tag_ids is not None)
+    if tag_ids is None:
+        tag_ids = dict(Tag.objects.values_list('slug', 'id'))
+        cache.set(key, tag_ids, REFERENCE_CACHE_TIMEOUT)
+    return tag_ids
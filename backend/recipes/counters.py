@@ -0,0 +1,80 @@
+"""
+Счётчики рецептов и пользователей и списки покупок вне API.
+
+API меняет favorites_count, carts_count, recipes_count,
+subscribers_count и строки ShoppingListItem приращениями в тех же
+транзакциях, что и сами записи. Изменения в обход API — админка,
+каскадное удаление пользователя — пересчитывают затронутые строки
+целиком функцией recount_on_commit(). Рассинхронизацию после прямых
+правок в БД исправляют команды rebuild_counters и rebuild_shopping_lists.
+"""
+from functools import partial
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from recipes.models import Favorite, Recipe, ShoppingCart, ShoppingListItem
+from users.models import Subscription
+
+User = get_user_model()
+
+
+def count_subquery(model, field):
+    """Подзапрос с количеством строк model, ссылающихся на OuterRef('pk')."""
+    return Coalesce(
+        Subquery(
+            model.objects.filter(**{field: OuterRef('pk')})
+            .order_by()
+            .values(field)
+            .annotate(total=Count('pk'))
+            .values('total')
+        ),
+        0,
+    )
+
+
+def recount_recipes(recipe_ids=None):
+    """Пересчитывает избранное и корзины рецептов (всех без recipe_ids)."""
+    recipes = Recipe.objects.all()
+    if recipe_ids is not None:
+        recipes = recipes.filter(pk__in=recipe_ids)
+    return recipes.update(
+        favorites_count=count_subquery(Favorite, 'recipe'),
+        carts_count=count_subquery(ShoppingCart, 'recipe'),
+    )
+
+
+def recount_users(user_ids=None):
+    """Пересчитывает рецепты и подписчиков (всех без user_ids)."""
+    users = User.objects.all()
+    if user_ids is not None:
+        users = users.filter(pk__in=user_ids)
+    return users.update(
+        recipes_count=count_subquery(Recipe, 'author'),
+        subscribers_count=count_subquery(Subscription, 'author'),
+    )
+
+
+def recount_on_commit(recipe_ids=(), user_ids=(), cart_user_ids=()):
+    """
+    После коммита пересчитывает счётчики recipe_ids и user_ids и
+    пересобирает списки покупок cart_user_ids.
+    """
+    transaction.on_commit(partial(
+        recount,
+        set(recipe_ids),
+        set(user_ids),
+        set(cart_user_ids),
+    ))
+
+
+@transaction.atomic
+def recount(recipe_ids, user_ids, cart_user_ids):
+    if recipe_ids:
+        recount_recipes(recipe_ids)
+    if user_ids:
+        recount_users(user_ids)
+    if cart_user_ids:
+        ShoppingListItem.objects.rebuild(cart_user_ids)
@@ -0,0 +1,308 @@
+"""
+Генератор синтетических данных для проверки производительности.
+
+Создаёт пользователей, рецепты, избранное, корзины и подписки пакетными
+INSERT по batch_size строк. Ингредиенты загружаются из
+data/ingredients.csv. Счётчики считаются заранее в Python, списки
+покупок и поисковый индекс пересобираются после вставки, поэтому данные
+согласованы так же, как после работы через API.
+
+По умолчанию авторы и рецепты выбираются равномерно. С author_skew и
+recipe_skew популярность следует закону Ципфа: вес k-го по популярности
+автора (рецепта) пропорционален 1 / k ** skew. Так у немногих авторов
+оказывается большая часть рецептов и подписчиков, а у немногих рецептов
+— большая часть добавлений в избранное и корзину, как в живой базе.
+"""
+import csv
+import io
+import os
+import random
+from itertools import accumulate
+from uuid import uuid4
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image
+
+from foodgram.constants import RECIPE_IMAGE_RENDITIONS
+from foodgram.images import build_renditions
+from recipes.cache import bump_reference_version
+from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+                            ShoppingCart, ShoppingListItem, Tag)
+from recipes.search import update_search_index
+from recipes.transfer import batches
+from users.models import Subscription
+
+User = get_user_model()
+
+FAKE_PASSWORD = 'fake-password-123'
+FAKE_IMAGE = 'recipes/images/fake.png'
+FAKE_TAGS = (
+    ('Завтрак', 'breakfast'),
+    ('Обед', 'lunch'),
+    ('Ужин', 'dinner'),
+)
+INGREDIENTS_PATH = os.path.join(settings.BASE_DIR, 'data', 'ingredients.csv')
+
+
+def zipf_cum_weights(count, exponent):
+    """Накопленные веса рангов 1..count для random.choices."""
+    return list(accumulate(
+        1 / rank ** exponent for rank in range(1, count + 1)
+    ))
+
+
+class FakeDataGenerator:
+    """Наполнение базы случайными, но воспроизводимыми по seed данными."""
+
+    def __init__(self, users=50, recipes=500, favorites=20, carts=5,
+                 subscriptions=10, ingredients_per_recipe=(3, 10),
+                 seed=0, ingredients_path=INGREDIENTS_PATH,
+                 batch_size=1000, author_skew=0, recipe_skew=0):
+        self.users = users
+        self.recipes = recipes
+        self.favorites = favorites
+        self.carts = carts
+        self.subscriptions = subscriptions
+        self.ingredients_per_recipe = ingredients_per_recipe
+        self.ingredients_path = ingredients_path
+        self.batch_size = batch_size
+        self.author_skew = author_skew
+        self.recipe_skew = recipe_skew
+        self.random = random.Random(seed)
+        self.run = uuid4().hex[:8]
+
+    def generate(self):
+        """Создаёт данные и возвращает количество созданных объектов."""
+        ingredient_ids = self.load_ingredients()
+        tag_ids = self.load_tags()
+        image, renditions = self.load_image()
+
+        author_popularity = self.popularity(self.users, self.author_skew)
+        recipe_popularity = self.popularity(self.recipes, self.recipe_skew)
+        authors = self.pick(range(self.users), author_popularity,
+                            self.recipes)
+        favorites = self.pick_pairs(
+            self.favorites, self.recipes, recipe_popularity,
+        )
+        carts = self.pick_pairs(self.carts, self.recipes, recipe_popularity)
+        subscriptions = {
+            (user, author)
+            for user, author in self.pick_pairs(
+                self.subscriptions, self.users, author_popularity,
+            )
+            if user != author
+        }
+
+        users = self.create_users(authors, subscriptions)
+        recipes = self.create_recipes(
+            users, authors, image, renditions, favorites, carts,
+        )
+        self.create_recipe_links(recipes, ingredient_ids, tag_ids)
+        for model, pairs in ((Favorite, favorites), (ShoppingCart, carts)):
+            self.bulk_create(
+                model,
+                (
+                    model(user_id=users[user], recipe_id=recipes[target])
+                    for user, target in pairs
+                ),
+            )
+        self.bulk_create(
+            Subscription,
+            (
+                Subscription(user_id=users[user], author_id=users[author])
+                for user, author in subscriptions
+            ),
+        )
+        ShoppingListItem.objects.rebuild()
+        for batch in batches(recipes, self.batch_size):
+            update_search_index(batch)
+        return {
+            'users': len(users),
+            'recipes': len(recipes),
+            'favorites': len(favorites),
+            'carts': len(carts),
+            'subscriptions': len(subscriptions),
+        }
+
+    def bulk_create(self, model, objs):
+        """
+        Вставка пачками без списка всех объектов.
+
+        bulk_create сам превращает генератор в список, поэтому объекты
+        передаются ему по batch_size штук.
+        """
+        for batch in batches(objs, self.batch_size):
+            model.objects.bulk_create(batch)
+
+    def popularity(self, count, skew):
+        """
+        Порядок целей по популярности и их накопленные веса.
+
+        None — равномерный выбор. Ранги перемешаны, чтобы самыми
+        популярными не оказывались первые созданные объекты.
+        """
+        if not skew:
+            return None
+        ranking = list(range(count))
+        self.random.shuffle(ranking)
+        return ranking, zipf_cum_weights(count, skew)
+
+    def pick(self, targets, popularity, count):
+        """count целей с повторами: равномерно или по популярности."""
+        if popularity is None:
+            return [self.random.choice(targets) for _ in range(count)]
+        ranking, cum_weights = popularity
+        return self.random.choices(ranking, cum_weights=cum_weights, k=count)
+
+    def pick_pairs(self, per_user, targets, popularity=None):
+        """Не более per_user случайных целей на каждого пользователя."""
+        pairs = set()
+        for user in range(self.users):
+            if popularity is None:
+                picked = self.random.sample(
+                    range(targets), min(per_user, targets),
+                )
+            else:
+                # Повторы популярных целей схлопываются.
+                ranking, cum_weights = popularity
+                picked = self.random.choices(
+                    ranking, cum_weights=cum_weights, k=per_user,
+                )
+            for target in picked:
+                pairs.add((user, target))
+        return pairs
+
+    def load_ingredients(self):
+        with open(self.ingredients_path, encoding='utf-8') as csvfile:
+            Ingredient.objects.bulk_create(
+                (
+                    Ingredient(
+                        name=name.strip(),
+                        measurement_unit=measurement_unit.strip(),
+                    )
+                    for name, measurement_unit in csv.reader(csvfile)
+                ),
+                batch_size=self.batch_size,
+                ignore_conflicts=True,
+            )
+        bump_reference_version(Ingredient)
+        return list(Ingredient.objects.values_list('pk', flat=True))
+
+    def load_tags(self):
+        for name, slug in FAKE_TAGS:
+            Tag.objects.get_or_create(slug=slug, defaults={'name': name})
+        bump_reference_version(Tag)
+        return list(Tag.objects.values_list('pk', flat=True))
+
+    def load_image(self):
+        """Общая картинка для всех рецептов, чтобы не плодить файлы."""
+        if not default_storage.exists(FAKE_IMAGE):
+            buffer = io.BytesIO()
+            Image.new('RGB', (64, 64), 'orange').save(buffer, 'PNG')
+            default_storage.save(FAKE_IMAGE, ContentFile(buffer.getvalue()))
+        with default_storage.open(FAKE_IMAGE) as file:
+            renditions = build_renditions(
+                file, RECIPE_IMAGE_RENDITIONS, 'recipes/images/',
+            )
+        return renditions['full']['jpeg'], renditions
+
+    def create_users(self, authors, subscriptions):
+        """Создаёт пользователей и возвращает их pk по порядковому номеру."""
+        password = make_password(FAKE_PASSWORD)
+        recipes_count = [0] * self.users
+        for author in authors:
+            recipes_count[author] += 1
+        subscribers_count = [0] * self.users
+        for _, author in subscriptions:
+            subscribers_count[author] += 1
+
+        usernames = [f'fake-{self.run}-{n}' for n in range(self.users)]
+        self.bulk_create(
+            User,
+            (
+                User(
+                    username=username,
+                    email=f'{username}@example.com',
+                    first_name='Пользователь',
+                    last_name=str(n),
+                    password=password,
+                    recipes_count=recipes_count[n],
+                    subscribers_count=subscribers_count[n],
+                )
+                for n, username in enumerate(usernames)
+            ),
+        )
+        pks = dict(
+            User.objects.filter(username__startswith=f'fake-{self.run}-')
+            .values_list('username', 'pk')
+            .iterator()
+        )
+        return [pks[username] for username in usernames]
+
+    def create_recipes(self, users, authors, image, renditions, favorites,
+                       carts):
+        """Создаёт рецепты и возвращает их pk по порядковому номеру."""
+        favorites_count = [0] * self.recipes
+        for _, recipe in favorites:
+            favorites_count[recipe] += 1
+        carts_count = [0] * self.recipes
+        for _, recipe in carts:
+            carts_count[recipe] += 1
+
+        codes = [f'{self.run}{n}' for n in range(self.recipes)]
+        self.bulk_create(
+            Recipe,
+            (
+                Recipe(
+                    author_id=users[author],
+                    name=f'Рецепт {n}',
+                    text='Описание рецепта. ' * self.random.randint(1, 20),
+                    image=image,
+                    image_renditions=renditions,
+                    image_status=Recipe.ImageStatus.READY,
+                    cooking_time=self.random.randint(1, 180),
+                    short_code=code,
+                    favorites_count=favorites_count[n],
+                    carts_count=carts_count[n],
+                )
+                for n, (author, code) in enumerate(zip(authors, codes))
+            ),
+        )
+        pks = dict(
+            Recipe.objects.filter(short_code__startswith=self.run)
+            .values_list('short_code', 'pk')
+            .iterator()
+        )
+        return [pks[code] for code in codes]
+
+    def create_recipe_links(self, recipes, ingredient_ids, tag_ids):
+        low, high = self.ingredients_per_recipe
+        self.bulk_create(
+            RecipeIngredient,
+            (
+                RecipeIngredient(
+                    recipe_id=recipe,
+                    ingredient_id=ingredient,
+                    amount=self.random.randint(1, 500),
+                )
+                for recipe in recipes
+                for ingredient in self.random.sample(
+                    ingredient_ids,
+                    min(self.random.randint(low, high), len(ingredient_ids)),
+                )
+            ),
+        )
+        self.bulk_create(
+            Recipe.tags.through,
+            (
+                Recipe.tags.through(recipe_id=recipe, tag_id=tag)
+                for recipe in recipes
+                for tag in self.random.sample(
+                    tag_ids, self.random.randint(1, len(tag_ids)),
+                )
+            ),
+        )
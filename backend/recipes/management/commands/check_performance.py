@@ -0,0 +1,471 @@
+import base64
+import gc
+import io
+import json
+import logging
+import math
+import os
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+from tempfile import TemporaryDirectory
+from types import SimpleNamespace
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import (CaptureQueriesContext, override_settings,
+                               setup_test_environment,
+                               teardown_test_environment)
+from django.urls import reverse
+from PIL import Image
+from rest_framework.test import APIClient
+
+from api.pagination import RecipePagination
+from api.urls import router
+from recipes.fake_data import FAKE_PASSWORD, FakeDataGenerator
+from recipes.models import Ingredient, Recipe, Tag
+from recipes.urls import urlpatterns as recipes_urlpatterns
+
+User = get_user_model()
+
+BASELINE_PATH = os.path.join(
+    settings.BASE_DIR, 'data', 'performance_baseline.json',
+)
+
+# Маршруты djoser для сценариев с письмами, фронтенд их не использует.
+IGNORED_ROUTES = {
+    'api-root',
+    'users-activation',
+    'users-resend-activation',
+    'users-reset-password',
+    'users-reset-password-confirm',
+    'users-reset-username',
+    'users-reset-username-confirm',
+    'users-set-username',
+}
+
+# Число id в сценариях пакетных операций
+BULK_SIZE = 50
+
+Scenario = namedtuple(
+    'Scenario',
+    'name route method url data client status',
+    defaults=(None, 'user', 200),
+)
+
+
+def percentile(values, share):
+    """Перцентиль по методу ближайшего ранга."""
+    values = sorted(values)
+    return values[max(math.ceil(share * len(values)) - 1, 0)]
+
+
+def image_data():
+    buffer = io.BytesIO()
+    Image.new('RGB', (32, 32), 'green').save(buffer, 'PNG')
+    return 'data:image/png;base64,' + base64.b64encode(
+        buffer.getvalue()
+    ).decode()
+
+
+class Command(BaseCommand):
+    help = (
+        'Проверка бюджетов SQL-запросов и времени ответа всех эндпоинтов '
+        'API на синтетических данных во временной тестовой базе'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=30)
+        parser.add_argument('--recipes', type=int, default=300)
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=20,
+            help='Сколько раз выполнить каждый запрос',
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--baseline',
+            type=str,
+            default=BASELINE_PATH,
+            help='Путь до файла с базовыми показателями',
+        )
+        parser.add_argument(
+            '--tolerance',
+            type=float,
+            default=0.5,
+            help='Допустимый рост p95 относительно базовой линии (доля)',
+        )
+        parser.add_argument(
+            '--slack',
+            type=float,
+            default=1.0,
+            help='Допустимый рост p95 сверх доли, мс (для быстрых ответов)',
+        )
+        parser.add_argument(
+            '--update-baseline',
+            action='store_true',
+            help='Записать результаты как новую базовую линию',
+        )
+
+    @contextmanager
+    def synthetic_database(self, options):
+        """Временная тестовая база с синтетическими данными."""
+        # Строки о каждом запросе не нужны, предупреждения о N+1 — нужны.
+        logging.getLogger('foodgram.requests').setLevel(logging.WARNING)
+        with TemporaryDirectory() as media_root, override_settings(
+            CACHES={
+                'default': {
+                    'BACKEND': (
+                        'django.core.cache.backends.locmem.LocMemCache'
+                    ),
+                },
+            },
+            MEDIA_ROOT=media_root,
+            # Замеряется только путь запроса: задачи остаются в очереди.
+            BACKGROUND_TASKS_BACKEND='database',
+            PASSWORD_HASHERS=[
+                'django.contrib.auth.hashers.MD5PasswordHasher',
+            ],
+        ):
+            setup_test_environment()
+            old_name = connection.creation.create_test_db(
+                verbosity=0,
+                autoclobber=True,
+                serialize=False,
+            )
+            try:
+                FakeDataGenerator(
+                    users=options['users'],
+                    recipes=options['recipes'],
+                    seed=options['seed'],
+                ).generate()
+                yield
+            finally:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+                teardown_test_environment()
+
+    def handle(self, *args, **options):
+        with self.synthetic_database(options):
+            results = self.measure(options['repeat'])
+
+        if options['update_baseline']:
+            with open(options['baseline'], 'w', encoding='utf-8') as file:
+                json.dump(results, file, ensure_ascii=False, indent=2)
+                file.write('\n')
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f'Базовая линия записана: {options["baseline"]}'
+                )
+            )
+            return
+        self.compare(
+            results,
+            options['baseline'],
+            options['tolerance'],
+            options['slack'],
+        )
+
+    def get_context(self):
+        user = User.objects.order_by('pk').first()
+        other = User.objects.exclude(pk=user.pk).exclude(
+            subscribers__user=user,
+        ).order_by('pk').first()
+        recipe = Recipe.objects.exclude(author=user).exclude(
+            favorite_set__user=user,
+        ).exclude(shoppingcart_set__user=user).first()
+        page_end = Recipe.objects.all()[5]
+        bulk_recipes = list(
+            Recipe.objects.exclude(author=user)
+            .exclude(favorite_set__user=user)
+            .exclude(shoppingcart_set__user=user)
+            .values_list('pk', flat=True)[:BULK_SIZE]
+        )
+        bulk_authors = list(
+            User.objects.exclude(pk=user.pk)
+            .exclude(subscribers__user=user)
+            .values_list('pk', flat=True)[:BULK_SIZE]
+        )
+        user_client = APIClient()
+        user_client.force_authenticate(user)
+        return SimpleNamespace(
+            user=user,
+            other=other,
+            recipe=recipe,
+            bulk_recipes={'ids': bulk_recipes},
+            bulk_authors={'ids': bulk_authors},
+            tag=Tag.objects.first(),
+            ingredient=Ingredient.objects.first(),
+            cursor=RecipePagination().encode_cursor(
+                (page_end.pub_date, page_end.pk)
+            ),
+            created=None,
+            image=image_data(),
+            clients={'user': user_client, 'anon': APIClient()},
+        )
+
+    def get_scenarios(self, ctx):
+        """Сценарии по всем маршрутам API; запись идёт парами туда-обратно."""
+        recipe_data = {
+            'ingredients': [
+                {'id': ctx.ingredient.pk, 'amount': 10},
+            ],
+            'tags': [ctx.tag.pk],
+            'image': ctx.image,
+            'name': 'Новый рецепт',
+            'text': 'Описание',
+            'cooking_time': 15,
+        }
+        recipe = ctx.recipe.pk
+        return [
+            Scenario('tags-list', 'tags-list', 'get',
+                     lambda: reverse('tags-list')),
+            Scenario('tags-detail', 'tags-detail', 'get',
+                     lambda: reverse('tags-detail', args=[ctx.tag.pk])),
+            Scenario('ingredients-list', 'ingredients-list', 'get',
+                     lambda: reverse('ingredients-list') + '?name=соль'),
+            Scenario('ingredients-detail', 'ingredients-detail', 'get',
+                     lambda: reverse('ingredients-detail',
+                                     args=[ctx.ingredient.pk])),
+            Scenario('recipes-list', 'recipes-list', 'get',
+                     lambda: reverse('recipes-list')),
+            Scenario('recipes-list:anon', 'recipes-list', 'get',
+                     lambda: reverse('recipes-list'), client='anon'),
+            Scenario('recipes-list:tags', 'recipes-list', 'get',
+                     lambda: reverse('recipes-list')
+                     + f'?tags={ctx.tag.slug}&limit=20'),
+            Scenario('recipes-list:is_favorited', 'recipes-list', 'get',
+                     lambda: reverse('recipes-list') + '?is_favorited=1'),
+            Scenario('recipes-list:is_in_shopping_cart', 'recipes-list',
+                     'get', lambda: reverse('recipes-list')
+                     + '?is_in_shopping_cart=1'),
+            Scenario('recipes-list:author', 'recipes-list', 'get',
+                     lambda: reverse('recipes-list')
+                     + f'?author={ctx.other.pk}'),
+            Scenario('recipes-list:search', 'recipes-list', 'get',
+                     lambda: reverse('recipes-list') + '?search=рецепт'),
+            Scenario('recipes-list:cursor', 'recipes-list', 'get',
+                     lambda: reverse('recipes-list')
+                     + f'?cursor={ctx.cursor}'),
+            Scenario('recipes-detail', 'recipes-detail', 'get',
+                     lambda: reverse('recipes-detail', args=[recipe])),
+            Scenario('recipes-get-link', 'recipes-get-link', 'get',
+                     lambda: reverse('recipes-get-link', args=[recipe])),
+            Scenario('redirect-short-link', 'redirect_short_link', 'get',
+                     lambda: reverse('redirect_short_link',
+                                     args=[ctx.recipe.short_code]),
+                     client='anon', status=302),
+            Scenario('recipes-create', 'recipes-list', 'post',
+                     lambda: reverse('recipes-list'), recipe_data,
+                     status=201),
+            Scenario('recipes-update', 'recipes-detail', 'patch',
+                     lambda: reverse('recipes-detail', args=[ctx.created]),
+                     dict(recipe_data, name='Изменённый рецепт')),
+            Scenario('recipes-delete', 'recipes-detail', 'delete',
+                     lambda: reverse('recipes-detail', args=[ctx.created]),
+                     status=204),
+            Scenario('recipes-favorite:add', 'recipes-favorite', 'post',
+                     lambda: reverse('recipes-favorite', args=[recipe]),
+                     status=201),
+            Scenario('recipes-favorite:remove', 'recipes-favorite',
+                     'delete',
+                     lambda: reverse('recipes-favorite', args=[recipe]),
+                     status=204),
+            Scenario('recipes-shopping-cart:add', 'recipes-shopping-cart',
+                     'post',
+                     lambda: reverse('recipes-shopping-cart', args=[recipe]),
+                     status=201),
+            Scenario('recipes-shopping-cart:remove',
+                     'recipes-shopping-cart', 'delete',
+                     lambda: reverse('recipes-shopping-cart', args=[recipe]),
+                     status=204),
+            Scenario('recipes-favorite-bulk:add', 'recipes-favorite-bulk',
+                     'post', lambda: reverse('recipes-favorite-bulk'),
+                     ctx.bulk_recipes),
+            Scenario('recipes-favorite-bulk:remove', 'recipes-favorite-bulk',
+                     'delete', lambda: reverse('recipes-favorite-bulk'),
+                     ctx.bulk_recipes),
+            Scenario('recipes-shopping-cart-bulk:add',
+                     'recipes-shopping-cart-bulk', 'post',
+                     lambda: reverse('recipes-shopping-cart-bulk'),
+                     ctx.bulk_recipes),
+            Scenario('recipes-shopping-cart-bulk:remove',
+                     'recipes-shopping-cart-bulk', 'delete',
+                     lambda: reverse('recipes-shopping-cart-bulk'),
+                     ctx.bulk_recipes),
+            Scenario('recipes-shopping-list', 'recipes-shopping-list',
+                     'get', lambda: reverse('recipes-shopping-list')),
+            Scenario('recipes-download-shopping-cart',
+                     'recipes-download-shopping-cart', 'get',
+                     lambda: reverse('recipes-download-shopping-cart')),
+            Scenario('users-list', 'users-list', 'get',
+                     lambda: reverse('users-list')),
+            Scenario('users-list:anon', 'users-list', 'get',
+                     lambda: reverse('users-list'), client='anon'),
+            Scenario('users-detail', 'users-detail', 'get',
+                     lambda: reverse('users-detail', args=[ctx.other.pk])),
+            Scenario('users-me', 'users-me', 'get',
+                     lambda: reverse('users-me')),
+            Scenario('users-subscriptions', 'users-subscriptions', 'get',
+                     lambda: reverse('users-subscriptions')
+                     + '?recipes_limit=3'),
+            Scenario('users-subscribe:add', 'users-subscribe', 'post',
+                     lambda: reverse('users-subscribe', args=[ctx.other.pk])
+                     + '?recipes_limit=3', status=201),
+            Scenario('users-subscribe:remove', 'users-subscribe', 'delete',
+                     lambda: reverse('users-subscribe', args=[ctx.other.pk]),
+                     status=204),
+            Scenario('users-subscribe-bulk:add', 'users-subscribe-bulk',
+                     'post', lambda: reverse('users-subscribe-bulk'),
+                     ctx.bulk_authors),
+            Scenario('users-subscribe-bulk:remove', 'users-subscribe-bulk',
+                     'delete', lambda: reverse('users-subscribe-bulk'),
+                     ctx.bulk_authors),
+            Scenario('users-avatar:set', 'users-avatar', 'put',
+                     lambda: reverse('users-avatar'),
+                     {'avatar': ctx.image}),
+            Scenario('users-avatar:delete', 'users-avatar', 'delete',
+                     lambda: reverse('users-avatar'), status=204),
+            Scenario('users-set-password', 'users-set-password', 'post',
+                     lambda: reverse('users-set-password'),
+                     {'current_password': FAKE_PASSWORD,
+                      'new_password': FAKE_PASSWORD}, status=204),
+            Scenario('users-create', 'users-list', 'post',
+                     lambda: reverse('users-list'),
+                     lambda: {
+                         'email': f'new-{time.monotonic_ns()}@example.com',
+                         'username': f'new-{time.monotonic_ns()}',
+                         'first_name': 'Новый',
+                         'last_name': 'Пользователь',
+                         'password': FAKE_PASSWORD,
+                     }, client='anon', status=201),
+            Scenario('login', 'login', 'post', lambda: reverse('login'),
+                     {'email': ctx.user.email, 'password': FAKE_PASSWORD},
+                     client='anon'),
+            Scenario('logout', 'logout', 'post', lambda: reverse('logout'),
+                     status=204),
+        ]
+
+    @staticmethod
+    def missing_routes(scenarios):
+        """Маршруты API, для которых нет сценария."""
+        routes = {url.name for url in router.urls}
+        routes |= {url.name for url in recipes_urlpatterns}
+        routes |= {'login', 'logout'}
+        return sorted(routes - IGNORED_ROUTES - {
+            scenario.route for scenario in scenarios
+        })
+
+    def check_coverage(self, scenarios):
+        for route in self.missing_routes(scenarios):
+            self.stdout.write(
+                self.style.WARNING(f'Маршрут без сценария: {route}')
+            )
+
+    def perform(self, ctx, scenario):
+        """Выполняет запрос сценария: SQL-запросы и время ответа в с."""
+        data = scenario.data
+        if callable(data):
+            data = data()
+        client = ctx.clients[scenario.client]
+        with CaptureQueriesContext(connection) as captured:
+            start = time.perf_counter()
+            response = getattr(client, scenario.method)(
+                scenario.url(), data, format='json',
+            )
+            if response.streaming:
+                b''.join(response.streaming_content)
+            elapsed = time.perf_counter() - start
+        if response.status_code != scenario.status:
+            raise CommandError(
+                f'{scenario.name}: ожидался статус '
+                f'{scenario.status}, получен '
+                f'{response.status_code}'
+            )
+        if scenario.name == 'recipes-create':
+            ctx.created = response.data['id']
+        return captured, elapsed
+
+    def measure(self, repeat):
+        """
+        Прогоняет сценарии repeat раз после одного прогрева.
+
+        Как и timeit, на время запроса отключает сборщик мусора и
+        запускает его между прогонами, чтобы паузы GC не попадали в p95.
+        """
+        ctx = self.get_context()
+        scenarios = self.get_scenarios(ctx)
+        self.check_coverage(scenarios)
+        queries = {scenario.name: 0 for scenario in scenarios}
+        timings = {scenario.name: [] for scenario in scenarios}
+
+        for iteration in range(repeat + 1):
+            gc.collect()
+            for scenario in scenarios:
+                gc.disable()
+                try:
+                    captured, elapsed = self.perform(ctx, scenario)
+                finally:
+                    gc.enable()
+                if iteration == 0:
+                    continue
+                queries[scenario.name] = max(
+                    queries[scenario.name], len(captured),
+                )
+                timings[scenario.name].append(elapsed * 1000)
+
+        return {
+            scenario.name: {
+                'queries': queries[scenario.name],
+                'p50': round(percentile(timings[scenario.name], 0.5), 2),
+                'p95': round(percentile(timings[scenario.name], 0.95), 2),
+            }
+            for scenario in scenarios
+        }
+
+    def compare(self, results, path, tolerance, slack):
+        try:
+            with open(path, encoding='utf-8') as file:
+                baseline = json.load(file)
+        except FileNotFoundError:
+            raise CommandError(
+                f'Файл не найден: {path}. '
+                f'Создайте его с ключом --update-baseline'
+            )
+
+        failures = []
+        for name, result in results.items():
+            line = (
+                f'{name:<36} запросов {result["queries"]:>3}  '
+                f'p50 {result["p50"]:8.2f} мс  p95 {result["p95"]:8.2f} мс'
+            )
+            expected = baseline.get(name)
+            if expected is None:
+                self.stdout.write(
+                    self.style.WARNING(f'{line}  (нет в базовой линии)')
+                )
+                continue
+            problems = []
+            if result['queries'] > expected['queries']:
+                problems.append(
+                    f'запросов {result["queries"]} > {expected["queries"]}'
+                )
+            limit = expected['p95'] * (1 + tolerance) + slack
+            if result['p95'] > limit:
+                problems.append(f'p95 {result["p95"]} > {limit:.2f} мс')
+            if problems:
+                failures.append(f'{name}: {", ".join(problems)}')
+                self.stdout.write(self.style.ERROR(line))
+            else:
+                self.stdout.write(line)
+
+        if failures:
+            raise CommandError(
+                'Превышены бюджеты производительности:\n'
+                + '\n'.join(failures)
+            )
+        self.stdout.write(
+            self.style.SUCCESS('Все эндпоинты укладываются в бюджеты')
+        )
@@ -0,0 +1,158 @@
+"""
+Аудит планов SQL-запросов API.
+
+Команда прогоняет сценарии check_performance по одному разу на
+синтетических данных во временной тестовой базе, собирает все SELECT,
+UPDATE и DELETE, которые сгенерировали представления, и выполняет для
+каждого EXPLAIN. Запрос считается проблемным, если план читает целиком
+таблицу, в которой не меньше --min-rows строк.
+
+На PostgreSQL EXPLAIN выполняется с enable_seqscan = off: оставшийся в
+плане Seq Scan значит, что подходящего индекса нет вовсе, а не что на
+маленькой тестовой базе скан дешевле. На SQLite полным сканом считается
+строка плана SCAN без USING INDEX. Обход таблицы по индексу сортировки
+ошибкой не считается: так лента читает первые строки с LIMIT.
+"""
+import re
+from collections import defaultdict
+
+from django.core.management.base import CommandError
+from django.db import connection
+
+from recipes.management.commands.check_performance import \
+    Command as PerformanceCommand
+
+EXPLAINED_STATEMENTS = ('SELECT', 'UPDATE', 'DELETE')
+
+# Индекс автодополнения загружает справочник ингредиентов целиком.
+EXPECTED_SCANS = {
+    'ingredients-list': {'recipes_ingredient'},
+}
+
+POSTGRES_SEQ_SCAN = re.compile(r'Seq Scan on "?(\w+)"?')
+SQLITE_SCAN = re.compile(r'^SCAN (?:TABLE )?(\w+)')
+# Псевдонимы таблиц в подзапросах Django: "recipes_favorite" U0.
+TABLE_ALIAS = re.compile(r'"(\w+)" ([A-Z]\d+)\b')
+
+
+class Command(PerformanceCommand):
+    help = (
+        'Проверка планов SQL-запросов всех эндпоинтов API: ошибка, если '
+        'запрос читает большую таблицу целиком'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--recipes', type=int, default=2000)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--min-rows',
+            type=int,
+            default=100,
+            help='С какого числа строк таблица считается большой',
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor not in ('postgresql', 'sqlite'):
+            raise CommandError(
+                f'EXPLAIN для {connection.vendor} не поддерживается'
+            )
+        self.verbosity = options['verbosity']
+        with self.synthetic_database(options):
+            large = self.large_tables(options['min_rows'])
+            queries = self.collect_queries()
+            failures = self.audit(queries, large)
+
+        if failures:
+            raise CommandError(
+                'Полный скан больших таблиц:\n' + '\n'.join(failures)
+            )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Проверено запросов: {len(queries)}, полных сканов '
+                f'больших таблиц нет'
+            )
+        )
+
+    def large_tables(self, min_rows):
+        """Таблицы моделей, в которых не меньше min_rows строк."""
+        tables = set()
+        with connection.cursor() as cursor:
+            for table in connection.introspection.django_table_names(
+                only_existing=True,
+            ):
+                cursor.execute(
+                    f'SELECT COUNT(*) FROM {connection.ops.quote_name(table)}'
+                )
+                if cursor.fetchone()[0] >= min_rows:
+                    tables.add(table)
+        return tables
+
+    def collect_queries(self):
+        """Словарь SQL → сценарии, в которых он выполнялся."""
+        ctx = self.get_context()
+        scenarios = self.get_scenarios(ctx)
+        self.check_coverage(scenarios)
+        queries = defaultdict(list)
+        for scenario in scenarios:
+            captured, _ = self.perform(ctx, scenario)
+            for query in captured.captured_queries:
+                sql = query['sql']
+                if sql.lstrip().upper().startswith(EXPLAINED_STATEMENTS):
+                    queries[sql].append(scenario.name)
+        return queries
+
+    def audit(self, queries, large):
+        failures = []
+        for sql, scenarios in queries.items():
+            plan = self.explain(sql)
+            tables = self.full_scans(sql, plan) & large
+            for scenario in set(scenarios):
+                scanned = tables - EXPECTED_SCANS.get(scenario, set())
+                if scanned:
+                    failures.append(
+                        f'{scenario}: {", ".join(sorted(scanned))}'
+                    )
+                    self.stdout.write(self.style.ERROR(
+                        f'{scenario}: полный скан '
+                        f'{", ".join(sorted(scanned))}\n{sql}'
+                    ))
+                    self.stdout.write('\n'.join(plan))
+            if self.verbosity >= 2:
+                self.stdout.write(f'{", ".join(sorted(set(scenarios)))}:')
+                self.stdout.write(sql)
+                self.stdout.write('\n'.join(plan) + '\n')
+        return sorted(set(failures))
+
+    @staticmethod
+    def explain(sql):
+        """Строки плана запроса."""
+        with connection.cursor() as cursor:
+            if connection.vendor == 'sqlite':
+                cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+                return [row[-1] for row in cursor.fetchall()]
+            cursor.execute('SET enable_seqscan = off')
+            try:
+                cursor.execute('EXPLAIN ' + sql)
+                return [row[0] for row in cursor.fetchall()]
+            finally:
+                cursor.execute('RESET enable_seqscan')
+
+    @staticmethod
+    def full_scans(sql, plan):
+        """Таблицы, которые план читает целиком."""
+        if connection.vendor == 'postgresql':
+            return {
+                match.group(1)
+                for line in plan
+                for match in POSTGRES_SEQ_SCAN.finditer(line)
+            }
+        aliases = dict(
+            (alias, table) for table, alias in TABLE_ALIAS.findall(sql)
+        )
+        tables = set()
+        for line in plan:
+            match = SQLITE_SCAN.match(line)
+            if match and 'USING' not in line and 'VIRTUAL TABLE' not in line:
+                tables.add(aliases.get(match.group(1), match.group(1)))
+        return tables
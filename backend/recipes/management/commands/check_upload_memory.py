@@ -0,0 +1,91 @@
+import base64
+import gc
+import io
+import json
+import os
+import time
+import tracemalloc
+from types import SimpleNamespace
+
+from django.core.management.base import BaseCommand
+from drf_extra_fields.fields import Base64ImageField
+from PIL import Image
+from rest_framework.parsers import JSONParser
+
+from api.fields import Base64ImageUploadField
+from api.parsers import Base64StreamingJSONParser
+from api.serializers.users import AvatarSerializer
+
+MEGABYTE = 1024 * 1024
+
+
+def make_payload(size):
+    """JSON с картинкой PNG в base64, добитой случайными байтами до size."""
+    buffer = io.BytesIO()
+    Image.new('RGB', (8, 8), 'orange').save(buffer, 'PNG')
+    image = buffer.getvalue()
+    image += os.urandom(max(size - len(image), 0))
+    return json.dumps({
+        'avatar': 'data:image/png;base64,' + base64.b64encode(image).decode(),
+    }).encode()
+
+
+class Command(BaseCommand):
+    help = (
+        'Пиковая память на разбор загрузки картинки: JSONParser с '
+        'Base64ImageField против потокового разбора'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--size',
+            type=float,
+            nargs='+',
+            default=[1, 5, 10],
+            help='Размеры картинок, МБ',
+        )
+
+    def handle(self, *args, **options):
+        view = SimpleNamespace(get_serializer_class=lambda: AvatarSerializer)
+        paths = (
+            ('JSONParser', JSONParser(), Base64ImageField()),
+            (
+                'потоковый',
+                Base64StreamingJSONParser(),
+                Base64ImageUploadField(),
+            ),
+        )
+        # Первый разбор загружает модули Pillow, в замеры он не идёт.
+        for _, parser, field in paths:
+            data = parser.parse(
+                io.BytesIO(make_payload(1024)), 'application/json',
+                {'view': view},
+            )
+            field.to_internal_value(data['avatar']).close()
+        self.stdout.write(
+            f'{"картинка":>10} {"разбор":<12} {"пик памяти":>12} '
+            f'{"к картинке":>11} {"время":>10}'
+        )
+        for size in options['size']:
+            payload = make_payload(int(size * MEGABYTE))
+            for name, parser, field in paths:
+                gc.collect()
+                tracemalloc.start()
+                start = time.perf_counter()
+                data = parser.parse(
+                    io.BytesIO(payload),
+                    'application/json',
+                    {'view': view},
+                )
+                image = field.to_internal_value(data['avatar'])
+                elapsed = time.perf_counter() - start
+                _, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+                image.close()
+                del data, image
+                self.stdout.write(
+                    f'{size:>8.1f}МБ {name:<12} '
+                    f'{peak / MEGABYTE:>10.2f}МБ '
+                    f'{peak / (size * MEGABYTE):>10.2f}x '
+                    f'{elapsed * 1000:>8.1f}мс'
+                )
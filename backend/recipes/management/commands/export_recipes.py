@@ -0,0 +1,55 @@
+import sys
+import tarfile
+
+from django.core.management.base import BaseCommand
+
+from recipes.transfer import RecipeExporter, open_text
+
+
+class Command(BaseCommand):
+    help = (
+        'Выгрузка рецептов с тегами, ингредиентами и авторами в JSON Lines '
+        'и их картинок в tar-архив'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--output',
+            type=str,
+            default='-',
+            help='Файл JSON Lines (.gz — со сжатием), "-" — stdout',
+        )
+        parser.add_argument(
+            '--media',
+            type=str,
+            help='Архив с картинками (.tar.gz), без ключа файлы не пишутся',
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        exporter = RecipeExporter(batch_size=options['batch_size'])
+        to_stdout = options['output'] == '-'
+        # В stdout идут данные, отчёт — в stderr.
+        report = self.stderr if to_stdout else self.stdout
+        output = sys.stdout if to_stdout else open_text(
+            options['output'], 'w',
+        )
+        archive = (
+            tarfile.open(options['media'], 'w:gz')
+            if options['media'] else None
+        )
+        exported = 0
+        try:
+            for exported in exporter.export(output, archive):
+                if options['verbosity'] > 1:
+                    report.write(f'Выгружено {exported} рецептов')
+        finally:
+            if not to_stdout:
+                output.close()
+            if archive is not None:
+                archive.close()
+        for name in exporter.missing_files:
+            report.write(self.style.WARNING(f'Нет файла: {name}'))
+        report.write(
+            self.style.SUCCESS(f'Выгружено рецептов: {exported}')
+        )
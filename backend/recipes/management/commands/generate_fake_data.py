@@ -0,0 +1,77 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes.fake_data import FAKE_PASSWORD, FakeDataGenerator
+
+
+class Command(BaseCommand):
+    help = (
+        'Наполнение базы синтетическими пользователями, рецептами, '
+        'избранным, корзинами и подписками для нагрузочных тестов'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--recipes', type=int, default=10000)
+        parser.add_argument(
+            '--favorites',
+            type=int,
+            default=20,
+            help='Рецептов в избранном у каждого пользователя (не более)',
+        )
+        parser.add_argument(
+            '--carts',
+            type=int,
+            default=5,
+            help='Рецептов в корзине у каждого пользователя (не более)',
+        )
+        parser.add_argument(
+            '--subscriptions',
+            type=int,
+            default=10,
+            help='Подписок у каждого пользователя (не более)',
+        )
+        parser.add_argument(
+            '--author-skew',
+            type=float,
+            default=1.0,
+            help='Показатель Ципфа для популярности авторов, 0 — равномерно',
+        )
+        parser.add_argument(
+            '--recipe-skew',
+            type=float,
+            default=1.0,
+            help='Показатель Ципфа для популярности рецептов, 0 — равномерно',
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        for name in ('users', 'recipes', 'batch_size'):
+            if options[name] < 1:
+                raise CommandError(f'--{name.replace("_", "-")} должен быть '
+                                   f'положительным')
+        start = time.perf_counter()
+        created = FakeDataGenerator(
+            users=options['users'],
+            recipes=options['recipes'],
+            favorites=options['favorites'],
+            carts=options['carts'],
+            subscriptions=options['subscriptions'],
+            seed=options['seed'],
+            batch_size=options['batch_size'],
+            author_skew=options['author_skew'],
+            recipe_skew=options['recipe_skew'],
+        ).generate()
+        elapsed = time.perf_counter() - start
+        self.stdout.write(
+            self.style.SUCCESS(
+                'Создано: ' + ', '.join(
+                    f'{name} {count}' for name, count in created.items()
+                ) + f' за {elapsed:.1f} с'
+            )
+        )
+        self.stdout.write(
+            f'Пароль синтетических пользователей: {FAKE_PASSWORD}'
+        )
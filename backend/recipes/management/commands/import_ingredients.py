@@ -1,14 +1,146 @@
+"""
+Импорт ингредиентов.
+
+Файл читается потоком и записывается пачками по --batch-size строк, так
+что память не зависит от размера справочника. Повторный запуск с тем же
+файлом ничего не меняет: строки, которые уже есть в базе (уникальны по
+паре название + единица измерения), считаются пропущенными. Других
+полей у ингредиента нет, поэтому обновлять у существующих строк нечего.
+
+Форматы: CSV без заголовка (название, единица), JSON-массив и JSON
+Lines — объекты {"name": …, "measurement_unit": …} или пары
+[название, единица]. На PostgreSQL ключ --copy загружает файл командой
+COPY во временную таблицу и переносит новые строки одним
+INSERT … ON CONFLICT DO NOTHING — для справочников на миллионы строк.
+"""
 import csv
+import io
+import json
 import os
+import time
 
 from django.conf import settings
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
 
+from foodgram.constants import (INGREDIENT_MEASURE_MAX_LENGTH,
+                                INGREDIENT_NAME_MAX_LENGTH)
+from recipes.cache import bump_reference_version
 from recipes.models import Ingredient
+from recipes.transfer import batches
+
+FORMATS = {'.csv': 'csv', '.json': 'json', '.jsonl': 'json'}
+READ_SIZE = 64 * 1024
+
+STAGING_TABLE = 'import_ingredients_staging'
+
+
+def read_csv(file):
+    for number, row in enumerate(csv.reader(file), start=1):
+        yield number, row
+
+
+class JSONStream:
+    """
+    Значения JSON-массива или JSON Lines по одному.
+
+    Файл читается кусками, очередное значение разбирается raw_decode,
+    как только оно целиком оказалось в буфере.
+    """
+
+    def __init__(self, file):
+        self.file = file
+        self.decoder = json.JSONDecoder()
+        self.buffer, self.position, self.eof = '', 0, False
+        self.array = None
+        self.count = 0
+
+    def fill(self):
+        chunk = self.file.read(READ_SIZE)
+        self.eof = not chunk
+        self.buffer = self.buffer[self.position:] + chunk
+        self.position = 0
+
+    def skip_separators(self):
+        """Пропускает пробелы и запятые; False, если файл закончился."""
+        while True:
+            while self.position < len(self.buffer) and (
+                self.buffer[self.position].isspace()
+                or self.buffer[self.position] == ','
+            ):
+                self.position += 1
+            if self.position < len(self.buffer):
+                return True
+            if self.eof:
+                return False
+            self.fill()
+
+    def at_end(self):
+        """Определяет формат по первому символу и ловит конец массива."""
+        if self.array is None:
+            self.array = self.buffer[self.position] == '['
+            if self.array:
+                self.position += 1
+                if not self.skip_separators():
+                    return True
+        return self.array and self.buffer[self.position] == ']'
+
+    def decode(self):
+        """Очередное значение или None, если в буфере его ещё нет."""
+        try:
+            value, end = self.decoder.raw_decode(self.buffer, self.position)
+        except ValueError as error:
+            if self.eof:
+                raise CommandError(
+                    f'Ошибка JSON после записи {self.count}: {error}'
+                )
+            self.fill()
+            return None
+        if end == len(self.buffer) and not self.eof:
+            # Число или литерал могут продолжаться в следующем куске.
+            self.fill()
+            return None
+        self.position = end
+        self.count += 1
+        return (value,)
+
+    def __iter__(self):
+        while self.skip_separators() and not self.at_end():
+            decoded = self.decode()
+            if decoded is not None:
+                yield decoded[0]
+
+
+def json_row(value):
+    """Объект {"name": …, "measurement_unit": …} приводится к паре."""
+    if isinstance(value, dict):
+        return [value.get('name'), value.get('measurement_unit')]
+    return value
+
+
+def read_json(file):
+    for number, value in enumerate(JSONStream(file), start=1):
+        yield number, json_row(value)
+
+
+def clean(row):
+    """Пара (название, единица) или None для некорректной строки."""
+    if not isinstance(row, (list, tuple)) or len(row) != 2:
+        return None
+    name, measurement_unit = row
+    if not isinstance(name, str) or not isinstance(measurement_unit, str):
+        return None
+    name, measurement_unit = name.strip(), measurement_unit.strip()
+    if not (
+        0 < len(name) <= INGREDIENT_NAME_MAX_LENGTH
+        and 0 < len(measurement_unit) <= INGREDIENT_MEASURE_MAX_LENGTH
+    ):
+        return None
+    return name, measurement_unit
 
 
 class Command(BaseCommand):
-    help = 'Импорт ингредиентов из data/ingredients.csv'
+    help = 'Импорт ингредиентов из CSV, JSON или JSON Lines'
 
     def add_arguments(self, parser):
         parser.add_argument(
@@ -20,38 +152,141 @@ class Command(BaseCommand):
                 'data',
                 'ingredients.csv'
             ),
-            help='Путь до файла ingredients.csv'
+            help='Путь до файла с ингредиентами'
+        )
+        parser.add_argument(
+            '--format',
+            choices=sorted(set(FORMATS.values())),
+            help='Формат файла; по умолчанию — по расширению',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Сколько строк записывать за раз',
+        )
+        parser.add_argument(
+            '--copy',
+            action='store_true',
+            help='Загрузка через COPY во временную таблицу (PostgreSQL)',
         )
 
     def handle(self, *args, **options):
         path = options['path']
         if not os.path.exists(path):
-            self.stdout.write(
-                self.style.ERROR(f'Файл не найден: {path}')
+            raise CommandError(f'Файл не найден: {path}')
+        file_format = options['format'] or FORMATS.get(
+            os.path.splitext(path)[1].lower()
+        )
+        if file_format is None:
+            raise CommandError(
+                f'Не удалось определить формат файла {path}, '
+                f'укажите --format'
             )
-            return
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size должен быть положительным')
+        if options['copy'] and connection.vendor != 'postgresql':
+            raise CommandError('--copy поддерживается только PostgreSQL')
 
-        with open(path, encoding='utf-8') as csvfile:
-            reader = csv.reader(csvfile)
-            ingredients = []
-            for row in reader:
-                try:
-                    name, measurement_unit = row
-                    ingredients.append(Ingredient(
-                        name=name.strip(),
-                        measurement_unit=measurement_unit.strip()
-                    ))
-                except ValueError:
-                    self.stdout.write(
-                        self.style.WARNING(f'Пропущена строка: {row}')
-                    )
-
-        Ingredient.objects.bulk_create(
-            ingredients,
-            ignore_conflicts=True
-        )
+        self.verbosity = options['verbosity']
+        self.stats = {'inserted': 0, 'existing': 0, 'invalid': 0}
+        self.start = time.perf_counter()
+        reader = read_csv if file_format == 'csv' else read_json
+        with open(path, encoding='utf-8', newline='') as file:
+            rows = self.clean_rows(reader(file))
+            if options['copy']:
+                self.import_copy(rows, options['batch_size'])
+            else:
+                self.import_batches(rows, options['batch_size'])
+        if self.stats['inserted']:
+            bump_reference_version(Ingredient)
+
+        elapsed = time.perf_counter() - self.start
+        total = sum(self.stats.values())
         self.stdout.write(
             self.style.SUCCESS(
-                f'Импортировано {len(ingredients)} ингредиентов'
+                f'Добавлено {self.stats["inserted"]}, '
+                f'уже были {self.stats["existing"]}, '
+                f'некорректных {self.stats["invalid"]} '
+                f'из {total} строк за {elapsed:.2f} с '
+                f'({total / max(elapsed, 1e-9):.0f} строк/с)'
             )
         )
+
+    def clean_rows(self, rows):
+        for number, row in rows:
+            cleaned = clean(row)
+            if cleaned is None:
+                self.stats['invalid'] += 1
+                self.stdout.write(
+                    self.style.WARNING(f'Пропущена строка {number}: {row}')
+                )
+                continue
+            yield cleaned
+
+    def report_progress(self):
+        if self.verbosity < 2:
+            return
+        elapsed = time.perf_counter() - self.start
+        total = sum(self.stats.values())
+        self.stdout.write(
+            f'Обработано {total} строк, '
+            f'{total / max(elapsed, 1e-9):.0f} строк/с'
+        )
+
+    def import_batches(self, rows, batch_size):
+        """
+        Пачка: один запрос за имеющимися строками и один INSERT.
+
+        Повтор строки из прошлой пачки уже найдётся в базе, поэтому
+        дубликаты убираются только внутри пачки.
+        """
+        for size, batch in (
+            (len(batch), set(batch)) for batch in batches(rows, batch_size)
+        ):
+            existing = set(
+                Ingredient.objects.filter(
+                    name__in={name for name, _ in batch},
+                ).values_list('name', 'measurement_unit')
+            ) & batch
+            new = batch - existing
+            Ingredient.objects.bulk_create(
+                [
+                    Ingredient(name=name, measurement_unit=measurement_unit)
+                    for name, measurement_unit in sorted(new)
+                ],
+                ignore_conflicts=True,
+            )
+            self.stats['inserted'] += len(new)
+            self.stats['existing'] += size - len(new)
+            self.report_progress()
+
+    @transaction.atomic
+    def import_copy(self, rows, batch_size):
+        table = connection.ops.quote_name(Ingredient._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'CREATE TEMPORARY TABLE {STAGING_TABLE} '
+                f'(name text, measurement_unit text) ON COMMIT DROP'
+            )
+            staged = 0
+            for batch in batches(rows, batch_size):
+                buffer = io.StringIO()
+                csv.writer(buffer).writerows(batch)
+                buffer.seek(0)
+                cursor.copy_expert(
+                    f'COPY {STAGING_TABLE} (name, measurement_unit) '
+                    f'FROM STDIN WITH (FORMAT csv)',
+                    buffer,
+                )
+                staged += len(batch)
+                self.stats['existing'] = staged
+                self.report_progress()
+            cursor.execute(
+                f'INSERT INTO {table} (name, measurement_unit) '
+                f'SELECT DISTINCT name, measurement_unit '
+                f'FROM {STAGING_TABLE} '
+                f'ON CONFLICT (name, measurement_unit) DO NOTHING'
+            )
+            self.stats['inserted'] = cursor.rowcount
+            self.stats['existing'] = staged - cursor.rowcount
@@ -0,0 +1,68 @@
+import os
+import sys
+import tarfile
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes.transfer import RecipeImporter, open_text
+
+
+class Command(BaseCommand):
+    help = 'Загрузка рецептов, выгруженных командой export_recipes'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--input',
+            type=str,
+            default='-',
+            help='Файл JSON Lines (.gz — со сжатием), "-" — stdin',
+        )
+        parser.add_argument(
+            '--media',
+            type=str,
+            help='Архив с картинками из export_recipes --media',
+        )
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        for path in (options['input'], options['media']):
+            if path and path != '-' and not os.path.exists(path):
+                raise CommandError(f'Файл не найден: {path}')
+        importer = RecipeImporter(batch_size=options['batch_size'])
+        start = time.perf_counter()
+        if options['media']:
+            with tarfile.open(options['media'], 'r:*') as archive:
+                importer.import_media(archive)
+
+        from_stdin = options['input'] == '-'
+        lines = sys.stdin if from_stdin else open_text(options['input'], 'r')
+        try:
+            for stats in importer.import_recipes(lines):
+                if options['verbosity'] > 1:
+                    self.stdout.write(
+                        f'Загружено {stats["imported"]} рецептов'
+                    )
+        finally:
+            if not from_stdin:
+                lines.close()
+
+        for error in importer.errors:
+            self.stdout.write(self.style.WARNING(error))
+        stats = importer.stats
+        elapsed = time.perf_counter() - start
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Загружено {stats["imported"]}, уже были '
+                f'{stats["existing"]}, пропущено {stats["skipped"]}, '
+                f'некорректных {stats["invalid"]} за {elapsed:.1f} с; '
+                f'новых авторов {stats["authors_created"]}, файлов '
+                f'{stats["files_saved"]} (уже были {stats["files_existing"]}, '
+                f'отклонено {stats["files_rejected"]})'
+            )
+        )
+        if stats['imported']:
+            self.stdout.write(
+                'Рендиции картинок строит '
+                '`python manage.py rebuild_image_renditions`'
+            )
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+from django.db.transaction import atomic
+
+from recipes.counters import recount_recipes, recount_users
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчёт счётчиков избранного, покупок, рецептов и подписчиков '
+        'после правок в БД в обход API и админки'
+    )
+
+    @atomic
+    def handle(self, *args, **options):
+        recipes = recount_recipes()
+        users = recount_users()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Пересчитаны счётчики {recipes} рецептов '
+                f'и {users} пользователей'
+            )
+        )
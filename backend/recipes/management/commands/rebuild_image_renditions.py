@@ -0,0 +1,68 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from foodgram.constants import AVATAR_IMAGE_RENDITIONS, RECIPE_IMAGE_RENDITIONS
+from foodgram.images import IMAGE_ERRORS, process_image_field
+from recipes.models import Recipe
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Построение рендиций для картинок рецептов и аватаров без них'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--delete-originals',
+            action='store_true',
+            help='Удалять исходные файлы после обработки',
+        )
+
+    def handle(self, *args, **options):
+        jobs = (
+            (
+                Recipe.objects.filter(image_renditions={}).exclude(image=''),
+                'image',
+                'image_renditions',
+                RECIPE_IMAGE_RENDITIONS,
+                ('webp', 'jpeg'),
+                {'image_status': Recipe.ImageStatus.READY},
+            ),
+            (
+                User.objects.filter(avatar_renditions={})
+                .exclude(avatar='').exclude(avatar__isnull=True),
+                'avatar',
+                'avatar_renditions',
+                AVATAR_IMAGE_RENDITIONS,
+                ('jpeg',),
+                {},
+            ),
+        )
+        for queryset, field, renditions_field, sizes, formats, values in jobs:
+            processed = failed = 0
+            for instance in queryset.only('pk', field).iterator():
+                try:
+                    process_image_field(
+                        instance,
+                        field,
+                        renditions_field,
+                        sizes,
+                        formats=formats,
+                        delete_source=options['delete_originals'],
+                        **values,
+                    )
+                    processed += 1
+                except IMAGE_ERRORS as error:
+                    failed += 1
+                    self.stdout.write(
+                        self.style.WARNING(
+                            f'{queryset.model._meta.verbose_name} '
+                            f'{instance.pk}: {error}'
+                        )
+                    )
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f'{queryset.model._meta.verbose_name_plural}: '
+                    f'обработано {processed}, ошибок {failed}'
+                )
+            )
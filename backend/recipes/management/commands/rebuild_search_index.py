@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from django.db.transaction import atomic
+
+from recipes.search import update_search_index
+
+
+class Command(BaseCommand):
+    help = 'Пересборка поискового индекса рецептов'
+
+    @atomic
+    def handle(self, *args, **options):
+        update_search_index()
+        self.stdout.write(self.style.SUCCESS('Поисковый индекс пересобран'))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from django.db.transaction import atomic
+
+from recipes.models import ShoppingListItem
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересборка агрегированных списков покупок из корзин после правок '
+        'в БД в обход API и админки'
+    )
+
+    @atomic
+    def handle(self, *args, **options):
+        created = ShoppingListItem.objects.rebuild()
+        self.stdout.write(
+            self.style.SUCCESS(f'Создано {created} строк списков покупок')
+        )
@@ -0,0 +1,79 @@
+# Generated by Django 3.2.16 on 2026-10-18 18:22
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+INGREDIENT_NAMES_SQL = '''
+    SELECT {aggregate}
+    FROM recipes_recipeingredient AS item
+    JOIN recipes_ingredient AS ingredient
+        ON ingredient.id = item.ingredient_id
+    WHERE item.recipe_id = recipe.id
+'''
+
+POSTGRES_FORWARD = [
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    'CREATE INDEX recipe_search_vector_gin '
+    'ON recipes_recipe USING gin (search_vector)',
+    'CREATE INDEX recipe_name_trgm '
+    'ON recipes_recipe USING gin (name gin_trgm_ops)',
+    '''
+    UPDATE recipes_recipe AS recipe SET search_vector =
+        setweight(to_tsvector('russian', recipe.name), 'A')
+        || setweight(to_tsvector('russian', coalesce(({names}), '')), 'B')
+        || setweight(to_tsvector('russian', recipe.text), 'C')
+    '''.format(names=INGREDIENT_NAMES_SQL.format(
+        aggregate="string_agg(ingredient.name, ' ')",
+    )),
+]
+
+POSTGRES_BACKWARD = [
+    'DROP INDEX IF EXISTS recipe_name_trgm',
+    'DROP INDEX IF EXISTS recipe_search_vector_gin',
+]
+
+SQLITE_FORWARD = [
+    '''
+    CREATE VIRTUAL TABLE recipes_recipe_fts
+    USING fts5(name, ingredients, text, tokenize = 'unicode61')
+    ''',
+    '''
+    INSERT INTO recipes_recipe_fts (rowid, name, ingredients, text)
+    SELECT recipe.id, recipe.name, coalesce(({names}), ''), recipe.text
+    FROM recipes_recipe AS recipe
+    '''.format(names=INGREDIENT_NAMES_SQL.format(
+        aggregate="group_concat(ingredient.name, ' ')",
+    )),
+]
+
+SQLITE_BACKWARD = ['DROP TABLE IF EXISTS recipes_recipe_fts']
+
+
+def run_for_vendor(postgres, sqlite):
+    def operation(apps, schema_editor):
+        statements = {
+            'postgresql': postgres,
+            'sqlite': sqlite,
+        }.get(schema_editor.connection.vendor, [])
+        for statement in statements:
+            schema_editor.execute(statement)
+    return operation
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0005_shopping_list_item'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True, verbose_name='Поисковый вектор'),
+        ),
+        migrations.RunPython(
+            run_for_vendor(POSTGRES_FORWARD, SQLITE_FORWARD),
+            run_for_vendor(POSTGRES_BACKWARD, SQLITE_BACKWARD),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 3.2.16 on 2026-10-18 18:46
+
+from django.db import migrations, models
+
+
+def mark_processed(apps, schema_editor):
+    """Картинки с рендициями уже обработаны, остальные ждут обработки."""
+    Recipe = apps.get_model('recipes', 'Recipe')
+    Recipe.objects.exclude(image_renditions={}).update(image_status='ready')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0009_recipe_image_renditions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='image_status',
+            field=models.CharField(choices=[('pending', 'Обрабатывается'), ('ready', 'Готова'), ('failed', 'Ошибка обработки')], default='pending', editable=False, max_length=16, verbose_name='Состояние картинки'),
+        ),
+        migrations.RunPython(mark_processed, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 3.2.16 on 2026-10-18 22:20
+
+from django.db import migrations, models
+
+# Фильтр IngredientFilter по началу названия (istartswith) на PostgreSQL
+# сравнивает UPPER(name::text) LIKE UPPER(%s): индекс строится по тому же
+# выражению, text_pattern_ops нужен для LIKE при любой локали базы.
+POSTGRES_FORWARD = [
+    'CREATE INDEX ingredient_name_upper_idx ON recipes_ingredient '
+    '(UPPER(name::text) text_pattern_ops)',
+]
+
+POSTGRES_BACKWARD = ['DROP INDEX IF EXISTS ingredient_name_upper_idx']
+
+# На SQLite LIKE без учёта регистра использует индекс с COLLATE NOCASE.
+SQLITE_FORWARD = [
+    'CREATE INDEX ingredient_name_nocase_idx ON recipes_ingredient '
+    '(name COLLATE NOCASE)',
+]
+
+SQLITE_BACKWARD = ['DROP INDEX IF EXISTS ingredient_name_nocase_idx']
+
+
+def run_for_vendor(postgres, sqlite):
+    def operation(apps, schema_editor):
+        statements = {
+            'postgresql': postgres,
+            'sqlite': sqlite,
+        }.get(schema_editor.connection.vendor, [])
+        for statement in statements:
+            schema_editor.execute(statement)
+    return operation
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0011_recipe_image_hash'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['author', '-pub_date', '-id'], name='recipe_author_pub_date_idx'),
+        ),
+        migrations.RunPython(
+            run_for_vendor(POSTGRES_FORWARD, SQLITE_FORWARD),
+            run_for_vendor(POSTGRES_BACKWARD, SQLITE_BACKWARD),
+        ),
+    ]
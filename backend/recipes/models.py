@@ -1,8 +1,10 @@
 import shortuuid
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db import models
-from django.db.models import Exists, Manager, OuterRef
+from django.db.models import (Exists, OuterRef, Prefetch, QuerySet, Subquery,
+                              Sum)
 
 from foodgram.constants import (COOKING_TIME_MAX, COOKING_TIME_MIN,
                                 INGREDIENT_MAX_AMOUNT,
@@ -11,18 +13,20 @@ from foodgram.constants import (COOKING_TIME_MAX, COOKING_TIME_MIN,
                                 INGREDIENT_NAME_MAX_LENGTH,
                                 RECIPE_NAME_MAX_LENGTH, TAG_NAME_MAX_LENGTH,
                                 UUID_MAX_LENGTH)
+from users.models import Subscription
 
 User = get_user_model()
 
 
-class RecipeManager(Manager):
-    """Менеджер для модели рецептов."""
+class RecipeQuerySet(QuerySet):
+    """Набор запросов для модели рецептов."""
 
     def with_user_annotations(self, user):
         if not user.is_authenticated:
-            return self.get_queryset().annotate(
+            return self.annotate(
                 is_favorited=Exists(Favorite.objects.none()),
                 is_in_shopping_cart=Exists(ShoppingCart.objects.none()),
+                author_is_subscribed=Exists(Subscription.objects.none()),
             )
 
         favorite_subquery = Favorite.objects.filter(
@@ -33,10 +37,168 @@ class RecipeManager(Manager):
             user=user,
             recipe=OuterRef('pk'),
         )
-        return self.get_queryset().annotate(
+        subscription_subquery = Subscription.objects.filter(
+            user=user,
+            author=OuterRef('author'),
+        )
+        return self.annotate(
             is_favorited=Exists(favorite_subquery),
             is_in_shopping_cart=Exists(cart_subquery),
+            author_is_subscribed=Exists(subscription_subquery),
+        )
+
+    def with_related(self):
+        """
+        План загрузки связанных объектов для сериализации рецептов.
+
+        Автор подтягивается джойном, теги и ингредиенты — по одному
+        запросу на страницу, независимо от количества рецептов.
+        """
+        return self.select_related('author').prefetch_related(
+            Prefetch('tags', queryset=Tag.objects.all()),
+            Prefetch(
+                'ingredients',
+                queryset=RecipeIngredient.objects.select_related(
+                    'ingredient',
+                ),
+            ),
+        )
+
+    def latest_per_author(self, limit):
+        """
+        Не более limit последних рецептов каждого автора.
+
+        Ограничение накладывается коррелированным подзапросом, поэтому
+        при использовании в Prefetch рецепты всех авторов страницы
+        загружаются одним запросом.
+        """
+        latest = Recipe.objects.filter(
+            author=OuterRef('author'),
+        ).values('pk')[:limit]
+        return self.filter(pk__in=Subquery(latest))
+
+
+class ShoppingListItemQuerySet(QuerySet):
+    """Набор запросов для агрегированных списков покупок."""
+
+    @staticmethod
+    def lock_users(user_ids):
+        User.objects.filter(pk__in=user_ids).lock()
+
+    def apply_deltas(self, user_ids, deltas):
+        """
+        Прибавляет deltas {id ингредиента: количество} к спискам покупок.
+
+        Отрицательные значения вычитаются, строки с нулевым остатком
+        удаляются. Вызывается внутри транзакции: строки пользователей
+        блокируются в порядке pk, поэтому параллельные изменения списка
+        одного пользователя не вставляют одну и ту же строку дважды.
+        """
+        deltas = {
+            ingredient_id: delta
+            for ingredient_id, delta in deltas.items()
+            if delta
+        }
+        user_ids = list(user_ids)
+        if not deltas or not user_ids:
+            return
+        self.lock_users(user_ids)
+        items = list(
+            self.select_for_update().filter(
+                user_id__in=user_ids,
+                ingredient_id__in=deltas,
+            )
+        )
+        existing = set()
+        changed, emptied = [], []
+        for item in items:
+            existing.add((item.user_id, item.ingredient_id))
+            item.amount += deltas[item.ingredient_id]
+            if item.amount > 0:
+                changed.append(item)
+            else:
+                emptied.append(item.pk)
+        self.bulk_update(changed, ['amount'])
+        self.filter(pk__in=emptied).delete()
+        self.bulk_create([
+            ShoppingListItem(
+                user_id=user_id,
+                ingredient_id=ingredient_id,
+                amount=delta,
+            )
+            for user_id in user_ids
+            for ingredient_id, delta in deltas.items()
+            if delta > 0 and (user_id, ingredient_id) not in existing
+        ])
+
+    def add_recipe(self, user_ids, recipe, sign=1):
+        """Добавляет ингредиенты рецепта в списки покупок пользователей."""
+        amounts = RecipeIngredient.objects.filter(
+            recipe=recipe,
+        ).values_list('ingredient_id', 'amount')
+        self.apply_deltas(
+            user_ids,
+            {ingredient: sign * amount for ingredient, amount in amounts},
+        )
+
+    def remove_recipe(self, user_ids, recipe):
+        """Вычитает ингредиенты рецепта из списков покупок пользователей."""
+        self.add_recipe(user_ids, recipe, sign=-1)
+
+    def add_recipes(self, user_ids, recipe_ids, sign=1):
+        """Добавляет ингредиенты нескольких рецептов одним запросом."""
+        amounts = (
+            RecipeIngredient.objects
+            .filter(recipe_id__in=recipe_ids)
+            .values_list('ingredient_id')
+            .annotate(total_amount=Sum('amount'))
+            .order_by()
+        )
+        self.apply_deltas(
+            user_ids,
+            {ingredient: sign * amount for ingredient, amount in amounts},
+        )
+
+    def remove_recipes(self, user_ids, recipe_ids):
+        """Вычитает ингредиенты нескольких рецептов из списков покупок."""
+        self.add_recipes(user_ids, recipe_ids, sign=-1)
+
+    def rebuild(self, user_ids=None):
+        """
+        Пересобирает списки покупок из корзин пользователей.
+
+        Без user_ids — все списки; с ними — только списки этих
+        пользователей, их строки при этом блокируются. Вызывается внутри
+        транзакции.
+        """
+        items = self.all()
+        rows = RecipeIngredient.objects.filter(
+            recipe__shoppingcart_set__isnull=False,
         )
+        if user_ids is not None:
+            user_ids = list(user_ids)
+            if not user_ids:
+                return 0
+            self.lock_users(user_ids)
+            items = items.filter(user__in=user_ids)
+            rows = RecipeIngredient.objects.filter(
+                recipe__shoppingcart_set__user__in=user_ids,
+            )
+        items.delete()
+        totals = (
+            rows
+            .values_list('recipe__shoppingcart_set__user', 'ingredient')
+            .annotate(total_amount=Sum('amount'))
+            .order_by()
+        )
+        return len(self.bulk_create(
+            ShoppingListItem(
+                user_id=user_id,
+                ingredient_id=ingredient_id,
+                amount=amount,
+            )
+            for user_id, ingredient_id, amount in totals.iterator()
+        ))
 
 
 class Tag(models.Model):
@@ -92,7 +254,12 @@ class Ingredient(models.Model):
 class Recipe(models.Model):
     """Модель рецепта."""
 
-    objects = RecipeManager()
+    class ImageStatus(models.TextChoices):
+        PENDING = 'pending', 'Обрабатывается'
+        READY = 'ready', 'Готова'
+        FAILED = 'failed', 'Ошибка обработки'
+
+    objects = RecipeQuerySet.as_manager()
 
     author = models.ForeignKey(
         User,
@@ -109,6 +276,25 @@ class Recipe(models.Model):
         upload_to='recipes/images/',
         verbose_name='Картинка',
     )
+    image_renditions = models.JSONField(
+        default=dict,
+        blank=True,
+        editable=False,
+        verbose_name='Рендиции картинки',
+    )
+    image_status = models.CharField(
+        max_length=16,
+        choices=ImageStatus.choices,
+        default=ImageStatus.PENDING,
+        editable=False,
+        verbose_name='Состояние картинки',
+    )
+    image_hash = models.CharField(
+        max_length=64,
+        blank=True,
+        editable=False,
+        verbose_name='Хеш загруженной картинки',
+    )
     cooking_time = models.PositiveSmallIntegerField(
         verbose_name='Время приготовления (мин)',
         validators=[
@@ -149,11 +335,36 @@ class Recipe(models.Model):
         auto_now_add=True,
         verbose_name='Дата публикации',
     )
+    favorites_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Добавлений в избранное',
+    )
+    carts_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Добавлений в список покупок',
+    )
+    search_vector = SearchVectorField(
+        null=True,
+        editable=False,
+        verbose_name='Поисковый вектор',
+    )
 
     class Meta:
-        ordering = ['-pub_date']
+        ordering = ['-pub_date', '-id']
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
+        indexes = [
+            models.Index(
+                fields=['-pub_date', '-id'],
+                name='recipe_pub_date_id_idx',
+            ),
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='recipe_author_pub_date_idx',
+            ),
+        ]
 
     def __str__(self):
         return self.name
@@ -237,6 +448,8 @@ class UserRecipeRelation(models.Model):
 class Favorite(UserRecipeRelation):
     """Модель избранного рецепта."""
 
+    recipe_counter = 'favorites_count'
+
     class Meta(UserRecipeRelation.Meta):
         verbose_name = 'Избранное'
         verbose_name_plural = 'Избранное'
@@ -248,9 +461,67 @@ class Favorite(UserRecipeRelation):
 class ShoppingCart(UserRecipeRelation):
     """Модель списка покупок."""
 
+    recipe_counter = 'carts_count'
+
     class Meta(UserRecipeRelation.Meta):
         verbose_name = 'Список покупок'
         verbose_name_plural = 'Списки покупок'
 
     def __str__(self):
         return f'{self.user} → {self.recipe}'
+
+
+class ShoppingListItem(models.Model):
+    """Агрегированная строка списка покупок пользователя."""
+
+    objects = ShoppingListItemQuerySet.as_manager()
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='shopping_list',
+        verbose_name='Пользователь',
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        related_name='shopping_list_items',
+        verbose_name='Ингредиент',
+    )
+    amount = models.PositiveIntegerField(verbose_name='Количество')
+
+    class Meta:
+        verbose_name = 'Строка списка покупок'
+        verbose_name_plural = 'Строки списков покупок'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'ingredient'],
+                name='unique_shopping_list_item',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.user}: {self.ingredient} — {self.amount}'
+
+
+class ReferenceVersion(models.Model):
+    """
+    Версия справочника (тегов, ингредиентов).
+
+    Хранится в базе, а не в кеше: с локальным кешем каждого процесса
+    изменение из другого воркера, админки или команды иначе не видно.
+    """
+
+    label = models.CharField(
+        max_length=100,
+        unique=True,
+        verbose_name='Модель',
+    )
+    version = models.FloatField(verbose_name='Время последнего изменения')
+
+    class Meta:
+        verbose_name = 'Версия справочника'
+        verbose_name_plural = 'Версии справочников'
+
+    def __str__(self):
+        return f'{self.label}: {self.version}'
@@ -0,0 +1,171 @@
+"""
+Полнотекстовый поиск рецептов по названию, ингредиентам и описанию.
+
+На PostgreSQL используется колонка Recipe.search_vector (tsvector с
+GIN-индексом) и триграммный индекс по названию для опечаток. На SQLite
+документы рецептов хранятся в виртуальной таблице FTS5. Индекс
+обновляется сигналами при сохранении рецептов, их ингредиентов и
+переименовании ингредиентов, в том числе из админки; пакетные загрузки
+(bulk_create) вызывают update_search_index() сами.
+"""
+import re
+import threading
+
+from django.contrib.postgres.search import (SearchQuery, SearchRank,
+                                            TrigramSimilarity)
+from django.db import connection, transaction
+from django.db.models import F, FloatField, Q
+from django.db.models.expressions import RawSQL
+
+SEARCH_CONFIG = 'russian'
+FTS_TABLE = 'recipes_recipe_fts'
+
+INGREDIENT_NAMES_SQL = '''
+    SELECT {aggregate}
+    FROM recipes_recipeingredient AS item
+    JOIN recipes_ingredient AS ingredient
+        ON ingredient.id = item.ingredient_id
+    WHERE item.recipe_id = recipe.id
+'''
+
+POSTGRES_UPDATE_SQL = '''
+    UPDATE recipes_recipe AS recipe SET search_vector =
+        setweight(to_tsvector(%s::regconfig, recipe.name), 'A')
+        || setweight(
+            to_tsvector(%s::regconfig, coalesce(({names}), '')), 'B'
+        )
+        || setweight(to_tsvector(%s::regconfig, recipe.text), 'C')
+'''.format(
+    names=INGREDIENT_NAMES_SQL.format(
+        aggregate="string_agg(ingredient.name, ' ')",
+    ),
+)
+
+SQLITE_INSERT_SQL = '''
+    INSERT INTO {table} (rowid, name, ingredients, text)
+    SELECT recipe.id, recipe.name, coalesce(({names}), ''), recipe.text
+    FROM recipes_recipe AS recipe
+'''.format(
+    table=FTS_TABLE,
+    names=INGREDIENT_NAMES_SQL.format(
+        aggregate="group_concat(ingredient.name, ' ')",
+    ),
+)
+
+
+def update_search_index(recipe_ids=None):
+    """Обновляет поисковые документы рецептов (всех, если ids не заданы)."""
+    where, params = '', []
+    if recipe_ids is not None:
+        recipe_ids = list(recipe_ids)
+        if not recipe_ids:
+            return
+        where = ' WHERE recipe.id IN ({})'.format(
+            ', '.join(['%s'] * len(recipe_ids))
+        )
+        params = recipe_ids
+
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute(
+                POSTGRES_UPDATE_SQL + where,
+                [SEARCH_CONFIG] * 3 + params,
+            )
+        elif connection.vendor == 'sqlite':
+            remove_from_search_index(recipe_ids)
+            cursor.execute(SQLITE_INSERT_SQL + where, params)
+
+
+class PendingRecipes(threading.local):
+    def __init__(self):
+        self.ids = set()
+
+
+pending = PendingRecipes()
+
+
+def update_search_index_on_commit(recipe_ids):
+    """
+    Обновляет документы рецептов после коммита транзакции.
+
+    Рецепты, изменённые в транзакции несколько раз, обновляются одним
+    запросом: первый же обработчик коммита забирает все накопленные id.
+    """
+    pending.ids.update(recipe_ids)
+    transaction.on_commit(flush_search_index)
+
+
+def flush_search_index():
+    recipe_ids = set(pending.ids)
+    pending.ids.clear()
+    update_search_index(recipe_ids)
+
+
+def remove_from_search_index(recipe_ids=None):
+    """Удаляет документы рецептов из FTS5 (на PostgreSQL не требуется)."""
+    if recipe_ids is None:
+        pending.ids.clear()
+    else:
+        pending.ids.difference_update(recipe_ids)
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        if recipe_ids is None:
+            cursor.execute(f'DELETE FROM {FTS_TABLE}')
+        elif recipe_ids:
+            cursor.execute(
+                f'DELETE FROM {FTS_TABLE} WHERE rowid IN ({{}})'.format(
+                    ', '.join(['%s'] * len(recipe_ids))
+                ),
+                list(recipe_ids),
+            )
+
+
+def fts5_query(query):
+    """Безопасный запрос FTS5: все слова обязательны, поиск по префиксу."""
+    return ' '.join(f'"{word}"*' for word in re.findall(r'\w+', query))
+
+
+def search_recipes(queryset, query):
+    """Фильтрует рецепты по запросу и сортирует по релевантности."""
+    if connection.vendor == 'postgresql':
+        search_query = SearchQuery(
+            query,
+            config=SEARCH_CONFIG,
+            search_type='websearch',
+        )
+        return queryset.annotate(
+            search_rank=(
+                SearchRank(F('search_vector'), search_query)
+                + TrigramSimilarity('name', query)
+            ),
+        ).filter(
+            Q(search_vector=search_query)
+            | Q(name__trigram_similar=query)
+        ).order_by('-search_rank', '-pub_date')
+
+    if connection.vendor == 'sqlite':
+        match = fts5_query(query)
+        if not match:
+            return queryset.none()
+        return queryset.filter(
+            pk__in=RawSQL(
+                f'SELECT rowid FROM {FTS_TABLE} '
+                f'WHERE {FTS_TABLE} MATCH %s',
+                (match,),
+            ),
+        ).annotate(
+            search_rank=RawSQL(
+                f'SELECT -bm25({FTS_TABLE}, 10.0, 5.0, 1.0) '
+                f'FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s '
+                f'AND rowid = recipes_recipe.id',
+                (match,),
+                output_field=FloatField(),
+            ),
+        ).order_by('-search_rank', '-pub_date')
+
+    return queryset.filter(
+        Q(name__icontains=query)
+        | Q(text__icontains=query)
+        | Q(recipe_ingredients__name__icontains=query)
+    ).distinct()
@@ -0,0 +1,146 @@
+"""
+Разрешение коротких ссылок в id рецептов.
+
+Короткий код рецепта не меняется после создания, поэтому пары
+код ↔ id хранятся в ограниченном LRU в памяти процесса и, если включён
+SHORT_LINK_SHARED_CACHE, в общем кеше Django. Неизвестные коды
+запоминаются на SHORT_LINK_NEGATIVE_TTL секунд в отдельном LRU, чтобы
+перебор случайных ссылок не доходил до БД и не вытеснял рабочие коды.
+При удалении рецепта записи сбрасываются в текущем процессе и в общем
+кеше; LRU других процессов отдадут ссылку на удалённый рецепт, и
+фронтенд покажет 404 так же, как для неизвестного id.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+
+from foodgram.constants import (SHORT_LINK_CACHE_TIMEOUT, SHORT_LINK_LRU_SIZE,
+                                SHORT_LINK_NEGATIVE_LRU_SIZE,
+                                SHORT_LINK_NEGATIVE_TTL)
+from foodgram.metrics import observe_cache
+from recipes.models import Recipe
+
+CODE_KEY = 'shortlink:code:{}'
+PK_KEY = 'shortlink:pk:{}'
+MISSING = 0
+
+
+class ShortLinkResolver:
+    """Кеш код ↔ id рецепта в три уровня: LRU процесса, общий кеш, БД."""
+
+    def __init__(self, maxsize=SHORT_LINK_LRU_SIZE,
+                 negative_maxsize=SHORT_LINK_NEGATIVE_LRU_SIZE,
+                 negative_ttl=SHORT_LINK_NEGATIVE_TTL):
+        self.maxsize = maxsize
+        self.negative_maxsize = negative_maxsize
+        self.negative_ttl = negative_ttl
+        self._lock = threading.Lock()
+        self._pks = OrderedDict()
+        self._codes = OrderedDict()
+        self._missing = OrderedDict()
+
+    @staticmethod
+    def _put(entries, key, value, maxsize):
+        entries[key] = value
+        entries.move_to_end(key)
+        if len(entries) > maxsize:
+            entries.popitem(last=False)
+
+    def remember(self, short_code, pk):
+        with self._lock:
+            self._put(self._pks, short_code, pk, self.maxsize)
+            self._put(self._codes, pk, short_code, self.maxsize)
+            self._missing.pop(short_code, None)
+
+    def lookup(self, short_code):
+        """
+        Поиск только в памяти процесса, без ввода-вывода.
+
+        Возвращает пару (найдено, id); id равен None для кода, который
+        недавно не нашёлся в БД.
+        """
+        with self._lock:
+            pk = self._pks.get(short_code)
+            if pk is not None:
+                self._pks.move_to_end(short_code)
+                return True, pk
+            expires = self._missing.get(short_code)
+            if expires is not None:
+                if expires > time.monotonic():
+                    return True, None
+                del self._missing[short_code]
+        return False, None
+
+    def resolve(self, short_code):
+        """Id рецепта по короткому коду или None."""
+        found, pk = self.lookup(short_code)
+        observe_cache('short_links_local', found)
+        if found:
+            return pk
+
+        if settings.SHORT_LINK_SHARED_CACHE:
+            pk = cache.get(CODE_KEY.format(short_code))
+            observe_cache('short_links_shared', pk is not None)
+        if pk is None:
+            pk = Recipe.objects.filter(
+                short_code=short_code,
+            ).values_list('pk', flat=True).first()
+            if settings.SHORT_LINK_SHARED_CACHE:
+                cache.set(
+                    CODE_KEY.format(short_code),
+                    MISSING if pk is None else pk,
+                    self.negative_ttl if pk is None
+                    else SHORT_LINK_CACHE_TIMEOUT,
+                )
+
+        if not pk:
+            with self._lock:
+                self._put(
+                    self._missing,
+                    short_code,
+                    time.monotonic() + self.negative_ttl,
+                    self.negative_maxsize,
+                )
+            return None
+        self.remember(short_code, pk)
+        return pk
+
+    def get_short_code(self, pk):
+        """Короткий код рецепта по id или None."""
+        with self._lock:
+            short_code = self._codes.get(pk)
+            if short_code is not None:
+                self._codes.move_to_end(pk)
+                return short_code
+
+        if settings.SHORT_LINK_SHARED_CACHE:
+            short_code = cache.get(PK_KEY.format(pk))
+        if short_code is None:
+            short_code = Recipe.objects.filter(
+                pk=pk,
+            ).values_list('short_code', flat=True).first()
+            if short_code is None:
+                return None
+            if settings.SHORT_LINK_SHARED_CACHE:
+                cache.set(
+                    PK_KEY.format(pk),
+                    short_code,
+                    SHORT_LINK_CACHE_TIMEOUT,
+                )
+        self.remember(short_code, pk)
+        return short_code
+
+    def forget(self, short_code, pk):
+        """Сбрасывает записи рецепта, например после его удаления."""
+        with self._lock:
+            self._pks.pop(short_code, None)
+            self._codes.pop(pk, None)
+            self._missing.pop(short_code, None)
+        if settings.SHORT_LINK_SHARED_CACHE:
+            cache.delete_many([CODE_KEY.format(short_code), PK_KEY.format(pk)])
+
+
+short_links = ShortLinkResolver()
@@ -0,0 +1,80 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from recipes.cache import bump_reference_version
+from recipes.counters import recount_on_commit
+from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+                            ShoppingCart, Tag)
+from recipes.search import (remove_from_search_index,
+                            update_search_index_on_commit)
+from recipes.shortlinks import short_links
+
+User = get_user_model()
+
+# Поля рецепта, из которых строится поисковый документ
+SEARCH_FIELDS = {'name', 'text'}
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def invalidate_reference_cache(sender, **kwargs):
+    """Сбрасывает кеш справочника при изменении тега или ингредиента."""
+    bump_reference_version(sender)
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def invalidate_short_link(sender, instance, **kwargs):
+    """Сбрасывает кеш короткой ссылки при создании и удалении рецепта."""
+    if kwargs.get('created', True):
+        short_links.forget(instance.short_code, instance.pk)
+
+
+@receiver(pre_delete, sender=User)
+def recount_after_user_delete(sender, instance, **kwargs):
+    """
+    Пользователь удаляется вместе с избранным, корзиной, подписками и
+    рецептами: чужие счётчики и списки покупок пересчитываются.
+    """
+    recount_on_commit(
+        recipe_ids=[
+            *Favorite.objects.filter(user=instance)
+            .values_list('recipe_id', flat=True),
+            *ShoppingCart.objects.filter(user=instance)
+            .values_list('recipe_id', flat=True),
+        ],
+        user_ids=instance.subscriptions.values_list('author_id', flat=True),
+        cart_user_ids=ShoppingCart.objects.filter(recipe__author=instance)
+        .exclude(user=instance).values_list('user_id', flat=True),
+    )
+
+
+@receiver(post_save, sender=Recipe)
+def index_recipe(sender, instance, update_fields=None, **kwargs):
+    """Обновляет поисковый документ рецепта после коммита."""
+    if update_fields is None or SEARCH_FIELDS & set(update_fields):
+        update_search_index_on_commit([instance.pk])
+
+
+@receiver(post_delete, sender=Recipe)
+def unindex_recipe(sender, instance, **kwargs):
+    remove_from_search_index([instance.pk])
+
+
+@receiver(post_save, sender=RecipeIngredient)
+@receiver(post_delete, sender=RecipeIngredient)
+def index_recipe_ingredients(sender, instance, **kwargs):
+    """Состав рецепта, изменённый поштучно (админка, каскадное удаление)."""
+    update_search_index_on_commit([instance.recipe_id])
+
+
+@receiver(post_save, sender=Ingredient)
+def index_renamed_ingredient(sender, instance, created, **kwargs):
+    """Переименованный ингредиент меняет документы рецептов с ним."""
+    if not created:
+        update_search_index_on_commit(
+            instance.recipe_ingredients.values_list('recipe_id', flat=True)
+        )
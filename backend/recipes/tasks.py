@@ -0,0 +1,41 @@
+import logging
+
+from foodgram.constants import IMAGE_SOURCE_TTL, RECIPE_IMAGE_RENDITIONS
+from foodgram.images import (IMAGE_ERRORS, delete_unused_files,
+                             process_image_field)
+from recipes.models import Recipe
+from tasks.queue import task
+
+logger = logging.getLogger('foodgram.tasks')
+
+
+@task
+def process_recipe_image(pk, source):
+    """Строит рендиции загруженной картинки рецепта."""
+    recipe = Recipe.objects.filter(pk=pk, image=source).only('image').first()
+    if recipe is None:
+        # Рецепт удалён или картинку уже заменили.
+        return
+    try:
+        renditions = process_image_field(
+            recipe,
+            'image',
+            'image_renditions',
+            RECIPE_IMAGE_RENDITIONS,
+            delete_source=False,
+            image_status=Recipe.ImageStatus.READY,
+        )
+    except IMAGE_ERRORS as error:
+        logger.warning('Картинка рецепта %s не обработана: %s', pk, error)
+        Recipe.objects.filter(pk=pk, image=source).update(
+            image_status=Recipe.ImageStatus.FAILED,
+        )
+        return
+    if renditions is not None:
+        delete_recipe_images.schedule(IMAGE_SOURCE_TTL, paths=[source])
+
+
+@task
+def delete_recipe_images(paths):
+    """Удаляет файлы, на которые не ссылается картинка ни одного рецепта."""
+    delete_unused_files(paths, Recipe, 'image')
@@ -0,0 +1,443 @@
+"""
+Перенос рецептов между экземплярами.
+
+Рецепты выгружаются в JSON Lines: строка — рецепт вместе с автором,
+тегами и ингредиентами, которые ссылаются друг на друга не по id, а по
+естественным ключам (email автора, slug тега, название и единица
+ингредиента). Картинки рецептов и аватары авторов складываются в
+tar-архив под своими путями в хранилище. Рендиции не переносятся, их
+строит rebuild_image_renditions.
+
+Обе стороны работают пачками по batch_size рецептов, поэтому память не
+зависит от объёма выгрузки. Загрузка пропускает рецепты, short_code
+которых уже есть в базе, так что её можно повторять.
+"""
+import gzip
+import json
+import posixpath
+import tarfile
+import time
+from collections import Counter, defaultdict
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import F, Prefetch
+from django.utils.dateparse import parse_datetime
+
+from recipes.cache import bump_reference_version
+from recipes.models import Ingredient, Recipe, RecipeIngredient, Tag
+from recipes.search import update_search_index
+
+User = get_user_model()
+
+MEDIA_PREFIXES = (
+    Recipe._meta.get_field('image').upload_to,
+    User._meta.get_field('avatar').upload_to,
+)
+
+
+def open_text(path, mode):
+    """Текстовый файл; с расширением .gz — сжатый gzip."""
+    if path.endswith('.gz'):
+        return gzip.open(path, mode + 't', encoding='utf-8')
+    return open(path, mode, encoding='utf-8')
+
+
+def batches(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+class RecipeExporter:
+    """Выгрузка рецептов в JSON Lines и картинок в tar-архив."""
+
+    def __init__(self, batch_size=1000):
+        self.batch_size = batch_size
+        self.missing_files = []
+        self._authors = set()
+
+    def recipe_batches(self):
+        """Пачки рецептов по возрастанию pk, три запроса на пачку."""
+        queryset = (
+            Recipe.objects
+            .select_related('author')
+            .defer('search_vector', 'image_renditions')
+            .prefetch_related(
+                'tags',
+                Prefetch(
+                    'ingredients',
+                    queryset=RecipeIngredient.objects.select_related(
+                        'ingredient',
+                    ),
+                ),
+            )
+            .order_by('pk')
+        )
+        last = 0
+        while True:
+            batch = list(queryset.filter(pk__gt=last)[:self.batch_size])
+            if not batch:
+                return
+            yield batch
+            last = batch[-1].pk
+
+    @staticmethod
+    def serialize(recipe):
+        author = recipe.author
+        return {
+            'short_code': recipe.short_code,
+            'name': recipe.name,
+            'text': recipe.text,
+            'cooking_time': recipe.cooking_time,
+            'pub_date': recipe.pub_date.isoformat(),
+            'image': recipe.image.name,
+            'author': {
+                'email': author.email,
+                'username': author.username,
+                'first_name': author.first_name,
+                'last_name': author.last_name,
+                'avatar': author.avatar.name if author.avatar else None,
+            },
+            'tags': [
+                {'name': tag.name, 'slug': tag.slug}
+                for tag in recipe.tags.all()
+            ],
+            'ingredients': [
+                {
+                    'name': item.ingredient.name,
+                    'measurement_unit': item.ingredient.measurement_unit,
+                    'amount': item.amount,
+                }
+                for item in recipe.ingredients.all()
+            ],
+        }
+
+    def add_file(self, archive, name):
+        try:
+            size = default_storage.size(name)
+            file = default_storage.open(name)
+        except OSError:
+            self.missing_files.append(name)
+            return
+        info = tarfile.TarInfo(name)
+        info.size = size
+        info.mtime = time.time()
+        with file:
+            archive.addfile(info, file)
+
+    def export(self, output, archive=None):
+        """
+        Пишет рецепты в output и файлы в archive (tarfile или None).
+
+        Генератор: после каждой пачки отдаёт число выгруженных рецептов.
+        """
+        exported = 0
+        for batch in self.recipe_batches():
+            archived = set()
+            for recipe in batch:
+                output.write(
+                    json.dumps(self.serialize(recipe), ensure_ascii=False)
+                    + '\n'
+                )
+                if archive is None:
+                    continue
+                names = [recipe.image.name]
+                if recipe.author_id not in self._authors:
+                    self._authors.add(recipe.author_id)
+                    names.append(recipe.author.avatar.name)
+                for name in names:
+                    if name and name not in archived:
+                        archived.add(name)
+                        self.add_file(archive, name)
+            exported += len(batch)
+            yield exported
+
+
+class RecipeImporter:
+    """
+    Загрузка рецептов, выгруженных RecipeExporter.
+
+    Теги и ингредиенты сопоставляются по словарям в памяти (справочники
+    небольшие), авторы — одним запросом на пачку. Недостающие теги,
+    ингредиенты и авторы создаются, авторы — без пароля.
+    """
+
+    def __init__(self, batch_size=500):
+        self.batch_size = batch_size
+        self.stats = Counter()
+        self.errors = []
+        self.tags = dict(Tag.objects.values_list('slug', 'pk'))
+        self.ingredients = {
+            (name, measurement_unit): pk
+            for pk, name, measurement_unit in Ingredient.objects.values_list(
+                'pk', 'name', 'measurement_unit',
+            )
+        }
+
+    @staticmethod
+    def media_name(name):
+        """Путь файла из архива или None, если он ведёт не туда."""
+        name = posixpath.normpath(name)
+        if name.startswith(MEDIA_PREFIXES) and '..' not in name.split('/'):
+            return name
+        return None
+
+    def import_media(self, archive):
+        for member in archive:
+            name = self.media_name(member.name)
+            if not member.isfile() or name is None:
+                self.stats['files_rejected'] += 1
+                continue
+            if default_storage.exists(name):
+                self.stats['files_existing'] += 1
+                continue
+            default_storage.save(name, File(archive.extractfile(member)))
+            self.stats['files_saved'] += 1
+
+    @staticmethod
+    def parse_record(line):
+        """
+        Рецепт из строки выгрузки; KeyError, TypeError, ValueError.
+
+        Повторы ингредиента складываются в одну строку, повторы тега
+        отбрасываются: иначе вставка связей нарушила бы уникальность и
+        откатила всю пачку.
+        """
+        data = json.loads(line)
+        author = data['author']
+        ingredients = Counter()
+        for item in data['ingredients']:
+            ingredients[
+                str(item['name']), str(item['measurement_unit'])
+            ] += int(item['amount'])
+        tags = {}
+        for tag in data['tags']:
+            tags.setdefault(str(tag['slug']), str(tag['name']))
+        return {
+            'short_code': str(data['short_code']),
+            'name': str(data['name']),
+            'text': str(data['text']),
+            'cooking_time': int(data['cooking_time']),
+            'pub_date': parse_datetime(data['pub_date']),
+            'image': str(data['image']),
+            'author': {
+                'email': str(author['email']),
+                'username': str(author['username']),
+                'first_name': str(author.get('first_name', '')),
+                'last_name': str(author.get('last_name', '')),
+                'avatar': author.get('avatar') or None,
+            },
+            'tags': [
+                {'slug': slug, 'name': name} for slug, name in tags.items()
+            ],
+            'ingredients': [
+                {
+                    'name': name,
+                    'measurement_unit': measurement_unit,
+                    'amount': amount,
+                }
+                for (name, measurement_unit), amount in ingredients.items()
+            ],
+        }
+
+    def parse(self, lines):
+        for number, line in enumerate(lines, start=1):
+            if not line.strip():
+                continue
+            try:
+                yield self.parse_record(line)
+            except (AttributeError, KeyError, TypeError, ValueError) as error:
+                self.stats['invalid'] += 1
+                self.errors.append(f'строка {number}: {error!r}')
+
+    def import_recipes(self, lines):
+        """Генератор: после каждой пачки отдаёт счётчики загрузки."""
+        for batch in batches(self.parse(lines), self.batch_size):
+            self.import_batch(batch)
+            yield self.stats
+
+    @transaction.atomic
+    def import_batch(self, records):
+        unique = {}
+        for record in records:
+            unique.setdefault(record['short_code'], record)
+        existing = set(
+            Recipe.objects.filter(short_code__in=unique)
+            .values_list('short_code', flat=True)
+        )
+        self.stats['existing'] += len(records) - len(unique) + len(existing)
+        records = [
+            record for code, record in unique.items()
+            if code not in existing
+        ]
+        if not records:
+            return
+        authors = self.resolve_authors(records)
+        skipped = [
+            record for record in records
+            if record['author']['email'] not in authors
+        ]
+        for record in skipped:
+            self.errors.append(
+                f'{record["short_code"]}: не удалось создать автора '
+                f'{record["author"]["email"]}'
+            )
+        self.stats['skipped'] += len(skipped)
+        records = [
+            record for record in records
+            if record['author']['email'] in authors
+        ]
+        self.resolve_tags(records)
+        self.resolve_ingredients(records)
+
+        Recipe.objects.bulk_create(
+            Recipe(
+                author_id=authors[record['author']['email']],
+                name=record['name'],
+                text=record['text'],
+                cooking_time=record['cooking_time'],
+                image=record['image'],
+                short_code=record['short_code'],
+            )
+            for record in records
+        )
+        pks = dict(
+            Recipe.objects.filter(
+                short_code__in=[record['short_code'] for record in records],
+            ).values_list('short_code', 'pk')
+        )
+        # pub_date с auto_now_add при вставке заменяется текущим временем.
+        Recipe.objects.bulk_update(
+            [
+                Recipe(pk=pks[record['short_code']],
+                       pub_date=record['pub_date'])
+                for record in records
+                if record['pub_date'] is not None
+            ],
+            ['pub_date'],
+        )
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(
+                recipe_id=pks[record['short_code']],
+                ingredient_id=self.ingredients[
+                    item['name'], item['measurement_unit']
+                ],
+                amount=item['amount'],
+            )
+            for record in records
+            for item in record['ingredients']
+        )
+        Recipe.tags.through.objects.bulk_create(
+            Recipe.tags.through(
+                recipe_id=pks[record['short_code']],
+                tag_id=self.tags[tag['slug']],
+            )
+            for record in records
+            for tag in record['tags']
+        )
+        self.update_recipes_count(
+            Counter(authors[record['author']['email']] for record in records)
+        )
+        update_search_index(pks.values())
+        self.stats['imported'] += len(records)
+
+    def resolve_authors(self, records):
+        """Словарь email → pk авторов пачки, недостающие создаются."""
+        data = {record['author']['email']: record['author']
+                for record in records}
+        authors = dict(
+            User.objects.filter(email__in=data).values_list('email', 'pk')
+        )
+        missing = [email for email in data if email not in authors]
+        if not missing:
+            return authors
+        User.objects.bulk_create(
+            (
+                User(
+                    email=email,
+                    username=data[email]['username'],
+                    first_name=data[email]['first_name'],
+                    last_name=data[email]['last_name'],
+                    avatar=data[email]['avatar'],
+                    password=make_password(None),
+                )
+                for email in missing
+            ),
+            ignore_conflicts=True,
+        )
+        created = dict(
+            User.objects.filter(email__in=missing).values_list('email', 'pk')
+        )
+        self.stats['authors_created'] += len(created)
+        authors.update(created)
+        return authors
+
+    def resolve_tags(self, records):
+        missing = {
+            tag['slug']: tag['name']
+            for record in records
+            for tag in record['tags']
+            if tag['slug'] not in self.tags
+        }
+        if not missing:
+            return
+        Tag.objects.bulk_create(
+            (Tag(slug=slug, name=name) for slug, name in missing.items()),
+            ignore_conflicts=True,
+        )
+        self.tags.update(
+            Tag.objects.filter(slug__in=missing).values_list('slug', 'pk')
+        )
+        bump_reference_version(Tag)
+        for record in records:
+            record['tags'] = [
+                tag for tag in record['tags'] if tag['slug'] in self.tags
+            ]
+
+    def resolve_ingredients(self, records):
+        missing = {
+            (item['name'], item['measurement_unit'])
+            for record in records
+            for item in record['ingredients']
+        } - self.ingredients.keys()
+        if not missing:
+            return
+        Ingredient.objects.bulk_create(
+            (
+                Ingredient(name=name, measurement_unit=measurement_unit)
+                for name, measurement_unit in missing
+            ),
+            ignore_conflicts=True,
+        )
+        self.ingredients.update(
+            ((name, measurement_unit), pk)
+            for pk, name, measurement_unit in Ingredient.objects.filter(
+                name__in={name for name, _ in missing},
+            ).values_list('pk', 'name', 'measurement_unit')
+        )
+        bump_reference_version(Ingredient)
+        for record in records:
+            record['ingredients'] = [
+                item for item in record['ingredients']
+                if (item['name'], item['measurement_unit'])
+                in self.ingredients
+            ]
+
+    @staticmethod
+    def update_recipes_count(counts):
+        """Один UPDATE на каждое встретившееся в пачке число рецептов."""
+        authors_by_count = defaultdict(list)
+        for author, count in counts.items():
+            authors_by_count[count].append(author)
+        for count, authors in authors_by_count.items():
+            User.objects.filter(pk__in=authors).update(
+                recipes_count=F('recipes_count') + count,
+            )
@@ -1,12 +1,24 @@
+from asgiref.sync import sync_to_async
 from django.shortcuts import redirect
 
-from recipes.models import Recipe
+from foodgram.metrics import SHORT_LINK_REDIRECTS
+from recipes.shortlinks import short_links
 
 
-def redirect_short_link(request, short_code):
-    """Перенаправление по короткой ссылке на рецепт."""
-    try:
-        recipe = Recipe.objects.get(short_code=short_code)
-        return redirect(f'/recipes/{recipe.pk}/')
-    except Recipe.DoesNotExist:
+async def redirect_short_link(request, short_code):
+    """
+    Перенаправление по короткой ссылке на рецепт.
+
+    Асинхронное представление: под ASGI не занимает поток воркера на
+    время ответа. Код ищется в LRU процесса без переключения потоков,
+    и только при промахе общий кеш и БД опрашиваются через
+    sync_to_async (в Django 3.2 нет асинхронного ORM).
+    """
+    found, recipe_id = short_links.lookup(short_code)
+    if not found:
+        recipe_id = await sync_to_async(short_links.resolve)(short_code)
+    if recipe_id is None:
+        SHORT_LINK_REDIRECTS.labels('missing').inc()
         return redirect('/404/')
+    SHORT_LINK_REDIRECTS.labels('found').inc()
+    return redirect(f'/recipes/{recipe_id}/')
@@ -0,0 +1,21 @@
+from django.contrib import admin
+from django.utils import timezone
+
+from tasks.models import Task
+
+
+@admin.register(Task)
+class TaskAdmin(admin.ModelAdmin):
+    list_display = ('id', 'name', 'status', 'attempts', 'run_after')
+    list_filter = ('status', 'name')
+    readonly_fields = ('locked_at', 'error', 'created_at')
+    actions = ('retry',)
+
+    @admin.action(description='Повторить выбранные задачи')
+    def retry(self, request, queryset):
+        queryset.update(
+            status=Task.Status.PENDING,
+            run_after=timezone.now(),
+            attempts=0,
+            locked_at=None,
+        )
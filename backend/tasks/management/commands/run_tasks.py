@@ -0,0 +1,56 @@
+import signal
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from tasks.queue import DatabaseBackend
+
+
+class Command(BaseCommand):
+    help = 'Выполнение фоновых задач из очереди в БД'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch',
+            type=int,
+            default=10,
+            help='Сколько задач забирать за раз',
+        )
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=1.0,
+            help='Пауза, когда очередь пуста, секунды',
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Выполнить готовые задачи и выйти',
+        )
+
+    def handle(self, *args, **options):
+        backend = DatabaseBackend()
+        self.running = True
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        done = failed = 0
+        while self.running:
+            close_old_connections()
+            tasks = backend.claim(options['batch'])
+            for task in tasks:
+                if backend.execute(task):
+                    done += 1
+                else:
+                    failed += 1
+            if not tasks:
+                if options['once']:
+                    break
+                time.sleep(options['sleep'])
+        self.stdout.write(
+            self.style.SUCCESS(f'Выполнено задач: {done}, ошибок: {failed}')
+        )
+
+    def stop(self, signum, frame):
+        # Текущая пачка дорабатывается, новая не забирается.
+        self.running = False
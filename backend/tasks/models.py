@@ -0,0 +1,63 @@
+from django.db import models
+from django.utils import timezone
+
+from foodgram.constants import TASK_NAME_MAX_LENGTH
+
+
+class Task(models.Model):
+    """Задача в очереди в БД, её выполняет команда run_tasks."""
+
+    class Status(models.TextChoices):
+        PENDING = 'pending', 'Ожидает'
+        RUNNING = 'running', 'Выполняется'
+        FAILED = 'failed', 'Ошибка'
+
+    name = models.CharField(
+        max_length=TASK_NAME_MAX_LENGTH,
+        verbose_name='Задача',
+    )
+    kwargs = models.JSONField(
+        default=dict,
+        verbose_name='Аргументы',
+    )
+    status = models.CharField(
+        max_length=16,
+        choices=Status.choices,
+        default=Status.PENDING,
+        verbose_name='Статус',
+    )
+    attempts = models.PositiveSmallIntegerField(
+        default=0,
+        verbose_name='Попыток',
+    )
+    run_after = models.DateTimeField(
+        default=timezone.now,
+        verbose_name='Не раньше',
+    )
+    locked_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name='Взята в работу',
+    )
+    error = models.TextField(
+        blank=True,
+        verbose_name='Последняя ошибка',
+    )
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Создана',
+    )
+
+    class Meta:
+        ordering = ['run_after', 'id']
+        verbose_name = 'Фоновая задача'
+        verbose_name_plural = 'Фоновые задачи'
+        indexes = [
+            models.Index(
+                fields=['status', 'run_after'],
+                name='task_status_run_after_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.name} #{self.pk}'
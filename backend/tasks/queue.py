@@ -0,0 +1,243 @@
+"""
+Фоновые задачи.
+
+Функция, объявленная через @task в модуле tasks.py приложения, ставится
+в очередь вызовом func.delay(**kwargs), а через countdown секунд после
+коммита — вызовом func.schedule(countdown, **kwargs); аргументы должны
+сериализоваться в JSON. Куда уходит задача, определяет
+BACKGROUND_TASKS_BACKEND:
+
+- sync — выполняется в том же процессе сразу после коммита транзакции,
+  отложенная — в фоновом потоке;
+- process — в пуле процессов рядом с воркером веб-сервера, без
+  дополнительных сервисов; задачи, не выполненные до остановки
+  процесса, теряются, в том числе отложенные;
+- database — строкой таблицы Task в той же транзакции, что и данные,
+  которые задача обрабатывает; выполняет команда run_tasks, упавшие
+  задачи повторяются с растущей задержкой.
+
+Задачи должны быть идемпотентны: после сбоя воркера задача из очереди в
+БД может выполниться ещё раз.
+"""
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import timedelta
+from functools import partial
+
+import django
+from django.apps import apps
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import close_old_connections, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from foodgram.constants import (TASK_LOCK_TIMEOUT, TASK_MAX_ATTEMPTS,
+                                TASK_RETRY_DELAY)
+from foodgram.metrics import observe_task
+
+logger = logging.getLogger('foodgram.tasks')
+
+registry = {}
+
+
+def task(func):
+    """Регистрирует функцию как фоновую задачу и добавляет ей delay()."""
+    name = f'{func.__module__}.{func.__name__}'
+    registry[name] = func
+    func.task_name = name
+    func.delay = partial(enqueue, name)
+    func.schedule = partial(schedule, name)
+    return func
+
+
+def enqueue(name, **kwargs):
+    get_backend().submit(name, kwargs)
+
+
+def schedule(name, countdown, **kwargs):
+    get_backend().submit(name, kwargs, countdown)
+
+
+def start_timer(countdown, func, *args):
+    """Вызов в фоновом потоке; при остановке процесса он теряется."""
+    timer = threading.Timer(countdown, func, args)
+    timer.daemon = True
+    timer.start()
+
+
+def run_task(name, kwargs):
+    start = time.perf_counter()
+    try:
+        registry[name](**kwargs)
+    except Exception:
+        observe_task(name, 'error', time.perf_counter() - start)
+        raise
+    observe_task(name, 'success', time.perf_counter() - start)
+
+
+def run_pooled_task(name, kwargs):
+    """Выполнение в процессе пула: соединение с БД не переиспользуется."""
+    try:
+        run_task(name, kwargs)
+    finally:
+        close_old_connections()
+
+
+class SyncBackend:
+    def submit(self, name, kwargs, countdown=0):
+        if countdown:
+            transaction.on_commit(partial(
+                start_timer, countdown, run_pooled_task, name, kwargs,
+            ))
+        else:
+            transaction.on_commit(partial(run_task, name, kwargs))
+
+
+class ProcessBackend:
+    """
+    Пул процессов, запущенных методом spawn.
+
+    Процессы пула не наследуют соединения с БД и состояние воркера
+    веб-сервера и настраивают Django заново. Пул создаётся при первой
+    задаче в каждом процессе, поэтому переживает fork воркеров gunicorn.
+    """
+
+    def __init__(self):
+        self._executor = None
+        self._pid = None
+
+    @property
+    def executor(self):
+        if self._executor is None or self._pid != os.getpid():
+            self._executor = ProcessPoolExecutor(
+                max_workers=settings.BACKGROUND_TASKS_WORKERS,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=django.setup,
+            )
+            self._pid = os.getpid()
+        return self._executor
+
+    def submit(self, name, kwargs, countdown=0):
+        if countdown:
+            transaction.on_commit(partial(
+                start_timer, countdown, self._submit, name, kwargs,
+            ))
+        else:
+            transaction.on_commit(partial(self._submit, name, kwargs))
+
+    def _submit(self, name, kwargs):
+        try:
+            future = self.executor.submit(run_pooled_task, name, kwargs)
+        except BrokenProcessPool:
+            # Процесс пула упал: пул непригоден, создаём новый.
+            self._executor = None
+            future = self.executor.submit(run_pooled_task, name, kwargs)
+        future.add_done_callback(partial(self._log_failure, name))
+
+    @staticmethod
+    def _log_failure(name, future):
+        error = future.exception()
+        if error is not None:
+            logger.error(
+                'Задача %s завершилась ошибкой', name, exc_info=error,
+            )
+
+
+class DatabaseBackend:
+    """Очередь в таблице Task; задачи выполняет команда run_tasks."""
+
+    @property
+    def model(self):
+        return apps.get_model('tasks', 'Task')
+
+    def submit(self, name, kwargs, countdown=0):
+        self.model.objects.create(
+            name=name,
+            kwargs=kwargs,
+            run_after=timezone.now() + timedelta(seconds=countdown),
+        )
+
+    def claim(self, limit):
+        """
+        Забирает до limit готовых к выполнению задач.
+
+        Задачи, взятые воркером, который не отчитался за
+        TASK_LOCK_TIMEOUT секунд, считаются брошенными и забираются
+        снова, пока не исчерпаны TASK_MAX_ATTEMPTS попыток; после этого
+        они помечаются упавшими: задача, которая роняет воркер, иначе
+        повторялась бы бесконечно. Под PostgreSQL воркеры не ждут друг
+        друга благодаря SKIP LOCKED.
+        """
+        Task = self.model
+        now = timezone.now()
+        abandoned = Q(
+            status=Task.Status.RUNNING,
+            locked_at__lt=now - timedelta(seconds=TASK_LOCK_TIMEOUT),
+        )
+        with transaction.atomic():
+            Task.objects.filter(
+                abandoned, attempts__gte=TASK_MAX_ATTEMPTS,
+            ).update(
+                status=Task.Status.FAILED,
+                locked_at=None,
+                error='Воркер не завершил задачу за отведённое время',
+            )
+            tasks = list(
+                Task.objects.select_for_update(skip_locked=True).filter(
+                    Q(status=Task.Status.PENDING, run_after__lte=now)
+                    | abandoned & Q(attempts__lt=TASK_MAX_ATTEMPTS)
+                )[:limit]
+            )
+            Task.objects.filter(pk__in=[task.pk for task in tasks]).update(
+                status=Task.Status.RUNNING,
+                locked_at=now,
+                attempts=F('attempts') + 1,
+            )
+        for task_row in tasks:
+            task_row.attempts += 1
+        return tasks
+
+    def execute(self, task_row):
+        """Выполняет задачу; удачная удаляется, упавшая откладывается."""
+        Task = self.model
+        try:
+            run_task(task_row.name, task_row.kwargs)
+        except Exception as error:
+            logger.exception('Задача %s завершилась ошибкой', task_row)
+            failed = task_row.attempts >= TASK_MAX_ATTEMPTS
+            Task.objects.filter(pk=task_row.pk).update(
+                status=Task.Status.FAILED if failed else Task.Status.PENDING,
+                run_after=timezone.now() + timedelta(
+                    seconds=TASK_RETRY_DELAY * 2 ** (task_row.attempts - 1),
+                ),
+                locked_at=None,
+                error=repr(error),
+            )
+            return False
+        Task.objects.filter(pk=task_row.pk).delete()
+        return True
+
+
+BACKENDS = {
+    'sync': SyncBackend,
+    'process': ProcessBackend,
+    'database': DatabaseBackend,
+}
+_backends = {}
+
+
+def get_backend():
+    name = settings.BACKGROUND_TASKS_BACKEND
+    if name not in BACKENDS:
+        raise ImproperlyConfigured(
+            f'Неизвестный BACKGROUND_TASKS_BACKEND: {name}'
+        )
+    if name not in _backends:
+        _backends[name] = BACKENDS[name]()
+    return _backends[name]
@@ -0,0 +1,122 @@
+import logging
+from contextlib import contextmanager
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
+from rest_framework.test import APIClient
+
+from recipes.fake_data import FakeDataGenerator
+from recipes.management.commands.check_performance import \
+    Command as PerformanceCommand
+
+User = get_user_model()
+
+# Объём синтетических данных, общих для всех тестов
+USERS = 30
+RECIPES = 300
+
+
+@pytest.fixture(scope='session', autouse=True)
+def test_settings(tmp_path_factory):
+    # Строки о каждом запросе не нужны, предупреждения о N+1 — нужны.
+    logging.getLogger('foodgram.requests').setLevel(logging.WARNING)
+    with override_settings(
+        CACHES={
+            'default': {
+                'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            },
+        },
+        MEDIA_ROOT=str(tmp_path_factory.mktemp('media')),
+        # Задачи остаются в очереди: проверяется только путь запроса.
+        BACKGROUND_TASKS_BACKEND='database',
+        PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'],
+    ):
+        yield
+
+
+@pytest.fixture(scope='session')
+def django_db_setup(django_db_setup, django_db_blocker, test_settings):
+    """Тестовая база с синтетическими данными на всю сессию."""
+    with django_db_blocker.unblock():
+        FakeDataGenerator(users=USERS, recipes=RECIPES, seed=0).generate()
+
+
+def request_queries(captured):
+    """
+    SQL запроса так, как его видит check_performance.
+
+    Тест выполняется в транзакции, поэтому внешний atomic представления
+    открывает точку сохранения вместо транзакции. Вне теста в журнал
+    попадает только BEGIN, без COMMIT: SAVEPOINT внешнего блока
+    считается вместо BEGIN, а его RELEASE и ROLLBACK TO отбрасываются.
+    """
+    depth = 0
+    queries = []
+    for query in captured:
+        sql = query['sql']
+        if sql.startswith('SAVEPOINT'):
+            depth += 1
+        elif sql.startswith('RELEASE SAVEPOINT'):
+            depth -= 1
+            if depth == 0:
+                continue
+        elif sql.startswith('ROLLBACK TO SAVEPOINT') and depth == 1:
+            continue
+        queries.append(sql)
+    return queries
+
+
+@pytest.fixture
+def assert_max_queries(db, django_capture_on_commit_callbacks):
+    """
+    Проверяет, что блок выполнил не больше limit SQL-запросов.
+
+    Обработчики коммита выполняются внутри блока и тоже учитываются.
+    """
+    @contextmanager
+    def check(limit):
+        with CaptureQueriesContext(connection) as captured:
+            with django_capture_on_commit_callbacks(execute=True):
+                yield
+        queries = request_queries(captured)
+        assert len(queries) <= limit, (
+            f'Ожидалось не больше {limit} запросов, выполнено '
+            f'{len(queries)}:\n' + '\n'.join(queries)
+        )
+    return check
+
+
+@pytest.fixture
+def count_queries(db):
+    """Число SQL-запросов GET-запроса, как его считает check_performance."""
+    def count(client, url):
+        with CaptureQueriesContext(connection) as captured:
+            response = client.get(url)
+        assert response.status_code == 200
+        return len(request_queries(captured))
+    return count
+
+
+@pytest.fixture
+def user(db):
+    return User.objects.order_by('pk').first()
+
+
+@pytest.fixture
+def user_client(user):
+    client = APIClient()
+    client.force_authenticate(user)
+    return client
+
+
+@pytest.fixture
+def performance(db):
+    """Команда check_performance, контекст и её сценарии по именам."""
+    command = PerformanceCommand()
+    ctx = command.get_context()
+    scenarios = {
+        scenario.name: scenario for scenario in command.get_scenarios(ctx)
+    }
+    return command, ctx, scenarios
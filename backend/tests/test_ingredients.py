@@ -0,0 +1,96 @@
+import pytest
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from recipes.autocomplete import ingredient_index
+from recipes.models import Ingredient
+
+NAMES = ['кислый щавелин', 'Щавелинка', 'щавелин сушёный', 'Щавелин']
+
+
+@pytest.fixture
+def ingredients(db):
+    return [
+        Ingredient.objects.create(name=name, measurement_unit='г')
+        for name in NAMES
+    ]
+
+
+def names(items):
+    return [item['name'] for item in items]
+
+
+@pytest.mark.parametrize('query', ['щавелин', 'ЩАВЕЛИН', 'щАвЕлИн'])
+def test_exact_then_prefix_then_substring(ingredients, query):
+    assert names(ingredient_index.search(query)) == [
+        'Щавелин', 'щавелин сушёный', 'Щавелинка', 'кислый щавелин',
+    ]
+
+
+def test_limit(ingredients):
+    assert names(ingredient_index.search('щавелин', limit=2)) == [
+        'Щавелин', 'щавелин сушёный',
+    ]
+    assert names(ingredient_index.search('щавелин', limit=4))[-1] == (
+        'кислый щавелин'
+    )
+    assert ingredient_index.search('щавелин', limit=0) == []
+
+
+@pytest.mark.parametrize('query', ['сол', 'мука', 'пе'])
+def test_prefix_matches_agree_with_orm(db, query):
+    """Начало выдачи — те же ингредиенты, что и у фильтра istartswith."""
+    expected = set(
+        Ingredient.objects.filter(name__istartswith=query)
+        .values_list('pk', flat=True)
+    )
+    assert expected
+    found = [item['id'] for item in ingredient_index.search(query)]
+    assert set(found[:len(expected)]) == expected
+    assert [
+        item['id'] for item in ingredient_index.search(query.upper())
+    ] == found
+
+
+@pytest.mark.parametrize('query', ['сол', 'мука', 'Пе'])
+def test_matches_every_name_containing_query(db, query):
+    expected = {
+        item.pk for item in Ingredient.objects.all()
+        if query.casefold() in item.name.casefold()
+    }
+    assert expected
+    found = [item['id'] for item in ingredient_index.search(query)]
+    assert len(found) == len(set(found))
+    assert set(found) == expected
+
+
+def test_index_follows_ingredient_changes(ingredients):
+    assert names(ingredient_index.search('щавелинка')) == ['Щавелинка']
+    renamed = ingredients[1]
+    renamed.name = 'Щавелюшка'
+    renamed.save()
+    assert names(ingredient_index.search('щавелинка')) == []
+    assert names(ingredient_index.search('щавелюшка')) == ['Щавелюшка']
+    renamed.delete()
+    assert names(ingredient_index.search('щавелюшка')) == []
+
+
+def test_api_uses_index(ingredients):
+    response = APIClient().get(
+        reverse('ingredients-list') + '?name=щавелин&limit=3'
+    )
+    assert response.status_code == 200
+    assert names(response.data) == [
+        'Щавелин', 'щавелин сушёный', 'Щавелинка',
+    ]
+
+
+@pytest.mark.parametrize('limit', ['0', '', 'abc'])
+def test_api_without_limit(ingredients, limit):
+    response = APIClient().get(
+        reverse('ingredients-list') + f'?name=щАВЕЛИН&limit={limit}'
+    )
+    assert response.status_code == 200
+    assert names(response.data) == [
+        'Щавелин', 'щавелин сушёный', 'Щавелинка', 'кислый щавелин',
+    ]
@@ -0,0 +1,39 @@
+"""
+Время ответа эндпоинтов относительно базовой линии.
+
+Базовая линия снята check_performance на машине разработчика, а тесты
+идут на других машинах и других СУБД, поэтому полоса допуска широкая:
+тест ловит кратные регрессии (лишний проход по таблице, синхронная
+обработка картинки), а не шум. Точное сравнение — check_performance.
+"""
+import json
+
+import pytest
+
+from recipes.management.commands.check_performance import BASELINE_PATH
+
+with open(BASELINE_PATH, encoding='utf-8') as file:
+    BASELINE = json.load(file)
+
+# Прогонов каждого сценария после прогрева
+REPEAT = 10
+# Допустимый рост p50 и p95: доля от базовой линии и запас сверху, мс
+TOLERANCE = 3.0
+SLACK = 25.0
+
+
+@pytest.mark.latency
+def test_latency_within_baseline(performance, record_property):
+    command, _, _ = performance
+    results = command.measure(REPEAT)
+
+    failures = []
+    for name, result in sorted(results.items()):
+        for metric in ('p50', 'p95'):
+            record_property(f'{name}:{metric}', result[metric])
+            limit = BASELINE[name][metric] * (1 + TOLERANCE) + SLACK
+            if result[metric] > limit:
+                failures.append(
+                    f'{name}: {metric} {result[metric]} > {limit:.2f} мс'
+                )
+    assert not failures, 'Превышено время ответа:\n' + '\n'.join(failures)
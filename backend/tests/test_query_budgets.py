@@ -0,0 +1,46 @@
+import json
+
+import pytest
+
+from recipes.management.commands.check_performance import BASELINE_PATH
+
+with open(BASELINE_PATH, encoding='utf-8') as file:
+    BASELINE = json.load(file)
+
+# Сценарии, которым нужны данные предыдущих сценариев
+PREREQUISITES = {
+    'recipes-update': ('recipes-create',),
+    'recipes-delete': ('recipes-create',),
+    'users-avatar:delete': ('users-avatar:set',),
+    'logout': ('login',),
+}
+
+
+def prerequisites(name):
+    base, _, action = name.partition(':')
+    if action == 'remove':
+        return (f'{base}:add',)
+    return PREREQUISITES.get(name, ())
+
+
+def test_every_route_has_scenario(performance):
+    command, _, scenarios = performance
+    assert command.missing_routes(scenarios.values()) == []
+
+
+def test_every_scenario_has_budget(performance):
+    _, _, scenarios = performance
+    assert sorted(scenarios) == sorted(BASELINE)
+
+
+@pytest.mark.parametrize('name', sorted(BASELINE))
+def test_query_budget(name, performance, assert_max_queries):
+    command, ctx, scenarios = performance
+    scenario = scenarios[name]
+    for prerequisite in prerequisites(name):
+        command.perform(ctx, scenarios[prerequisite])
+    if scenario.method == 'get':
+        # Прогрев кешей справочников, как в check_performance.
+        command.perform(ctx, scenario)
+    with assert_max_queries(BASELINE[name]['queries']):
+        command.perform(ctx, scenario)
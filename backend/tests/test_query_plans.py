@@ -0,0 +1,13 @@
+from recipes.management.commands.check_query_plans import \
+    Command as QueryPlansCommand
+
+# На тестовых данных пользователей меньше, чем в check_query_plans.
+MIN_ROWS = 30
+
+
+def test_no_full_scans_of_large_tables(db):
+    command = QueryPlansCommand()
+    command.verbosity = 1
+    large = command.large_tables(MIN_ROWS)
+    assert 'recipes_recipe' in large
+    assert command.audit(command.collect_queries(), large) == []
@@ -0,0 +1,61 @@
+import pytest
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from recipes.models import Favorite, RecipeIngredient, ShoppingCart
+from users.models import Subscription
+
+
+@pytest.mark.parametrize('authenticated', [True, False])
+def test_recipe_list_queries_do_not_depend_on_page_size(
+    authenticated, user_client, count_queries,
+):
+    client = user_client if authenticated else APIClient()
+    url = reverse('recipes-list')
+    client.get(url)
+    assert count_queries(client, f'{url}?limit=6') == count_queries(
+        client, f'{url}?limit=100',
+    )
+
+
+@pytest.mark.parametrize('filters', [
+    'is_favorited=1',
+    'is_in_shopping_cart=1',
+    'tags=breakfast&tags=lunch',
+    'author={author}',
+])
+def test_filtered_recipe_list_queries_do_not_depend_on_page_size(
+    filters, user, user_client, count_queries,
+):
+    url = reverse('recipes-list') + '?' + filters.format(author=user.pk)
+    assert user_client.get(url).data['count'] > 1
+    assert count_queries(user_client, f'{url}&limit=1') == count_queries(
+        user_client, f'{url}&limit=100',
+    )
+
+
+def test_recipe_list_annotations_match_database(user, user_client):
+    favorited = set(
+        Favorite.objects.filter(user=user).values_list('recipe', flat=True)
+    )
+    in_cart = set(
+        ShoppingCart.objects.filter(user=user)
+        .values_list('recipe', flat=True)
+    )
+    subscribed = set(
+        Subscription.objects.filter(user=user)
+        .values_list('author', flat=True)
+    )
+    response = user_client.get(reverse('recipes-list') + '?limit=100')
+    results = response.data['results']
+    assert len(results) == 100
+    for item in results:
+        assert item['is_favorited'] == (item['id'] in favorited)
+        assert item['is_in_shopping_cart'] == (item['id'] in in_cart)
+        assert item['author']['is_subscribed'] == (
+            item['author']['id'] in subscribed
+        )
+        assert len(item['ingredients']) == RecipeIngredient.objects.filter(
+            recipe=item['id'],
+        ).count()
+        assert item['tags']
@@ -0,0 +1,164 @@
+import pytest
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError, connection
+from django.urls import reverse
+
+from api.views.recipes import RecipeViewSet
+from api.views.users import UserViewSet
+from recipes.models import Favorite, Recipe, ShoppingCart, ShoppingListItem
+from users.models import Subscription, UserQuerySet
+
+User = get_user_model()
+
+RECIPE_RELATIONS = [
+    ('recipes-favorite', 'recipes-favorite-bulk', Favorite),
+    ('recipes-shopping-cart', 'recipes-shopping-cart-bulk', ShoppingCart),
+]
+
+
+def free_recipes(user, model, count):
+    return list(
+        Recipe.objects.exclude(
+            pk__in=model.objects.filter(user=user).values('recipe_id'),
+        ).order_by('pk').values_list('pk', flat=True)[:count]
+    )
+
+
+def free_authors(user, count):
+    return list(
+        User.objects.exclude(pk=user.pk).exclude(
+            pk__in=Subscription.objects.filter(user=user).values('author_id'),
+        ).order_by('pk').values_list('pk', flat=True)[:count]
+    )
+
+
+def shopping_list(user):
+    return dict(
+        ShoppingListItem.objects.filter(user=user)
+        .values_list('ingredient_id', 'amount')
+    )
+
+
+@pytest.fixture
+def lock_order(monkeypatch):
+    """
+    Журнал запроса: 'lock' при блокировке пользователя и SQL остальных.
+
+    Блокировка SELECT ... FOR UPDATE в SQLite не видна в тексте запроса,
+    поэтому её момент отмечается отдельно.
+    """
+    events = []
+    lock = UserQuerySet.lock
+
+    def recording_lock(queryset):
+        events.append('lock')
+        return lock(queryset)
+
+    def recording_execute(execute, sql, params, many, context):
+        events.append(sql)
+        return execute(sql, params, many, context)
+
+    monkeypatch.setattr(UserQuerySet, 'lock', recording_lock)
+    with connection.execute_wrapper(recording_execute):
+        yield events
+
+
+def assert_locked_before(events, table):
+    touched = [
+        index for index, sql in enumerate(events)
+        if sql != 'lock' and f'"{table}"' in sql
+    ]
+    assert touched, f'Запрос не обращался к {table}.'
+    assert 'lock' in events[:touched[0]], (
+        f'Пользователь не заблокирован до обращения к {table}.'
+    )
+
+
+@pytest.mark.parametrize('route, bulk_route, model', RECIPE_RELATIONS)
+def test_single_recipe_relation_locks_user_first(
+    route, bulk_route, model, user, user_client, lock_order,
+):
+    url = reverse(route, args=[free_recipes(user, model, 1)[0]])
+    lock_order.clear()
+    assert user_client.post(url).status_code == 201
+    assert_locked_before(lock_order, model._meta.db_table)
+    lock_order.clear()
+    assert user_client.delete(url).status_code == 204
+    assert_locked_before(lock_order, model._meta.db_table)
+
+
+def test_single_subscription_locks_user_first(user, user_client, lock_order):
+    url = reverse('users-subscribe', args=[free_authors(user, 1)[0]])
+    lock_order.clear()
+    assert user_client.post(url).status_code == 201
+    assert_locked_before(lock_order, Subscription._meta.db_table)
+    lock_order.clear()
+    assert user_client.delete(url).status_code == 204
+    assert_locked_before(lock_order, Subscription._meta.db_table)
+
+
+@pytest.mark.parametrize('route, bulk_route, model', RECIPE_RELATIONS)
+def test_bulk_add_does_not_count_rows_added_concurrently(
+    route, bulk_route, model, user, user_client, monkeypatch,
+):
+    """
+    Связь появляется между проверкой пакета и вставкой.
+
+    Так выглядит одиночное добавление, выполненное в обход блокировки
+    пользователя: пакет не должен засчитать этот рецепт второй раз.
+    """
+    ids = free_recipes(user, model, 3)
+    concurrent = Recipe.objects.get(pk=ids[0])
+    get_bulk_targets = RecipeViewSet._get_bulk_targets
+
+    def interleaved(self, request, bulk_model):
+        targets = get_bulk_targets(self, request, bulk_model)
+        model.objects.create(user=user, recipe=concurrent)
+        Recipe.objects.filter(pk=concurrent.pk).update(
+            **{model.recipe_counter: 1 + getattr(
+                concurrent, model.recipe_counter,
+            )},
+        )
+        if model is ShoppingCart:
+            ShoppingListItem.objects.add_recipe([user.pk], concurrent)
+        return targets
+
+    monkeypatch.setattr(RecipeViewSet, '_get_bulk_targets', interleaved)
+    with pytest.raises(IntegrityError):
+        user_client.post(reverse(bulk_route), {'ids': ids}, format='json')
+
+    for recipe in Recipe.objects.filter(pk__in=ids):
+        assert getattr(recipe, model.recipe_counter) == (
+            model.objects.filter(recipe=recipe).count()
+        )
+    if model is ShoppingCart:
+        amounts = shopping_list(user)
+        ShoppingListItem.objects.rebuild([user.pk])
+        assert amounts == shopping_list(user)
+
+
+def test_bulk_subscribe_does_not_count_rows_added_concurrently(
+    user, user_client, monkeypatch,
+):
+    ids = free_authors(user, 3)
+    concurrent = User.objects.get(pk=ids[0])
+    get_bulk_targets = UserViewSet._get_bulk_targets
+
+    def interleaved(self, request):
+        targets = get_bulk_targets(self, request)
+        Subscription.objects.create(user=user, author=concurrent)
+        User.objects.filter(pk=concurrent.pk).update(
+            subscribers_count=concurrent.subscribers_count + 1,
+        )
+        return targets
+
+    monkeypatch.setattr(UserViewSet, '_get_bulk_targets', interleaved)
+    with pytest.raises(IntegrityError):
+        user_client.post(
+            reverse('users-subscribe-bulk'), {'ids': ids}, format='json',
+        )
+
+    for author in User.objects.filter(pk__in=ids):
+        assert author.subscribers_count == (
+            Subscription.objects.filter(author=author).count()
+        )
@@ -0,0 +1,110 @@
+import pytest
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+
+from recipes.models import Recipe
+from users.models import Subscription
+
+User = get_user_model()
+
+AUTHORS = 100
+RECIPES_PER_AUTHOR = 4
+RECIPES_LIMIT = 3
+# Сколько авторов у пользователя в подписках при сравнении числа запросов
+AUTHOR_COUNTS = (6, 30, AUTHORS)
+
+
+@pytest.fixture
+def follow_authors(user):
+    """Подписывает пользователя на count новых авторов с рецептами."""
+    followed = []
+
+    def follow(count):
+        start = len(followed)
+        User.objects.bulk_create(
+            User(
+                username=f'followed-{number}',
+                email=f'followed-{number}@example.com',
+                first_name='Автор',
+                last_name=str(number),
+                recipes_count=RECIPES_PER_AUTHOR,
+            )
+            for number in range(start, start + count)
+        )
+        authors = list(
+            User.objects.filter(
+                username__in=[
+                    f'followed-{number}'
+                    for number in range(start, start + count)
+                ],
+            )
+        )
+        Recipe.objects.bulk_create(
+            Recipe(
+                author=author,
+                name=f'Рецепт {number}',
+                text='Описание',
+                cooking_time=10,
+                image='recipes/images/test.jpg',
+            )
+            for author in authors
+            for number in range(RECIPES_PER_AUTHOR)
+        )
+        Subscription.objects.bulk_create(
+            Subscription(user=user, author=author) for author in authors
+        )
+        followed.extend(authors)
+        return authors
+    return follow
+
+
+def test_subscriptions_queries_do_not_depend_on_page_size(
+    follow_authors, user_client, count_queries,
+):
+    follow_authors(AUTHORS)
+    url = reverse('users-subscriptions')
+    user_client.get(url)
+    assert count_queries(
+        user_client, f'{url}?limit=6&recipes_limit={RECIPES_LIMIT}',
+    ) == count_queries(
+        user_client, f'{url}?limit=100&recipes_limit={RECIPES_LIMIT}',
+    )
+
+
+@pytest.mark.parametrize(
+    'recipes_limit', [None, 1, RECIPES_LIMIT, RECIPES_PER_AUTHOR + 1],
+)
+def test_subscriptions_queries_do_not_depend_on_authors(
+    recipes_limit, follow_authors, user_client, count_queries,
+):
+    url = reverse('users-subscriptions') + '?limit=100'
+    if recipes_limit is not None:
+        url += f'&recipes_limit={recipes_limit}'
+    user_client.get(url)
+    followed, counts = 0, []
+    for total in AUTHOR_COUNTS:
+        follow_authors(total - followed)
+        followed = total
+        counts.append(count_queries(user_client, url))
+    assert len(set(counts)) == 1, counts
+
+
+def test_subscriptions_latest_recipes(follow_authors, user_client):
+    follow_authors(AUTHORS)
+    response = user_client.get(
+        reverse('users-subscriptions')
+        + f'?limit=100&recipes_limit={RECIPES_LIMIT}'
+    )
+    results = response.data['results']
+    assert len(results) == 100
+    for author in results:
+        latest = list(
+            Recipe.objects.filter(author=author['id'])
+            .order_by('-pub_date', '-id')
+            .values_list('pk', flat=True)
+        )
+        assert [
+            recipe['id'] for recipe in author['recipes']
+        ] == latest[:RECIPES_LIMIT]
+        assert author['recipes_count'] == len(latest)
+        assert author['is_subscribed']
@@ -0,0 +1,77 @@
+import io
+import json
+
+import pytest
+
+from recipes.models import Recipe
+from recipes.transfer import RecipeExporter, RecipeImporter
+
+EXPORTED = 3
+
+
+def composition(recipe):
+    return (
+        sorted(recipe.tags.values_list('slug', flat=True)),
+        sorted(
+            recipe.ingredients.values_list(
+                'ingredient__name', 'ingredient__measurement_unit', 'amount',
+            )
+        ),
+    )
+
+
+@pytest.fixture
+def exported(db):
+    """Первые EXPORTED рецептов выгрузки с новыми short_code."""
+    output = io.StringIO()
+    next(RecipeExporter(batch_size=EXPORTED).export(output))
+    records = [json.loads(line) for line in output.getvalue().splitlines()]
+    originals = {}
+    for record in records:
+        originals[f'copy-{record["short_code"]}'] = record['short_code']
+        record['short_code'] = f'copy-{record["short_code"]}'
+    return records, originals
+
+
+def test_export_import_round_trip(exported):
+    records, originals = exported
+    importer = RecipeImporter()
+    lines = [json.dumps(record, ensure_ascii=False) for record in records]
+    for _ in importer.import_recipes(lines):
+        pass
+
+    assert importer.stats['imported'] == EXPORTED
+    assert not importer.errors
+    for code, original in originals.items():
+        assert composition(Recipe.objects.get(short_code=code)) == (
+            composition(Recipe.objects.get(short_code=original))
+        )
+
+
+def test_import_merges_duplicates_and_skips_malformed_lines(exported):
+    records, originals = exported
+    duplicated = records[0]
+    duplicated['tags'] += duplicated['tags']
+    duplicated['ingredients'] += duplicated['ingredients']
+    lines = [json.dumps(record, ensure_ascii=False) for record in records]
+    lines.insert(1, '{"short_code": "broken", "name": ')
+
+    importer = RecipeImporter()
+    for _ in importer.import_recipes(lines):
+        pass
+
+    assert importer.stats['imported'] == EXPORTED
+    assert importer.stats['invalid'] == 1
+    assert len(importer.errors) == 1
+    assert importer.errors[0].startswith('строка 2:')
+    copy = Recipe.objects.get(short_code=duplicated['short_code'])
+    tags, ingredients = composition(
+        Recipe.objects.get(short_code=originals[duplicated['short_code']])
+    )
+    assert composition(copy) == (
+        tags,
+        [
+            (name, measurement_unit, amount * 2)
+            for name, measurement_unit, amount in ingredients
+        ],
+    )
@@ -3,7 +3,9 @@ from django.contrib.auth import get_user_model
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from django.utils.translation import gettext_lazy as _
 
+from recipes.admin import RecountAdminMixin
 from users.models import Subscription
+from users.tasks import process_avatar
 
 User = get_user_model()
 
@@ -14,6 +16,7 @@ class UserAdmin(BaseUserAdmin):
     list_display = (
         'id', 'email', 'username',
         'first_name', 'last_name', 'is_staff',
+        'recipes_count', 'subscribers_count',
     )
     list_filter = ('is_staff', 'is_superuser', 'is_active')
     search_fields = (
@@ -37,6 +40,9 @@ class UserAdmin(BaseUserAdmin):
         (_('Важные даты'), {
             'fields': ('last_login', 'date_joined'),
         }),
+        (_('Статистика'), {
+            'fields': ('recipes_count', 'subscribers_count'),
+        }),
     )
 
     add_fieldsets = (
@@ -50,10 +56,22 @@ class UserAdmin(BaseUserAdmin):
         }),
     )
 
-    readonly_fields = ('last_login', 'date_joined')
+    readonly_fields = (
+        'last_login', 'date_joined',
+        'recipes_count', 'subscribers_count',
+    )
+
+    def save_model(self, request, obj, form, change):
+        avatar_changed = 'avatar' in form.changed_data
+        if avatar_changed:
+            obj.avatar_renditions = {}
+        super().save_model(request, obj, form, change)
+        if avatar_changed and obj.avatar:
+            process_avatar.delay(pk=obj.pk, source=obj.avatar.name)
 
 
 @admin.register(Subscription)
-class SubscriptionAdmin(admin.ModelAdmin):
+class SubscriptionAdmin(RecountAdminMixin, admin.ModelAdmin):
     list_display = ('user', 'author')
+    recount_fields = {'user_ids': 'author_id'}
     search_fields = ('user__username', 'author__username')
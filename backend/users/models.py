@@ -1,13 +1,50 @@
 from django.contrib.auth.models import AbstractUser
+from django.contrib.auth.models import UserManager as DjangoUserManager
 from django.db import models
+from django.db.models import Exists, OuterRef, QuerySet
 
 from foodgram.constants import (EMAIL_MAX_LENGTH, NAME_MAX_LENGTH,
                                 USERNAME_MAX_LENGTH, USERNAME_REGEX)
 
 
+class UserQuerySet(QuerySet):
+    """Набор запросов для модели пользователя."""
+
+    def with_is_subscribed(self, user):
+        """Аннотирует, подписан ли пользователь user на каждого из авторов."""
+        if not user.is_authenticated:
+            return self.annotate(
+                is_subscribed=Exists(Subscription.objects.none()),
+            )
+        return self.annotate(
+            is_subscribed=Exists(
+                Subscription.objects.filter(
+                    user=user,
+                    author=OuterRef('pk'),
+                )
+            ),
+        )
+
+    def lock(self):
+        """
+        Блокирует строки пользователей до конца транзакции.
+
+        Строки блокируются в порядке pk, чтобы параллельные транзакции
+        не ждали друг друга по кругу. Все изменения подписок, избранного
+        и корзины пользователя выполняются под этой блокировкой.
+        """
+        list(self.select_for_update().order_by('pk').values_list('pk'))
+
+
+class UserManager(DjangoUserManager.from_queryset(UserQuerySet)):
+    """Менеджер пользователей с аннотациями подписок."""
+
+
 class User(AbstractUser):
     """Модель пользователя."""
 
+    objects = UserManager()
+
     email = models.EmailField(
         max_length=EMAIL_MAX_LENGTH,
         unique=True,
@@ -33,6 +70,22 @@ class User(AbstractUser):
         null=True,
         verbose_name='Аватар',
     )
+    avatar_renditions = models.JSONField(
+        default=dict,
+        blank=True,
+        editable=False,
+        verbose_name='Рендиции аватара',
+    )
+    recipes_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Количество рецептов',
+    )
+    subscribers_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Количество подписчиков',
+    )
 
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username', 'first_name', 'last_name']
@@ -0,0 +1,46 @@
+import logging
+
+from django.contrib.auth import get_user_model
+
+from foodgram.constants import AVATAR_IMAGE_RENDITIONS, IMAGE_SOURCE_TTL
+from foodgram.images import (IMAGE_ERRORS, delete_unused_files,
+                             process_image_field)
+from tasks.queue import task
+
+User = get_user_model()
+
+logger = logging.getLogger('foodgram.tasks')
+
+
+@task
+def process_avatar(pk, source):
+    """Строит рендицию загруженного аватара."""
+    user = User.objects.filter(pk=pk, avatar=source).only('avatar').first()
+    if user is None:
+        return
+    try:
+        renditions = process_image_field(
+            user,
+            'avatar',
+            'avatar_renditions',
+            AVATAR_IMAGE_RENDITIONS,
+            formats=('jpeg',),
+            delete_source=False,
+        )
+    except IMAGE_ERRORS as error:
+        # Аватар необязателен: картинку, которую не удалось
+        # разобрать, просто убираем.
+        logger.warning('Аватар пользователя %s не обработан: %s', pk, error)
+        User.objects.filter(pk=pk, avatar=source).update(
+            avatar=None,
+            avatar_renditions={},
+        )
+        return
+    if renditions is not None:
+        delete_avatars.schedule(IMAGE_SOURCE_TTL, paths=[source])
+
+
+@task
+def delete_avatars(paths):
+    """Удаляет файлы, на которые не ссылается аватар ни одного пользователя."""
+    delete_unused_files(paths, User, 'avatar')
@@ -0,0 +1,151 @@
+"""
+Сравнение пропускной способности и хвостовых задержек развёртываний.
+
+Каждая цель (например, gunicorn с синхронными воркерами и с воркерами
+uvicorn) нагружается одинаковым числом параллельных клиентов в течение
+заданного времени по одному и тому же списку путей. Используется только
+стандартная библиотека, поэтому скрипт запускается где угодно:
+
+    python infra/loadtest/compare.py \\
+        --target wsgi=http://127.0.0.1:8001 \\
+        --target asgi=http://127.0.0.1:8002 \\
+        --path /api/recipes/ --path /s/<short_code>/ \\
+        --concurrency 32 --duration 30
+"""
+import argparse
+import http.client
+import json
+import math
+import threading
+import time
+from collections import defaultdict
+from urllib.parse import urlsplit
+
+DEFAULT_PATHS = (
+    '/api/recipes/',
+    '/api/tags/',
+    '/api/ingredients/?name=мол',
+)
+
+
+def percentile(values, share):
+    values = sorted(values)
+    if not values:
+        return 0.0
+    return values[max(math.ceil(share * len(values)) - 1, 0)]
+
+
+def run_client(base_url, paths, headers, deadline, offset, samples, lock):
+    """Один клиент: запросы по кругу до дедлайна на keep-alive соединении."""
+    url = urlsplit(base_url)
+    connection_class = (
+        http.client.HTTPSConnection if url.scheme == 'https'
+        else http.client.HTTPConnection
+    )
+    connection = connection_class(url.hostname, url.port, timeout=30)
+    local = []
+    position = offset
+    while time.perf_counter() < deadline:
+        path = paths[position % len(paths)]
+        position += 1
+        start = time.perf_counter()
+        try:
+            connection.request('GET', url.path.rstrip('/') + path,
+                               headers=headers)
+            response = connection.getresponse()
+            response.read()
+            status = response.status
+        except (OSError, http.client.HTTPException):
+            connection.close()
+            status = None
+        local.append((path, status, time.perf_counter() - start))
+    connection.close()
+    with lock:
+        samples.extend(local)
+
+
+def run_target(base_url, paths, headers, concurrency, duration):
+    samples, lock = [], threading.Lock()
+    deadline = time.perf_counter() + duration
+    clients = [
+        threading.Thread(
+            target=run_client,
+            args=(base_url, paths, headers, deadline, number, samples, lock),
+        )
+        for number in range(concurrency)
+    ]
+    for client in clients:
+        client.start()
+    for client in clients:
+        client.join()
+    return samples
+
+
+def summarize(samples, duration):
+    by_path = defaultdict(list)
+    for path, status, elapsed in samples:
+        by_path[path].append((status, elapsed))
+        by_path['*'].append((status, elapsed))
+    report = {}
+    for path, rows in by_path.items():
+        timings = [elapsed * 1000 for _, elapsed in rows]
+        report[path] = {
+            'requests': len(rows),
+            'rps': round(len(rows) / duration, 1),
+            'errors': sum(
+                1 for status, _ in rows if status is None or status >= 500
+            ),
+            'p50_ms': round(percentile(timings, 0.5), 2),
+            'p95_ms': round(percentile(timings, 0.95), 2),
+            'p99_ms': round(percentile(timings, 0.99), 2),
+        }
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument(
+        '--target',
+        action='append',
+        required=True,
+        help='имя=базовый URL, можно указать несколько раз',
+    )
+    parser.add_argument('--path', action='append', help='путь для запросов')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=20)
+    parser.add_argument('--token', help='токен для заголовка Authorization')
+    parser.add_argument('--json', help='сохранить отчёт в файл')
+    options = parser.parse_args()
+
+    paths = options.path or list(DEFAULT_PATHS)
+    headers = {'Connection': 'keep-alive'}
+    if options.token:
+        headers['Authorization'] = f'Token {options.token}'
+
+    reports = {}
+    for target in options.target:
+        name, base_url = target.split('=', 1)
+        samples = run_target(
+            base_url, paths, headers,
+            options.concurrency, options.duration,
+        )
+        reports[name] = summarize(samples, options.duration)
+
+    print(
+        f'{"цель":<10} {"путь":<40} {"запросов":>9} {"rps":>8} '
+        f'{"ошибок":>7} {"p50":>8} {"p95":>8} {"p99":>8}'
+    )
+    for name, report in reports.items():
+        for path, row in sorted(report.items()):
+            print(
+                f'{name:<10} {path:<40} {row["requests"]:>9} '
+                f'{row["rps"]:>8} {row["errors"]:>7} {row["p50_ms"]:>8} '
+                f'{row["p95_ms"]:>8} {row["p99_ms"]:>8}'
+            )
+    if options.json:
+        with open(options.json, 'w', encoding='utf-8') as file:
+            json.dump(reports, file, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,329 @@
+"""
+Нагрузочный профиль со смешанным трафиком.
+
+Виртуальные пользователи, как в locust, входят под синтетическими
+пользователями из generate_fake_data и в цикле выполняют действия с
+весами: лента и её следующие страницы, фильтры по тегам и автору,
+поиск, карточка рецепта, переходы по коротким ссылкам, подсказки
+ингредиентов, скачивание списка покупок и запись — избранное, корзина,
+подписки и создание рецептов. Между действиями пользователь «думает»
+случайное время со средним --think. Отчёт — запросы, rps, ошибки и
+p50/p95/p99 по каждому действию, только стандартная библиотека:
+
+    python manage.py generate_fake_data --users 1000 --recipes 100000
+    python infra/loadtest/load_profile.py --base-url http://127.0.0.1:8000 \\
+        --users 50 --duration 60 --json report.json
+"""
+import argparse
+import base64
+import http.client
+import json
+import random
+import threading
+import time
+from urllib.parse import quote, urlsplit
+
+from compare import summarize
+
+FAKE_PASSWORD = 'fake-password-123'
+FAKE_PREFIX = 'fake-'
+SEARCH_WORDS = ('рецепт', 'описание', 'суп', 'салат')
+INGREDIENT_PREFIXES = ('мол', 'сах', 'соль', 'кар', 'яйц', 'мук')
+# Картинка 1×1 PNG для создаваемых рецептов.
+PIXEL = 'data:image/png;base64,' + base64.b64encode(bytes.fromhex(
+    '89504e470d0a1a0a0000000d4948445200000001000000010802000000907753de'
+    '0000000c4944415408d763f8cfc0000003010100c9fe92ef0000000049454e44'
+    'ae426082'
+)).decode()
+
+ACTIONS = {
+    'feed': 30,
+    'feed_next': 10,
+    'filter_tags': 10,
+    'filter_author': 5,
+    'search': 5,
+    'recipe': 15,
+    'short_link': 10,
+    'ingredients': 5,
+    'download_cart': 3,
+    'favorite': 4,
+    'shopping_cart': 3,
+    'subscribe': 2,
+    'create_recipe': 1,
+}
+
+
+class Client:
+    """Keep-alive соединение с токеном пользователя."""
+
+    def __init__(self, base_url, timeout=30):
+        url = urlsplit(base_url)
+        self.connection_class = (
+            http.client.HTTPSConnection if url.scheme == 'https'
+            else http.client.HTTPConnection
+        )
+        self.host, self.port = url.hostname, url.port
+        self.prefix = url.path.rstrip('/')
+        self.timeout = timeout
+        self.connection = None
+        self.token = None
+
+    def request(self, method, path, data=None):
+        """Статус и тело ответа; None вместо статуса при сетевой ошибке."""
+        if self.connection is None:
+            self.connection = self.connection_class(
+                self.host, self.port, timeout=self.timeout,
+            )
+        headers = {'Connection': 'keep-alive', 'Accept': 'application/json'}
+        body = None
+        if data is not None:
+            body = json.dumps(data).encode()
+            headers['Content-Type'] = 'application/json'
+        if self.token:
+            headers['Authorization'] = f'Token {self.token}'
+        try:
+            self.connection.request(
+                method, self.prefix + path, body=body, headers=headers,
+            )
+            response = self.connection.getresponse()
+            return response.status, response.read()
+        except (OSError, http.client.HTTPException):
+            self.connection.close()
+            self.connection = None
+            return None, b''
+
+    def get_json(self, path):
+        status, body = self.request('GET', path)
+        if status != 200:
+            raise RuntimeError(f'GET {path}: статус {status}')
+        return json.loads(body)
+
+    def login(self, email, password):
+        status, body = self.request(
+            'POST', '/api/auth/token/login/',
+            {'email': email, 'password': password},
+        )
+        if status != 200:
+            raise RuntimeError(f'Вход {email}: статус {status}')
+        self.token = json.loads(body)['auth_token']
+
+
+def discover(base_url, users, recipes, password):
+    """Синтетические пользователи, рецепты, теги и короткие ссылки."""
+    client = Client(base_url)
+    accounts = []
+    path = '/api/users/?limit=100'
+    while path and len(accounts) < users:
+        page = client.get_json(path)
+        accounts += [
+            user for user in page['results']
+            if user['username'].startswith(FAKE_PREFIX)
+        ]
+        path = page['next'] and relative(page['next'])
+    if not accounts:
+        raise RuntimeError(
+            'Нет синтетических пользователей, запустите generate_fake_data'
+        )
+    tags = client.get_json('/api/tags/')
+    ingredients = client.get_json(
+        '/api/ingredients/?name=' + quote(INGREDIENT_PREFIXES[0]),
+    )
+    recipe_ids = []
+    path = '/api/recipes/?limit=100'
+    while path and len(recipe_ids) < recipes:
+        page = client.get_json(path)
+        recipe_ids += [recipe['id'] for recipe in page['results']]
+        path = page['next'] and relative(page['next'])
+    client.login(accounts[0]['email'], password)
+    short_links = [
+        relative(
+            client.get_json(f'/api/recipes/{pk}/get-link/')['short-link']
+        )
+        for pk in recipe_ids[:100]
+    ]
+    return {
+        'accounts': accounts[:users],
+        'tags': [tag['slug'] for tag in tags],
+        'tag_ids': [tag['id'] for tag in tags],
+        'ingredient_ids': [ingredient['id'] for ingredient in ingredients],
+        'recipes': recipe_ids,
+        'authors': sorted({user['id'] for user in accounts}),
+        'short_links': short_links,
+    }
+
+
+def relative(url):
+    url = urlsplit(url)
+    return url.path + (f'?{url.query}' if url.query else '')
+
+
+class VirtualUser:
+    """Пользователь, выполняющий действия с весами до дедлайна."""
+
+    def __init__(self, base_url, account, data, password, think, seed):
+        self.client = Client(base_url)
+        self.account = account
+        self.data = data
+        self.password = password
+        self.think = think
+        self.random = random.Random(seed)
+        self.next_page = None
+        self.samples = []
+
+    def call(self, action, method, path, payload=None):
+        start = time.perf_counter()
+        status, body = self.client.request(method, path, payload)
+        self.samples.append((action, status, time.perf_counter() - start))
+        return status, body
+
+    def run(self, deadline):
+        self.client.login(self.account['email'], self.password)
+        actions, weights = zip(*ACTIONS.items())
+        while time.perf_counter() < deadline:
+            action = self.random.choices(actions, weights)[0]
+            getattr(self, action)()
+            if self.think:
+                time.sleep(self.random.expovariate(1 / self.think))
+
+    def feed(self):
+        status, body = self.call('feed', 'GET', '/api/recipes/?limit=6')
+        if status == 200:
+            self.next_page = json.loads(body).get('next')
+
+    def feed_next(self):
+        if not self.next_page:
+            return self.feed()
+        status, body = self.call(
+            'feed_next', 'GET', relative(self.next_page),
+        )
+        self.next_page = (
+            json.loads(body).get('next') if status == 200 else None
+        )
+
+    def filter_tags(self):
+        tags = self.random.sample(
+            self.data['tags'], self.random.randint(1, len(self.data['tags'])),
+        )
+        self.call(
+            'filter_tags', 'GET',
+            '/api/recipes/?limit=6&'
+            + '&'.join(f'tags={tag}' for tag in tags),
+        )
+
+    def filter_author(self):
+        author = self.random.choice(self.data['authors'])
+        self.call('filter_author', 'GET',
+                  f'/api/recipes/?limit=6&author={author}')
+
+    def search(self):
+        word = quote(self.random.choice(SEARCH_WORDS))
+        self.call('search', 'GET', f'/api/recipes/?limit=6&search={word}')
+
+    def recipe(self):
+        pk = self.random.choice(self.data['recipes'])
+        self.call('recipe', 'GET', f'/api/recipes/{pk}/')
+
+    def short_link(self):
+        self.call('short_link', 'GET',
+                  self.random.choice(self.data['short_links']))
+
+    def ingredients(self):
+        prefix = quote(self.random.choice(INGREDIENT_PREFIXES))
+        self.call('ingredients', 'GET', f'/api/ingredients/?name={prefix}')
+
+    def download_cart(self):
+        self.call('download_cart', 'GET',
+                  '/api/recipes/download_shopping_cart/?format=txt')
+
+    def toggle(self, action, path):
+        """Добавление и удаление: данные остаются прежними."""
+        status, _ = self.call(action, 'POST', path)
+        if status == 201:
+            self.call(action, 'DELETE', path)
+
+    def favorite(self):
+        pk = self.random.choice(self.data['recipes'])
+        self.toggle('favorite', f'/api/recipes/{pk}/favorite/')
+
+    def shopping_cart(self):
+        pk = self.random.choice(self.data['recipes'])
+        self.toggle('shopping_cart', f'/api/recipes/{pk}/shopping_cart/')
+
+    def subscribe(self):
+        author = self.random.choice(self.data['authors'])
+        if author != self.account['id']:
+            self.toggle('subscribe', f'/api/users/{author}/subscribe/')
+
+    def create_recipe(self):
+        status, body = self.call('create_recipe', 'POST', '/api/recipes/', {
+            'ingredients': [{
+                'id': self.random.choice(self.data['ingredient_ids']),
+                'amount': 10,
+            }],
+            'tags': [self.random.choice(self.data['tag_ids'])],
+            'image': PIXEL,
+            'name': 'Нагрузочный рецепт',
+            'text': 'Создан нагрузочным тестом',
+            'cooking_time': 10,
+        })
+        if status == 201:
+            pk = json.loads(body)['id']
+            self.call('create_recipe', 'DELETE', f'/api/recipes/{pk}/')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--base-url', required=True)
+    parser.add_argument('--users', type=int, default=20,
+                        help='число виртуальных пользователей')
+    parser.add_argument('--duration', type=float, default=30)
+    parser.add_argument('--think', type=float, default=0.5,
+                        help='среднее время между действиями, с')
+    parser.add_argument('--recipes', type=int, default=1000,
+                        help='сколько рецептов из ленты использовать')
+    parser.add_argument('--password', default=FAKE_PASSWORD)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', help='сохранить отчёт в файл')
+    options = parser.parse_args()
+
+    data = discover(options.base_url, options.users, options.recipes,
+                    options.password)
+    users = [
+        VirtualUser(options.base_url, account, data, options.password,
+                    options.think, options.seed + number)
+        for number, account in enumerate(data['accounts'])
+    ]
+    deadline = time.perf_counter() + options.duration
+    threads = [
+        threading.Thread(target=user.run, args=(deadline,)) for user in users
+    ]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    report = summarize(
+        [sample for user in users for sample in user.samples], elapsed,
+    )
+    print(
+        f'{"действие":<16} {"запросов":>9} {"rps":>8} {"ошибок":>7} '
+        f'{"p50":>8} {"p95":>8} {"p99":>8}'
+    )
+    for action, row in sorted(report.items()):
+        print(
+            f'{action:<16} {row["requests"]:>9} {row["rps"]:>8} '
+            f'{row["errors"]:>7} {row["p50_ms"]:>8} {row["p95_ms"]:>8} '
+            f'{row["p99_ms"]:>8}'
+        )
+    if options.json:
+        with open(options.json, 'w', encoding='utf-8') as file:
+            json.dump(
+                {'users': len(users), 'duration': elapsed, 'report': report},
+                file, ensure_ascii=False, indent=2,
+            )
+
+
+if __name__ == '__main__':
+    main()